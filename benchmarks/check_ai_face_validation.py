@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from typing import List
+from PIL import Image
+from benchmarks.dataset import generate_dataset
+from benchmarks.ollama_stub import OllamaStub
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARK_DIR)
+RULE_FILE = os.path.join(REPO_ROOT, 'plugins', 'rules', 'ai_face_validation.py')
+
+def _images(directory: str) -> List[str]:
+    return sorted(os.path.join(root, name) for root, _, names in os.walk(directory) for name in names)
+
+# Runs the AIFaceValidation rule against the local stub: checks that apply_batch keeps exactly
+# max_in_flight requests open, that 503s are retried until they succeed, and that every file
+# gets its own answer back. Exits 1 if any check fails.
+def main():
+    parser = argparse.ArgumentParser(description="Check AIFaceValidation against a stub Ollama server")
+    parser.add_argument("-n", "--images", type=int, default=24)
+    parser.add_argument("--max-in-flight", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--fail-every", type=int, default=5)
+    args = parser.parse_args()
+
+    sys.path.insert(0, REPO_ROOT)
+    from image_processor import PluginLoader, Rule
+
+    directory = tempfile.mkdtemp(prefix='sidm-ollama-')
+    stub = OllamaStub(latency=args.latency, fail_every=args.fail_every).start()
+    rule = PluginLoader.load_plugin(RULE_FILE, Rule)
+    try:
+        generate_dataset(directory, args.images, [(48, 48), (96, 72)], ['jpg', 'png'])
+        files = _images(directory)
+        expected = []
+        for path in files:
+            with Image.open(path) as image:
+                expected.append(image.width >= stub.face_width)
+        rule.initialize({'api_url': stub.url, 'max_in_flight': args.max_in_flight, 'retries': 3, 'backoff': 0.01})
+        start = time.perf_counter()
+        results = rule.apply_batch(files, [{'filename': os.path.basename(path)} for path in files])
+        elapsed = time.perf_counter() - start
+    finally:
+        rule.close()
+        stub.close()
+        shutil.rmtree(directory, ignore_errors=True)
+
+    checks = [
+        ("every file answered", all(isinstance(result, bool) for result in results), results),
+        ("answers match their files", results == expected, results),
+        ("both answers seen", len(set(expected)) == 2, expected),
+        ("503s were retried", stub.failed > 0 and stub.requests == len(files) + stub.failed,
+         f"{stub.requests} requests, {stub.failed} failed"),
+        (f"{args.max_in_flight} requests in flight", stub.max_in_flight == args.max_in_flight,
+         f"peak {stub.max_in_flight}"),
+    ]
+    print(f"{len(files)} files, {stub.requests} requests ({stub.failed} answered 503) in {elapsed:.2f}s, "
+          f"peak {stub.max_in_flight} in flight")
+    failed = [(name, detail) for name, ok, detail in checks if not ok]
+    for name, detail in failed:
+        print(f"FAILED: {name}: {detail}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
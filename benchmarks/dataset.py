@@ -0,0 +1,66 @@
+import os
+import random
+import argparse
+from typing import List, Sequence, Tuple
+import numpy as np
+from PIL import Image
+
+DEFAULT_SIZES = ((64, 64), (640, 480), (1920, 1080))
+DEFAULT_FORMATS = ('jpg', 'png')
+PIL_FORMATS = {'jpg': 'JPEG', 'jpeg': 'JPEG', 'png': 'PNG', 'gif': 'GIF', 'bmp': 'BMP'}
+
+# Writes `count` images spread over a tree of nested directories. Sizes and formats are drawn
+# round-robin after a seeded shuffle, so the same arguments always produce the same dataset.
+def generate_dataset(output_dir: str, count: int, sizes: Sequence[Tuple[int, int]] = DEFAULT_SIZES,
+                     formats: Sequence[str] = DEFAULT_FORMATS, depth: int = 2, fanout: int = 4,
+                     non_images: float = 0.0, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    directories = [output_dir]
+    for _ in range(depth):
+        directories = [os.path.join(parent, f"d{i}") for parent in directories for i in range(fanout)]
+    for directory in directories:
+        os.makedirs(directory, exist_ok=True)
+
+    # A few templates per size, so encoding dominates rather than generating pixels
+    templates = {size: [_template(size, rng) for _ in range(4)] for size in sizes}
+    paths = []
+    for i in range(count):
+        size = sizes[i % len(sizes)]
+        image_format = formats[(i // len(sizes)) % len(formats)]
+        directory = rng.choice(directories)
+        path = os.path.join(directory, f"img{i:07d}.{image_format}")
+        templates[size][i % 4].save(path, PIL_FORMATS[image_format.lower()])
+        paths.append(path)
+        if non_images and rng.random() < non_images:
+            with open(os.path.join(directory, f"notes{i:07d}.txt"), 'w') as f:
+                f.write("not an image\n")
+    return paths
+
+def _template(size: Tuple[int, int], rng: random.Random) -> Image.Image:
+    width, height = size
+    gradient = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+    noise = np.random.default_rng(rng.randrange(2 ** 32)).normal(0, 24, (height, width, 3)).astype(np.float32)
+    pixels = np.clip(gradient + noise, 0, 255).astype(np.uint8)
+    return Image.fromarray(pixels, 'RGB')
+
+def parse_size(text: str) -> Tuple[int, int]:
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic image dataset")
+    parser.add_argument("output_dir")
+    parser.add_argument("-n", "--count", type=int, default=1000)
+    parser.add_argument("--sizes", nargs='+', type=parse_size, default=list(DEFAULT_SIZES), help="e.g. 64x64 640x480")
+    parser.add_argument("--formats", nargs='+', default=list(DEFAULT_FORMATS))
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--fanout", type=int, default=4)
+    parser.add_argument("--non-images", type=float, default=0.0, help="Fraction of extra non-image files")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    paths = generate_dataset(args.output_dir, args.count, args.sizes, args.formats, args.depth, args.fanout,
+                             args.non_images, args.seed)
+    print(f"Wrote {len(paths)} images to {args.output_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import io
+import json
+import base64
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from PIL import Image
+
+DEFAULT_FACE_WIDTH = 64
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        stub = self.server.stub
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        number = stub.begin()
+        try:
+            time.sleep(stub.latency)
+        finally:
+            stub.end()
+        if self.path.rstrip('/') != '/api/generate':
+            return self._send(404, {'error': f"Unknown path {self.path}"})
+        if stub.fail_every and number % stub.fail_every == 0:
+            return self._send(503, {'error': 'stub overloaded'})
+        images = body.get('images') or []
+        if not images:
+            return self._send(400, {'error': 'no image'})
+        # Answers like a vision model asked whether there is a face, deterministically: yes for
+        # images at least face_width pixels wide, so callers can tell the answers apart
+        with Image.open(io.BytesIO(base64.b64decode(images[0]))) as image:
+            answer = 'yes' if image.width >= stub.face_width else 'no'
+        self._send(200, {'model': body.get('model'), 'response': f"{answer}, stub answer", 'done': True})
+
+    def _send(self, status: int, payload):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args):
+        pass
+
+# Stand-in for Ollama's /api/generate: answers after `latency` seconds, fails every
+# fail_every-th request with a 503, and records how many requests were in flight at once.
+class OllamaStub:
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.1, fail_every: int = 0,
+                 face_width: int = DEFAULT_FACE_WIDTH):
+        self.latency = latency
+        self.face_width = face_width
+        self.fail_every = fail_every
+        self.requests = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.stub = self
+        self.url = f"http://{host}:{self.httpd.server_address[1]}/api/generate"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="OllamaStub", daemon=True)
+
+    def begin(self) -> int:
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            if self.fail_every and self.requests % self.fail_every == 0:
+                self.failed += 1
+            return self.requests
+
+    def end(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def start(self) -> 'OllamaStub':
+        self._thread.start()
+        return self
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a stub of Ollama's /api/generate endpoint")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds per request")
+    parser.add_argument("--fail-every", type=int, default=0, help="Answer every Nth request with a 503")
+    parser.add_argument("--face-width", type=int, default=DEFAULT_FACE_WIDTH, help="Answer yes from this image width")
+    args = parser.parse_args()
+    stub = OllamaStub(port=args.port, latency=args.latency, fail_every=args.fail_every, face_width=args.face_width)
+    print(f"Serving {stub.url}")
+    try:
+        stub.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
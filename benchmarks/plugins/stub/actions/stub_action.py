@@ -0,0 +1,24 @@
+import time
+from typing import Any, Dict, List
+from image_processor import Action
+
+# Model-free action for benchmarks: waits `latency` per call plus `per_file_latency` per file
+# and returns the paths unchanged. With `bulk: false` groups are executed file by file.
+class StubAction(Action):
+    def initialize(self, config: Dict[str, Any]) -> None:
+        self.latency = float(config.get('latency', 0.0))
+        self.per_file_latency = float(config.get('per_file_latency', 0.0))
+        self.bulk = config.get('bulk', True)
+
+    def execute(self, filepaths: List[str], metadata: Dict[str, Any]) -> List[str]:
+        self._wait(self.latency + self.per_file_latency * len(filepaths))
+        return list(filepaths)
+
+    def execute_batch(self, filepaths: List[str], metadatas: List[Dict[str, Any]]) -> List[str]:
+        if not self.bulk:
+            return super().execute_batch(filepaths, metadatas)
+        return self.execute(filepaths, {})
+
+    def _wait(self, seconds: float):
+        if seconds > 0:
+            time.sleep(seconds)
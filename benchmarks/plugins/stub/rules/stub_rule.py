@@ -0,0 +1,41 @@
+import time
+import zlib
+from typing import Any, Dict, List
+from image_processor import Rule, RULE_COSTS, get_image_handle
+
+# Model-free rule for benchmarks. Latency is paid per call (plus per file for batches) by
+# sleeping, or by spinning to simulate CPU-bound work. A file passes when a hash of its path
+# falls under `selectivity`, so results are deterministic across runs.
+class StubRule(Rule):
+    def initialize(self, config: Dict[str, Any]) -> None:
+        self.latency = float(config.get('latency', 0.0))
+        self.batch_latency = float(config.get('batch_latency', self.latency))
+        self.per_file_latency = float(config.get('per_file_latency', 0.0))
+        self.selectivity = float(config.get('selectivity', 1.0))
+        self.spin = config.get('mode', 'sleep') == 'spin'
+        self.decode = config.get('decode', False)
+        self.seed = str(config.get('seed', 0))
+        self.cost = RULE_COSTS[config.get('declared_cost', 'decode')]
+
+    def apply(self, filepath: str, metadata: Dict[str, Any]) -> bool:
+        self._wait(self.latency + self.per_file_latency)
+        return self._passes(filepath, metadata)
+
+    def apply_batch(self, filepaths: List[str], metadatas: List[Dict[str, Any]]) -> List[bool]:
+        self._wait(self.batch_latency + self.per_file_latency * len(filepaths))
+        return [self._passes(filepath, metadata) for filepath, metadata in zip(filepaths, metadatas)]
+
+    def _passes(self, filepath: str, metadata: Dict[str, Any]) -> bool:
+        if self.decode:
+            get_image_handle(metadata, filepath).rgb
+        return zlib.crc32((self.seed + filepath).encode('utf-8')) % 10000 < self.selectivity * 10000
+
+    def _wait(self, seconds: float):
+        if seconds <= 0:
+            return
+        if self.spin:
+            end = time.perf_counter() + seconds
+            while time.perf_counter() < end:
+                pass
+        else:
+            time.sleep(seconds)
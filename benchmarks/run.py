@@ -0,0 +1,246 @@
+import os
+import sys
+import json
+import time
+import shutil
+import threading
+import argparse
+import tempfile
+import multiprocessing
+from typing import Any, Dict, List, Optional
+from benchmarks.dataset import generate_dataset, parse_size
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARK_DIR)
+STUB_PLUGINS_DIR = os.path.join(BENCHMARK_DIR, 'plugins')
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+
+def _rule(name: str, **params) -> Dict[str, Any]:
+    return {'plugin': 'stub/stub_rule', 'name': name, 'params': params}
+
+def _action(name: str, conditions: List[str], **params) -> Dict[str, Any]:
+    return {'plugin': 'stub/stub_action', 'name': name, 'params': params, 'conditions': conditions}
+
+# Each scenario isolates one part of the engine: per-file overhead, decoding, batched model
+# calls, and lazy evaluation of a selective condition chain
+SCENARIOS = {
+    'overhead': {
+        'general': {},
+        'rules': [_rule('meta', declared_cost='metadata')],
+        'actions': [_action('noop', ['meta'])],
+    },
+    'decode': {
+        'general': {},
+        'rules': [_rule('pixels', declared_cost='decode', decode=True)],
+        'actions': [_action('noop', ['pixels'])],
+    },
+    'model-batched': {
+        'general': {'batch_size': 8, 'action_batch_size': 32},
+        'rules': [_rule('model', declared_cost='model', latency=0.002, batch_latency=0.004, per_file_latency=0.0005)],
+        'actions': [_action('write', ['model'], latency=0.001, per_file_latency=0.0001)],
+    },
+    'selective-chain': {
+        'general': {},
+        'rules': [
+            _rule('model', declared_cost='model', latency=0.002, selectivity=0.5, seed=1),
+            _rule('pixels', declared_cost='decode', decode=True, selectivity=0.5, seed=2),
+            _rule('meta', declared_cost='metadata', selectivity=0.5, seed=3),
+        ],
+        'actions': [_action('noop', ['model', 'pixels', 'meta'])],
+    },
+}
+
+def build_config(scenario: Dict[str, Any], workers: int) -> Dict[str, Any]:
+    general = {'log_level': 'WARNING', 'plugins_dir': STUB_PLUGINS_DIR, 'stop_on_error': False, 'workers': workers}
+    general.update(scenario['general'])
+    return {
+        'general': general,
+        'processes': {'bench': {'rules': json.loads(json.dumps(scenario['rules'])),
+                                'actions': json.loads(json.dumps(scenario['actions']))}},
+    }
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+def _peak_rss_kb(pid: str = 'self') -> Optional[int]:
+    # VmHWM starts over at exec, unlike ru_maxrss, which a spawned child inherits from its parent
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def _child_pids(parent: int) -> List[int]:
+    pids = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name can contain spaces; the fields after it can't
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == parent:
+            pids.append(int(entry))
+    return pids
+
+class _WorkerPeaks(threading.Thread):
+    # Worker processes are gone by the time the run returns, so their peaks are sampled while they live
+    def __init__(self, interval: float = 0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peaks: Dict[int, int] = {}
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            for pid in _child_pids(os.getpid()):
+                peak = _peak_rss_kb(str(pid))
+                if peak is not None:
+                    self.peaks[pid] = max(peak, self.peaks.get(pid, 0))
+
+    def stop(self) -> int:
+        self._done.set()
+        self.join()
+        return sum(self.peaks.values())
+
+def _run_child(config: Dict[str, Any], source_dir: str, workdir: str, results):
+    # Runs in a fresh process so peak RSS belongs to this scenario alone
+    import resource
+    sys.path.insert(0, REPO_ROOT)
+    os.chdir(workdir)
+    # Keep the progress bar out of the report
+    sys.stderr = open(os.devnull, 'w')
+    from image_processor import ImageProcessor
+
+    latencies: List[float] = []
+
+    class BenchmarkProcessor(ImageProcessor):
+        # Every file in a batch finishes together, so its latency is the batch's wall time
+        def _process_batch(self, filepaths, metadatas=None):
+            start = time.perf_counter()
+            outcomes = super()._process_batch(filepaths, metadatas)
+            latencies.extend([time.perf_counter() - start] * len(filepaths))
+            return outcomes
+
+    processor = BenchmarkProcessor(config)
+    processor.load_plugins('bench')
+    worker_peaks = _WorkerPeaks()
+    worker_peaks.start()
+    start = time.perf_counter()
+    processor.process_images(source_dir)
+    elapsed = time.perf_counter() - start
+    processor.close()
+    workers_kb = worker_peaks.stop()
+
+    files = processor.metrics.files_done + processor.metrics.files_failed
+    own_kb = _peak_rss_kb()
+    if own_kb is None:
+        # No /proc: ru_maxrss includes the benchmark runner's peak from before the spawn
+        own_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put({
+        'files': files,
+        'elapsed': elapsed,
+        'files_per_sec': files / elapsed if elapsed else 0.0,
+        # Worker processes time their own batches, so per-file latency is only measured serially
+        'p50_ms': _ms(_percentile(latencies, 0.50)),
+        'p99_ms': _ms(_percentile(latencies, 0.99)),
+        # Workers run side by side, so their peaks add up
+        'peak_rss_mb': (own_kb + workers_kb) / 1024,
+    })
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else seconds * 1000
+
+def run_scenario(name: str, source_dir: str, workers: int = 1, repeat: int = 1) -> Dict[str, Any]:
+    context = multiprocessing.get_context('spawn')
+    runs = []
+    for _ in range(repeat):
+        workdir = tempfile.mkdtemp(prefix='sidm-bench-')
+        try:
+            results = context.Queue()
+            child = context.Process(target=_run_child, args=(build_config(SCENARIOS[name], workers), source_dir, workdir, results))
+            child.start()
+            result = results.get()
+            child.join()
+            runs.append(result)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    # Report the median run by throughput
+    runs.sort(key=lambda run: run['files_per_sec'])
+    return runs[len(runs) // 2]
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], tolerance: float) -> List[str]:
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]['files_per_sec']
+        change = (result['files_per_sec'] - before) / before if before else 0.0
+        result['vs_baseline'] = change
+        if change < -tolerance:
+            regressions.append(f"{name}: {result['files_per_sec']:.1f} files/s vs baseline {before:.1f} ({change:+.1%})")
+    return regressions
+
+def _format(value: Optional[float], spec: str) -> str:
+    return '-' if value is None else format(value, spec)
+
+def print_report(results: Dict[str, Dict[str, Any]]):
+    print(f"{'scenario':<18} {'files':>7} {'files/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'peak MB':>9} {'vs base':>9}")
+    for name, result in results.items():
+        print(f"{name:<18} {result['files']:>7} {result['files_per_sec']:>10.1f} "
+              f"{_format(result['p50_ms'], '.2f'):>9} {_format(result['p99_ms'], '.2f'):>9} "
+              f"{result['peak_rss_mb']:>9.1f} {_format(result.get('vs_baseline'), '+.1%'):>9}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark process_images with stub plugins")
+    parser.add_argument("--dataset", default=None, help="Existing image directory (default: generate one)")
+    parser.add_argument("-n", "--images", type=int, default=2000)
+    parser.add_argument("--sizes", nargs='+', default=['64x64', '640x480'])
+    parser.add_argument("--formats", nargs='+', default=['jpg', 'png'])
+    parser.add_argument("--scenarios", nargs='+', default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed files/s drop before failing")
+    args = parser.parse_args()
+
+    dataset_dir = args.dataset
+    generated = None
+    if dataset_dir is None:
+        generated = dataset_dir = tempfile.mkdtemp(prefix='sidm-dataset-')
+        print(f"Generating {args.images} images in {dataset_dir}")
+        generate_dataset(dataset_dir, args.images, [parse_size(size) for size in args.sizes], args.formats)
+
+    try:
+        results = {name: run_scenario(name, dataset_dir, args.workers, args.repeat) for name in args.scenarios}
+    finally:
+        if generated:
+            shutil.rmtree(generated, ignore_errors=True)
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, 'r') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+    print_report(results)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+    if regressions:
+        print("Throughput regressions:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import os
+import time
+import queue
+import threading
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from shards import relative_key, shard_of
+
+DEFAULT_FORMATS = ('jpeg', 'png', 'gif', 'bmp', 'webp', 'tiff')
+FORMAT_EXTENSIONS = {
+    'jpeg': ('.jpg', '.jpeg'),
+    'png': ('.png',),
+    'gif': ('.gif',),
+    'bmp': ('.bmp',),
+    'webp': ('.webp',),
+    'tiff': ('.tif', '.tiff'),
+}
+IMAGE_EXTENSIONS = tuple(ext for fmt in DEFAULT_FORMATS for ext in FORMAT_EXTENSIONS[fmt])
+
+# Leading bytes of each format; RIFF only becomes WebP with the form type at offset 8
+SIGNATURES = [
+    (b'\xff\xd8\xff', 0, 'jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 0, 'png'),
+    (b'GIF87a', 0, 'gif'),
+    (b'GIF89a', 0, 'gif'),
+    (b'BM', 0, 'bmp'),
+    (b'WEBP', 8, 'webp'),
+    (b'II*\x00', 0, 'tiff'),
+    (b'MM\x00*', 0, 'tiff'),
+]
+# Bytes a file needs before its first image data: the PNG IHDR chunk, the GIF screen
+# descriptor, the BMP file and core headers, the first WebP chunk tag, the TIFF IFD offset
+MIN_HEADER = {'jpeg': 4, 'png': 33, 'gif': 13, 'bmp': 26, 'webp': 16, 'tiff': 8}
+# End markers, looked for near the end of the file. Data appended after the marker (motion
+# photos, vendor trailers) pushes it out of reach, so this check is opt-in.
+TRAILERS = {'jpeg': b'\xff\xd9', 'png': b'IEND'}
+# Sizes of the known BMP DIB headers, which follow the 14-byte file header
+BMP_DIB_SIZES = (12, 40, 52, 56, 64, 108, 124)
+# Formats that store their total length: (offset of the little-endian uint32, bytes it leaves out)
+DECLARED_SIZE = {'bmp': (2, 0), 'webp': (4, 8)}
+SNIFF_BYTES = 64
+TAIL_BYTES = 4096
+SNIFF_BATCH = 64
+REJECT_REASONS = ('empty', 'truncated', 'unknown_format', 'disallowed_format', 'unreadable')
+
+def extensions_for(formats: Sequence[str]) -> Tuple[str, ...]:
+    return tuple(ext for fmt in formats for ext in FORMAT_EXTENSIONS[fmt])
+
+def check_formats(formats: Sequence[str]) -> Tuple[str, ...]:
+    unknown = [fmt for fmt in formats if fmt not in FORMAT_EXTENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown image formats {unknown}, expected some of {list(FORMAT_EXTENSIONS)}")
+    return tuple(formats)
+
+def sniff_format(path: str, check_trailer: bool = False) -> Tuple[Optional[str], Optional[str]]:
+    # (format, None) for a complete image, (None, reason) otherwise. Reads the first SNIFF_BYTES
+    # and, with check_trailer, the last TAIL_BYTES of formats with an end marker.
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(SNIFF_BYTES)
+            if not head:
+                return None, 'empty'
+            fmt = next((name for magic, offset, name in SIGNATURES if head[offset:offset + len(magic)] == magic), None)
+            if fmt == 'webp' and head[:4] != b'RIFF':
+                fmt = None
+            # "BM" alone starts plenty of text files
+            if fmt == 'bmp' and int.from_bytes(head[14:18], 'little') not in BMP_DIB_SIZES:
+                fmt = None
+            if fmt is None:
+                # Cut off inside the signature itself
+                if any(magic[:len(head)] == head for magic, offset, _ in SIGNATURES if offset == 0 and len(head) < len(magic)):
+                    return None, 'truncated'
+                return None, 'unknown_format'
+            if len(head) < MIN_HEADER[fmt]:
+                return None, 'truncated'
+            size = os.fstat(f.fileno()).st_size
+            if fmt in DECLARED_SIZE:
+                offset, extra = DECLARED_SIZE[fmt]
+                if int.from_bytes(head[offset:offset + 4], 'little') + extra > size:
+                    return None, 'truncated'
+            if check_trailer and fmt in TRAILERS:
+                f.seek(max(0, size - TAIL_BYTES))
+                if TRAILERS[fmt] not in f.read(TAIL_BYTES):
+                    return None, 'truncated'
+    except OSError:
+        return None, 'unreadable'
+    return fmt, None
+
+_DONE = object()
+
+# Streams image paths while the tree is still being scanned: sibling directories are scanned
+# concurrently with os.scandir and paths reach the consumer through a bounded queue. With
+# sniffing on, files are classified by their leading bytes instead of their extension; large
+# directories hand their files to the same threads in batches of SNIFF_BATCH, so the reads
+# overlap instead of running one after another.
+class DirectoryScanner:
+    def __init__(self, source_dir: str, extensions: Optional[Tuple[str, ...]] = None,
+                 threads: int = 4, queue_size: int = 10000, recursive: bool = True,
+                 shard: Optional[Tuple[int, int]] = None, formats: Sequence[str] = DEFAULT_FORMATS,
+                 sniff: bool = True, check_trailer: bool = False):
+        self.source_dir = source_dir
+        self.formats = check_formats(formats)
+        self.extensions = tuple(ext.lower() for ext in (extensions or extensions_for(self.formats)))
+        self.threads = max(1, threads)
+        self.recursive = recursive
+        # (index, count): only images whose relative path hashes to this shard are yielded
+        self.shard = shard
+        self.sniff = sniff
+        self.check_trailer = check_trailer
+        self.files_found = 0
+        self.images_found = 0
+        self.other_shards = 0
+        self.errors = 0
+        # Files sniffing turned away, by reason
+        self.rejected: Dict[str, int] = {reason: 0 for reason in REJECT_REASONS}
+        self.finished = False
+        # Seconds the scan threads spent per directory or sniff batch (summed), and wall time until the scan completed
+        self.scan_time = 0.0
+        self.wall_time = 0.0
+        self._start_time = 0.0
+        self._paths = queue.Queue(maxsize=queue_size)
+        # Directories to scan and batches of files to sniff
+        self._work = queue.Queue()
+        self._pending_work = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._started = False
+
+    def __iter__(self) -> Iterator[str]:
+        self._start()
+        while True:
+            item = self._paths.get()
+            if item is _DONE:
+                self.finished = True
+                self.wall_time = time.perf_counter() - self._start_time
+                return
+            yield item
+
+    def stats(self) -> Dict[str, float]:
+        return {'files_found': self.files_found, 'images_found': self.images_found, 'errors': self.errors,
+                'scan_time': self.scan_time, 'wall_time': self.wall_time, 'finished': int(self.finished),
+                **{f'rejected_{reason}': count for reason, count in self.rejected.items()}}
+
+    def close(self):
+        # Lets scan threads blocked on a full queue exit when the consumer stops early
+        self._stop.set()
+
+    def _start(self):
+        if self._started:
+            raise RuntimeError("DirectoryScanner can only be iterated once")
+        self._started = True
+        self._start_time = time.perf_counter()
+        self._pending_work = 1
+        self._work.put(self.source_dir)
+        for i in range(self.threads):
+            threading.Thread(target=self._scan_loop, name=f"DirectoryScanner-{i}", daemon=True).start()
+
+    def _scan_loop(self):
+        while not self._stop.is_set():
+            item = self._work.get()
+            if item is _DONE:
+                return
+            start = time.perf_counter()
+            try:
+                if isinstance(item, list):
+                    self._sniff_batch(item)
+                else:
+                    self._scan_directory(item)
+            finally:
+                with self._lock:
+                    self.scan_time += time.perf_counter() - start
+                    self._pending_work -= 1
+                    finished = self._pending_work == 0
+                if finished:
+                    for _ in range(self.threads):
+                        self._work.put(_DONE)
+                    self._put(_DONE)
+
+    def _scan_directory(self, directory: str):
+        candidates: List[str] = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if self._stop.is_set():
+                        return
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if is_dir:
+                        # Like os.walk, symlinked directories are not followed
+                        if self.recursive and not entry.is_symlink():
+                            self._submit(entry.path)
+                        continue
+                    with self._lock:
+                        self.files_found += 1
+                    # Sniffing looks at every file, so images with a wrong extension are found too
+                    if not self.sniff and not entry.name.lower().endswith(self.extensions):
+                        continue
+                    # Before sniffing, so files of other shards are never opened
+                    if self.shard is not None and shard_of(relative_key(entry.path, self.source_dir), self.shard[1]) != self.shard[0]:
+                        with self._lock:
+                            self.other_shards += 1
+                        continue
+                    if not self.sniff:
+                        with self._lock:
+                            self.images_found += 1
+                        self._put(entry.path)
+                        continue
+                    candidates.append(entry.path)
+                    if len(candidates) >= SNIFF_BATCH:
+                        self._submit(candidates)
+                        candidates = []
+        except OSError:
+            with self._lock:
+                self.errors += 1
+        # The last partial batch is sniffed right here
+        self._sniff_batch(candidates)
+
+    def _sniff_batch(self, paths: List[str]):
+        for path in paths:
+            if self._stop.is_set():
+                return
+            fmt, reason = sniff_format(path, self.check_trailer)
+            if fmt is not None and fmt not in self.formats:
+                reason = 'disallowed_format'
+            with self._lock:
+                if reason is not None:
+                    self.rejected[reason] += 1
+                    continue
+                self.images_found += 1
+            self._put(path)
+
+    def _submit(self, item):
+        with self._lock:
+            self._pending_work += 1
+        self._work.put(item)
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._paths.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
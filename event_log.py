@@ -0,0 +1,168 @@
+import json
+import time
+import queue
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+WARNING = logging.WARNING
+ERROR = logging.ERROR
+LEVELS = {'DEBUG': DEBUG, 'INFO': INFO, 'WARNING': WARNING, 'ERROR': ERROR, 'CRITICAL': logging.CRITICAL}
+
+DEFAULT_RING_SIZE = 10000
+DEFAULT_WRITER_QUEUE_SIZE = 10000
+
+_STOP = object()
+
+def parse_level(level: Any) -> int:
+    # A level name in any case, or a logging level number
+    if isinstance(level, int) and not isinstance(level, bool) and level in LEVELS.values():
+        return level
+    if isinstance(level, str) and level.upper() in LEVELS:
+        return LEVELS[level.upper()]
+    raise ValueError(f"Unknown log_level {level!r}, expected one of {list(LEVELS)}")
+
+class Event:
+    __slots__ = ('time', 'level', 'message', 'args', 'fields', '_text')
+
+    def __init__(self, level: int, message: str, args: Tuple = (), fields: Optional[Dict[str, Any]] = None,
+                 timestamp: Optional[float] = None):
+        self.time = time.time() if timestamp is None else timestamp
+        self.level = level
+        self.message = message
+        self.args = args
+        self.fields = fields or {}
+        self._text = None
+
+    @property
+    def text(self) -> str:
+        # %-style arguments are only formatted when something reads the message
+        if self._text is None:
+            try:
+                self._text = self.message % self.args if self.args else str(self.message)
+            except (TypeError, ValueError):
+                self._text = f"{self.message} {self.args}"
+        return self._text
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'time': self.time, 'level': logging.getLevelName(self.level), 'message': self.text, **self.fields}
+
+    def to_record(self) -> Tuple[float, int, str, Dict[str, Any]]:
+        # Picklable form for shipping events from worker processes
+        return self.time, self.level, self.text, self.fields
+
+# Streams events to a JSONL file from a background thread. The queue is bounded, so a slow
+# disk slows logging down instead of buffering without limit.
+class JsonlWriter:
+    def __init__(self, path: str, queue_size: int = DEFAULT_WRITER_QUEUE_SIZE):
+        self.path = path
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._file = open(path, 'a', encoding='utf-8')
+        self._thread = threading.Thread(target=self._run, name="JsonlWriter", daemon=True)
+        self._thread.start()
+
+    def write(self, event: Event):
+        self._queue.put(event)
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._file.close()
+
+    def _run(self):
+        while True:
+            event = self._queue.get()
+            if event is _STOP:
+                self._file.flush()
+                return
+            self._file.write(json.dumps(event.to_dict(), default=str) + '\n')
+            if self._queue.empty():
+                self._file.flush()
+
+# Leveled event sink: keeps the most recent events in a ring buffer, optionally echoes them to
+# stdout and streams them to a JSONL file. Events below the level are dropped before any
+# formatting happens.
+class EventLog:
+    def __init__(self, ring_size: int = DEFAULT_RING_SIZE, level: int = INFO):
+        self.level = level
+        self.echo = False
+        self._ring = deque(maxlen=ring_size)
+        self._writer: Optional[JsonlWriter] = None
+        self._capture: Optional[List[Event]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def effective_level(self) -> int:
+        # Echoing is the detailed --log mode, so it shows everything
+        return DEBUG if self.echo else self.level
+
+    def configure(self, level: Optional[Any] = None, ring_size: Optional[int] = None, path: Optional[str] = None):
+        with self._lock:
+            if level is not None:
+                self.level = parse_level(level)
+            if ring_size is not None and ring_size != self._ring.maxlen:
+                self._ring = deque(self._ring, maxlen=ring_size)
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            writer.close()
+        if path:
+            with self._lock:
+                self._writer = JsonlWriter(path)
+
+    def enabled_for(self, level: int) -> bool:
+        return level >= self.effective_level
+
+    def emit(self, level: int, message: str, args: Tuple = (), fields: Optional[Dict[str, Any]] = None,
+             timestamp: Optional[float] = None, echo: bool = True):
+        if level < self.effective_level:
+            return
+        event = Event(level, message, args, fields, timestamp)
+        with self._lock:
+            self._ring.append(event)
+            if self._capture is not None:
+                self._capture.append(event)
+            writer = self._writer
+        if writer is not None:
+            writer.write(event)
+        if self.echo and echo:
+            print(event.text)
+
+    def recent(self, limit: Optional[int] = None) -> List[str]:
+        with self._lock:
+            events = list(self._ring)
+        if limit is not None:
+            events = events[-limit:]
+        return [event.text for event in events]
+
+    def start_capture(self):
+        with self._lock:
+            self._capture = []
+
+    def take_captured(self) -> List[Tuple[float, int, str, Dict[str, Any]]]:
+        with self._lock:
+            captured, self._capture = self._capture or [], []
+        return [event.to_record() for event in captured]
+
+    def replay(self, records: List[Tuple[float, int, str, Dict[str, Any]]]):
+        # Events from worker processes were already echoed there
+        for timestamp, level, text, fields in records:
+            self.emit(level, text, (), fields, timestamp, echo=False)
+
+    def close(self):
+        with self._lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            writer.close()
+
+event_log = EventLog()
+
+def log_message(message: str, *args, level: int = INFO, **fields):
+    # Pass %-style args instead of an f-string so filtered-out events cost nothing to format
+    if level >= event_log.effective_level:
+        event_log.emit(level, message, args, fields)
+
+def set_logging(enabled: bool):
+    event_log.echo = enabled
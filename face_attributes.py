@@ -0,0 +1,59 @@
+from typing import Any, Dict, List, Union
+from event_log import log_message
+from image_handle import get_image_handle
+from lazy_import import lazy_import
+
+DeepFace = lazy_import('deepface.DeepFace')
+
+# apply and apply_batch of the DeepFace attribute rules (age, gender, race, emotion). A rule mixes
+# this in ahead of Rule, sets `attribute` to the DeepFace action and `detector_backend` in
+# initialize, and implements _matches(filepath, face) for the first face found. Not a Rule itself,
+# so plugin loading never mistakes it for the rule a module defines.
+class FaceAttributeAnalysis:
+    attribute = ''
+    detector_backend = 'opencv'
+
+    def warmup(self) -> None:
+        # DeepFace is imported here rather than in the rule's module, where the default warmup looks
+        DeepFace.load()
+        super().warmup()
+
+    def apply(self, filepath: str, metadata: Dict[str, Any]) -> Any:
+        try:
+            faces = self._analyze(get_image_handle(metadata, filepath).bgr)
+        except Exception as e:
+            log_message(f"Error analyzing {self.attribute} in {filepath}: {str(e)}")
+            raise
+        return self._first_face(filepath, faces)
+
+    def apply_batch(self, filepaths: List[str], metadatas: List[Dict[str, Any]]) -> List[Any]:
+        images = [get_image_handle(metadata, filepath).bgr for filepath, metadata in zip(filepaths, metadatas)]
+        try:
+            # DeepFace releases with batch support return one list of faces per input image
+            results = self._analyze(images)
+            if len(results) != len(images) or not all(isinstance(result, list) for result in results):
+                raise ValueError("expected one result list per image")
+        except Exception as e:
+            log_message(f"Batched {self.attribute} analysis failed, analyzing one image at a time: {str(e)}")
+            return [self._apply_one(filepath, metadata) for filepath, metadata in zip(filepaths, metadatas)]
+        return [self._first_face(filepath, faces) for filepath, faces in zip(filepaths, results)]
+
+    def _analyze(self, img_path):
+        return DeepFace.analyze(img_path=img_path, actions=[self.attribute], detector_backend=self.detector_backend,
+                                enforce_detection=False)
+
+    def _apply_one(self, filepath: str, metadata: Dict[str, Any]) -> Union[Any, Exception]:
+        # An exception in place of a result fails just that file
+        try:
+            return self.apply(filepath, metadata)
+        except Exception as e:
+            return e
+
+    def _first_face(self, filepath: str, faces: List[Dict[str, Any]]) -> Any:
+        if not faces:
+            log_message(f"No face detected in {filepath}")
+            return False
+        return self._matches(filepath, faces[0])
+
+    def _matches(self, filepath: str, face: Dict[str, Any]) -> Any:
+        raise NotImplementedError
@@ -0,0 +1,87 @@
+import math
+import itertools
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_CAPACITY = 1_000_000
+
+# int.bit_count needs Python 3.10
+_popcount = getattr(int, 'bit_count', None) or (lambda value: bin(value).count('1'))
+
+def _split(bits: int, parts: int) -> List[Tuple[int, int]]:
+    # (shift, width) of parts near-equal bit ranges covering bits
+    chunks = []
+    shift = 0
+    for i in range(parts):
+        width = bits // parts + (1 if i < bits % parts else 0)
+        chunks.append((shift, width))
+        shift += width
+    return chunks
+
+def _probe_count(width: int, radius: int) -> int:
+    # math.comb needs Python 3.8
+    return sum(math.factorial(width) // (math.factorial(k) * math.factorial(width - k))
+               for k in range(min(radius, width) + 1))
+
+def _plan(bits: int, radius: int, capacity: int) -> List[Tuple[int, int]]:
+    # Splitting the hash into m chunks, any hash within radius matches at least one chunk within
+    # radius // m (pigeonhole). More chunks mean fewer probes per lookup but larger buckets to
+    # verify; pick the split with the fewest expected probes plus candidates at capacity entries.
+    best, best_cost = None, None
+    for parts in range(1, min(radius + 1, bits) + 1):
+        chunks = _split(bits, parts)
+        probes = [_probe_count(width, radius // parts) for _, width in chunks]
+        cost = sum(count * (1 + capacity / 2 ** width) for count, (_, width) in zip(probes, chunks))
+        if best_cost is None or cost < best_cost:
+            best, best_cost = chunks, cost
+    return best
+
+def _flip_masks(width: int, radius: int) -> List[int]:
+    # Every value within radius bit flips of 0, nearest first
+    return [sum(1 << bit for bit in flipped)
+            for k in range(min(radius, width) + 1) for flipped in itertools.combinations(range(width), k)]
+
+# Near-duplicate lookup over packed perceptual hashes (multi-index hashing). Each hash is cut into
+# chunks with one exact-match table per chunk; a lookup probes the buckets within the chunk radius
+# and checks only the hashes found there, instead of comparing against every stored hash.
+class HammingIndex:
+    def __init__(self, bits: int, radius: int, capacity: int = DEFAULT_CAPACITY):
+        self.bits = bits
+        self.radius = max(0, radius)
+        self._chunks = _plan(bits, self.radius, max(1, capacity))
+        chunk_radius = self.radius // len(self._chunks)
+        masks: Dict[int, List[int]] = {}
+        self._probes = [(shift, (1 << width) - 1, masks.setdefault(width, _flip_masks(width, chunk_radius)))
+                        for shift, width in self._chunks]
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in self._chunks]
+        self._hashes: List[int] = []
+        self._values: List[Any] = []
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def add(self, hash: int, value: Any):
+        entry = len(self._hashes)
+        self._hashes.append(hash)
+        self._values.append(value)
+        for (shift, mask, _), table in zip(self._probes, self._tables):
+            table.setdefault((hash >> shift) & mask, []).append(entry)
+
+    def find(self, hash: int) -> Optional[Tuple[int, Any]]:
+        # (distance, value) of the earliest added hash within radius, like a scan in insertion order
+        found = None
+        for (shift, mask, flips), table in zip(self._probes, self._tables):
+            part = (hash >> shift) & mask
+            for flip in flips:
+                for entry in table.get(part ^ flip, ()):
+                    # Buckets are in insertion order
+                    if found is not None and entry >= found:
+                        break
+                    if _popcount(hash ^ self._hashes[entry]) <= self.radius:
+                        found = entry
+                        break
+        if found is None:
+            return None
+        return _popcount(hash ^ self._hashes[found]), self._values[found]
+
+    def items(self) -> Iterator[Tuple[int, Any]]:
+        return zip(self._hashes, self._values)
@@ -0,0 +1,194 @@
+import io
+import os
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Optional
+import numpy as np
+from PIL import Image, ImageOps
+
+DEFAULT_DOWNSCALE_SIZE = 512
+
+# EXIF tags read by the header probe
+EXIF_ORIENTATION = 0x0112
+EXIF_DATETIME = 0x0132
+EXIF_IFD = 0x8769
+EXIF_DATETIME_ORIGINAL = 0x9003
+# getexif only reads the header of these; on PNG it decodes the image to find a trailing eXIf chunk
+EXIF_HEADER_FORMATS = ('JPEG', 'MPO', 'TIFF', 'WEBP')
+
+# Bytes of image files read by every handle in this process, for the run metrics
+_bytes_read = 0
+_bytes_lock = threading.Lock()
+
+def bytes_read() -> int:
+    return _bytes_read
+
+def _count_bytes(count: int):
+    global _bytes_read
+    with _bytes_lock:
+        _bytes_read += count
+
+# Lazily decodes one file and memoizes every representation plugins ask for, so a file is
+# read and decoded once per pass no matter how many rules and actions look at its pixels.
+# The arrays are shared between plugins: copy them before modifying anything in place.
+class ImageHandle:
+    def __init__(self, filepath: str, downscale_size: int = DEFAULT_DOWNSCALE_SIZE):
+        self.filepath = filepath
+        self.downscale_size = downscale_size
+        self._cache: Dict[Any, Any] = {}
+        self._lock = threading.RLock()
+
+    def _memoize(self, key, factory: Callable[[], Any]):
+        with self._lock:
+            if key not in self._cache:
+                self._cache[key] = factory()
+            return self._cache[key]
+
+    @property
+    def data(self) -> bytes:
+        return self._memoize('data', self._read)
+
+    @property
+    def content_hash(self) -> str:
+        # The bytes stay cached, so hashing does not cost a second read when the file is decoded
+        return self._memoize('content_hash', lambda: hashlib.blake2b(self.data, digest_size=20).hexdigest())
+
+    @property
+    def pil(self) -> Image.Image:
+        return self._memoize('pil', self._decode)
+
+    @property
+    def header(self) -> Dict[str, Any]:
+        return self._memoize('header', lambda: probe_header(self.filepath))
+
+    @property
+    def frames(self) -> Optional[int]:
+        # Counted apart from the header: GIF and animated WebP have to seek through every frame
+        return self._memoize('frames', lambda: count_frames(self.filepath))
+
+    @property
+    def size(self):
+        # Only the header is read unless the pixels have already been decoded
+        with self._lock:
+            if 'pil' in self._cache:
+                return self._cache['pil'].size
+        header = self.header
+        if header['width'] is None:
+            # Not an image: decode so the caller gets PIL's error
+            return self.pil.size
+        return header['width'], header['height']
+
+    @property
+    def rgb_image(self) -> Image.Image:
+        # Upright like cv2.imread, which the face rules used before: it applies EXIF orientation
+        return self._memoize('rgb_image', self._upright_rgb)
+
+    @property
+    def rgb(self) -> np.ndarray:
+        return self._memoize('rgb', lambda: np.asarray(self.rgb_image))
+
+    @property
+    def bgr(self) -> np.ndarray:
+        # Channel order expected by OpenCV and DeepFace
+        return self._memoize('bgr', lambda: np.ascontiguousarray(self.rgb[:, :, ::-1]))
+
+    def downscaled(self, max_size: Optional[int] = None) -> Image.Image:
+        max_size = max_size or self.downscale_size
+        return self._memoize(('downscaled', max_size), lambda: self._downscale(max_size))
+
+    def is_valid(self) -> bool:
+        try:
+            self.pil
+            return True
+        except Exception:
+            return False
+
+    def invalidate(self):
+        # Call after rewriting the file in place so later plugins see the new pixels
+        with self._lock:
+            self._release()
+
+    def close(self):
+        with self._lock:
+            self._release()
+
+    def _read(self) -> bytes:
+        with open(self.filepath, 'rb') as f:
+            data = f.read()
+        _count_bytes(len(data))
+        return data
+
+    def _decode(self) -> Image.Image:
+        if 'data' in self._cache:
+            img = Image.open(io.BytesIO(self._cache['data']))
+        else:
+            img = Image.open(self.filepath)
+            _count_bytes(os.path.getsize(self.filepath))
+        img.load()
+        return img
+
+    def _upright_rgb(self) -> Image.Image:
+        img = self.pil
+        # exif_transpose copies even upright images, so only call it when there is a rotation
+        if img.getexif().get(EXIF_ORIENTATION, 1) not in (0, 1):
+            img = ImageOps.exif_transpose(img)
+        return img if img.mode == 'RGB' else img.convert('RGB')
+
+    def _downscale(self, max_size: int) -> Image.Image:
+        img = self.rgb_image
+        if max(img.size) <= max_size:
+            return img
+        small = img.copy()
+        small.thumbnail((max_size, max_size), Image.LANCZOS)
+        return small
+
+    def _release(self):
+        for value in self._cache.values():
+            if isinstance(value, Image.Image):
+                value.close()
+        self._cache.clear()
+
+def _header_exif(img: Image.Image) -> Image.Exif:
+    if img.format in EXIF_HEADER_FORMATS:
+        return img.getexif()
+    # Only the EXIF chunks that precede the pixel data, as Image.open left them in info
+    exif = Image.Exif()
+    data = img.info.get('exif')
+    if data:
+        exif.load(data)
+    return exif
+
+def count_frames(filepath: str) -> Optional[int]:
+    try:
+        with Image.open(filepath) as img:
+            return getattr(img, 'n_frames', 1)
+    except Exception:
+        return None
+
+def probe_header(filepath: str, frames: bool = False) -> Dict[str, Any]:
+    # Image.open parses the container header without decoding pixels; EXIF sits in the header
+    # of the formats that carry it. Fields are None for files PIL can't identify, and frames is
+    # only counted when asked for.
+    header = {'format': None, 'width': None, 'height': None, 'mode': None, 'frames': None,
+              'orientation': None, 'taken_at': None}
+    try:
+        with Image.open(filepath) as img:
+            header.update(format=img.format, width=img.width, height=img.height, mode=img.mode)
+            if frames:
+                header['frames'] = getattr(img, 'n_frames', 1)
+            exif = _header_exif(img)
+            header['orientation'] = exif.get(EXIF_ORIENTATION)
+            taken_at = exif.get_ifd(EXIF_IFD).get(EXIF_DATETIME_ORIGINAL) or exif.get(EXIF_DATETIME)
+            if taken_at:
+                header['taken_at'] = str(taken_at).strip('\x00 ') or None
+    except Exception:
+        pass
+    return header
+
+def get_image_handle(metadata: Optional[Dict[str, Any]], filepath: str) -> ImageHandle:
+    # Plugins can also run outside the engine or on a path an earlier action produced;
+    # only reuse the shared handle when it belongs to this exact file.
+    handle = (metadata or {}).get('image')
+    if isinstance(handle, ImageHandle) and handle.filepath == filepath:
+        return handle
+    return ImageHandle(filepath)
@@ -1,89 +1,429 @@
 import os
+import json
+import time
+import hashlib
 import logging
+import re
+import sys
 import importlib.util
-from typing import Dict, List, Any
+import multiprocessing
+import multiprocessing.util
+import threading
+import signal
+from typing import Dict, List, Any, Optional, Iterator, Tuple, Union
 from abc import ABC, abstractmethod
 from tqdm import tqdm
+from discovery import DEFAULT_FORMATS, DirectoryScanner
+from image_handle import ImageHandle, get_image_handle, bytes_read, DEFAULT_DOWNSCALE_SIZE
+from rule_scheduler import RuleScheduler
+from rule_cache import RuleCache, params_hash, DEFAULT_CACHE_PATH, DEFAULT_MAX_SIZE_MB
+from journal import Journal, OUTCOME_DONE, OUTCOME_ERROR, DEFAULT_JOURNAL_DIR, DEFAULT_BATCH_SIZE
+from model_registry import model_registry, model_key
+from lazy_import import LazyModule, lazy_import, import_times
+from event_log import event_log, log_message, set_logging, parse_level, DEBUG, INFO, WARNING, ERROR
+from metrics import Metrics, PluginProfiler
+from prefetch import Prefetcher, DEFAULT_WINDOW, DEFAULT_THREADS, DEFAULT_MAX_MEMORY_MB, DEFAULT_VIEWS
+from watcher import FolderWatcher, DEFAULT_SETTLE_SECONDS, DEFAULT_POLL_INTERVAL, DEFAULT_MAX_WAIT
+from server import JobServer, DEFAULT_HOST, DEFAULT_PORT, DEFAULT_MAX_BATCH, DEFAULT_MAX_WAIT_MS, DEFAULT_MAX_BODY_MB
+from results import ResultsWriter, RuleResult, DEFAULT_RESULTS_DIR, DEFAULT_FORMAT, DEFAULT_BATCH_ROWS
+from hamming_index import HammingIndex, DEFAULT_CAPACITY as DEFAULT_INDEX_CAPACITY
+from perceptual_hash import PerceptualHasher, DEFAULT_THREADS as DEFAULT_HASH_THREADS
+from face_attributes import FaceAttributeAnalysis
+from shards import ManifestWriter, parse_shard, manifest_path, merge_manifests, DEFAULT_MANIFEST_DIR
 
-global_log = []
-logging_enabled = False
+# Declared rule costs, cheapest first: rules are evaluated in this order
+COST_METADATA = 0  # filename, stat results
+COST_HEADER = 1    # container header only
+COST_DECODE = 2    # full pixel decode
+COST_MODEL = 3     # model inference or remote calls
+# Seconds the parent waits for workers to finish their in-flight batches and flush
+WORKER_FINISH_TIMEOUT = 300
 
-def set_logging(enabled: bool):
-    global logging_enabled
-    logging_enabled = enabled
-
-def log_message(message: str):
-    global_log.append(message)
-    if logging_enabled:
-        print(message)
+RULE_COSTS = {'metadata': COST_METADATA, 'header': COST_HEADER, 'decode': COST_DECODE, 'model': COST_MODEL}
 
 class Plugin(ABC):
     @abstractmethod
     def initialize(self, config: Dict[str, Any]) -> None:
         pass
 
+    # Pay deferred costs up front; called from a background thread with --warmup.
+    # By default this imports the plugin module's lazy_import modules.
+    def warmup(self) -> None:
+        module = sys.modules.get(type(self).__module__)
+        for value in list(vars(module).values()) if module is not None else []:
+            if isinstance(value, LazyModule):
+                value.load()
+
+    # Release shared resources, e.g. model leases; called when the processor shuts down
+    def close(self) -> None:
+        pass
+
+    # JSON-serializable state that only means something across the whole dataset, e.g. the hashes
+    # a duplicate finder has seen. A sharded run stores it in its manifest, and merging hands
+    # every shard's state to merge_shards() on a freshly initialized instance. A run with worker
+    # processes merges the workers' states the same way when it ends.
+    def shard_state(self) -> Any:
+        return None
+
+    def merge_shards(self, states: List[Any]) -> None:
+        pass
+
 class Rule(Plugin):
+    cost = COST_DECODE
+
     @abstractmethod
     def apply(self, filepath: str, metadata: Dict[str, Any]) -> bool:
         pass
 
+    # Override to evaluate a micro-batch of files in one call, e.g. one batched model forward pass.
+    # An exception in place of a result fails just that file.
+    def apply_batch(self, filepaths: List[str], metadatas: List[Dict[str, Any]]) -> List[bool]:
+        return [self.apply(filepath, metadata) for filepath, metadata in zip(filepaths, metadatas)]
+
 class Action(Plugin):
     @abstractmethod
     def execute(self, filepaths: List[str], metadata: Dict[str, Any]) -> List[str]:
         pass
 
+    # Override to handle a whole group of files in one call; must return one path per input.
+    # An exception in place of a path fails just that file, so files the action already moved
+    # or wrote keep their new paths. The default keeps per-file semantics.
+    def execute_batch(self, filepaths: List[str], metadatas: List[Dict[str, Any]]) -> List[Union[str, Exception]]:
+        results = []
+        for filepath, metadata in zip(filepaths, metadatas):
+            try:
+                results.append(self.execute([filepath], metadata)[0])
+            except Exception as e:
+                results.append(e)
+        return results
+
 class PluginLoader:
     @staticmethod
     def load_plugin(plugin_file: str, base_class: type) -> Plugin:
-        spec = importlib.util.spec_from_file_location("plugin", plugin_file)
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
+        module = PluginLoader._load_module(plugin_file)
         for item in dir(module):
             obj = getattr(module, item)
             if isinstance(obj, type) and issubclass(obj, base_class) and obj != base_class:
                 return obj()
         raise ValueError(f"No valid plugin found in {plugin_file}")
 
+    @staticmethod
+    def _load_module(plugin_file: str):
+        # Each file is executed once under its own module name, so plugins used by several
+        # rules or processes share one module and its module-level state
+        module_name = "sidm_plugin_" + re.sub(r'\W', '_', os.path.abspath(plugin_file))
+        if module_name in sys.modules:
+            return sys.modules[module_name]
+        spec = importlib.util.spec_from_file_location(module_name, plugin_file)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            del sys.modules[module_name]
+            raise
+        return module
+
 class Process:
-    def __init__(self, name: str, rules: List[Dict[str, Any]], actions: List[Dict[str, Any]]):
+    def __init__(self, name: str, rules: List[Dict[str, Any]], actions: List[Dict[str, Any]], lazy: bool = True,
+                 adaptive: bool = False, cache: Optional[RuleCache] = None, cache_min_cost: int = COST_MODEL,
+                 action_batch_size: int = 1, metrics: Optional[Metrics] = None,
+                 profiler: Optional[PluginProfiler] = None):
         self.name = name
         self.rules = rules
         self.actions = actions
+        self.lazy = lazy
+        self.action_batch_size = max(1, action_batch_size)
+        self.metrics = metrics
+        self.profiler = profiler
+        self.rules_by_name = {rule['config']['name']: rule for rule in rules}
+        self.cache = cache
+        # Rules with the same plugin and params give the same answer, whichever process they are in
+        self.rule_signatures = {
+            rule_name: f"{rule['config']['plugin']}:{params_hash(rule['config'].get('params', {}))}"
+            for rule_name, rule in self.rules_by_name.items()
+        }
+        # Cheap rules cost less than hashing the file, so by default only expensive ones are cached
+        self.cached_rules = {
+            rule_name: params_hash(rule['config'].get('params', {}))
+            for rule_name, rule in self.rules_by_name.items()
+            if rule['config'].get('cache', self._rule_cost(rule) >= cache_min_cost)
+        }
+        self.scheduler = None
+        if adaptive:
+            self.scheduler = RuleScheduler(
+                {rule_name: self._rule_cost(rule) for rule_name, rule in self.rules_by_name.items()},
+                {rule_name: rule['config']['plugin'] for rule_name, rule in self.rules_by_name.items()},
+            )
+        # Stable sort: rules of equal cost keep their declared order
+        self.ordered_rules = sorted(self.rules_by_name, key=lambda rule_name: self._rule_cost(self.rules_by_name[rule_name]))
+        self.action_conditions = []
+        for action in actions:
+            conditions = action['config'].get('conditions', [])
+            unknown = [condition for condition in conditions if condition not in self.rules_by_name]
+            if unknown:
+                log_message(f"Action {action['config']['name']} in process '{name}' references unknown rules {unknown}; it will never run")
+                self.action_conditions.append(None)
+            else:
+                self.action_conditions.append(sorted(set(conditions), key=self.ordered_rules.index))
+        self.has_unconditional_action = any(conditions == [] for conditions in self.action_conditions)
+
+    @staticmethod
+    def _rule_cost(rule: Dict[str, Any]) -> int:
+        if 'cost' in rule['config']:
+            return RULE_COSTS[rule['config']['cost']]
+        return rule['instance'].cost
 
     def apply(self, filepath: str, metadata: Dict[str, Any]) -> Dict[str, bool]:
-        results = {}
-        for rule in self.rules:
-            rule_name = rule['config']['name']
+        return self.apply_batch([filepath], [metadata])[0]
+
+    def apply_batch(self, filepaths: List[str], metadatas: List[Dict[str, Any]]) -> List[Dict[str, bool]]:
+        results = [{} for _ in filepaths]
+        every_file = list(range(len(filepaths)))
+        if not self.lazy:
+            for rule_name in self.rules_by_name:
+                self._evaluate(rule_name, every_file, filepaths, metadatas, results)
+            return results
+
+        # Only evaluate the rules some action's conditions need, cheapest first,
+        # and drop a file from each conjunction at its first failing rule
+        for conditions in self.action_conditions:
+            if conditions is None:
+                continue
+            if self.scheduler:
+                conditions = self.scheduler.conjunction_order(conditions)
+            candidates = every_file
+            for condition in conditions:
+                self._evaluate(condition, candidates, filepaths, metadatas, results)
+                candidates = [i for i in candidates if results[i][condition]]
+                if not candidates:
+                    break
+
+        # Unconditional actions run when any rule passes, so look for one passing rule per file
+        if self.has_unconditional_action:
+            pending = [i for i in every_file if not any(results[i].values())]
+            rule_order = self.scheduler.disjunction_order(self.ordered_rules) if self.scheduler else self.ordered_rules
+            for rule_name in rule_order:
+                if not pending:
+                    break
+                self._evaluate(rule_name, pending, filepaths, metadatas, results)
+                pending = [i for i in pending if not results[i][rule_name]]
+        return results
+
+    def _evaluate(self, rule_name: str, indices: List[int], filepaths: List[str], metadatas: List[Dict[str, Any]],
+                  results: List[Dict[str, bool]]):
+        todo = [i for i in indices if rule_name not in results[i]]
+        if not todo:
+            return
+        start = time.perf_counter()
+        rule = self.rules_by_name[rule_name]
+        signature = self.rule_signatures[rule_name]
+        cost = self._rule_cost(rule)
+        cache_keys = {}
+        misses = []
+        for i in todo:
+            # Another process, or another rule of this one, may already have evaluated it for this file
+            shared = metadatas[i].setdefault('rule_results', {})
+            if signature in shared:
+                results[i][rule_name] = shared[signature][0]
+                if self.metrics is not None:
+                    self.metrics.count_shared(1)
+                log_message("Shared result for rule %s on %s: %s", rule_name, filepaths[i], shared[signature][0], level=DEBUG)
+                continue
+            cache_keys[i] = self._cache_key(rule_name, filepaths[i], metadatas[i])
+            found, cached = self.cache.get(cache_keys[i]) if cache_keys[i] is not None else (False, None)
+            if found:
+                results[i][rule_name] = cached
+                shared[signature] = (cached, cost)
+                log_message("Cached result for rule %s on %s: %s", rule_name, filepaths[i], cached, level=DEBUG)
+            else:
+                misses.append(i)
+
+        if misses:
+            outcomes = self._apply_rule(rule_name, [filepaths[i] for i in misses], [metadatas[i] for i in misses])
+            for i, (value, succeeded) in zip(misses, outcomes):
+                results[i][rule_name] = value
+                if succeeded:
+                    metadatas[i]['rule_results'][signature] = (value, cost)
+                if succeeded and cache_keys[i] is not None:
+                    self.cache.put(cache_keys[i], value)
+
+        if self.scheduler:
+            elapsed = (time.perf_counter() - start) / len(todo)
+            for i in todo:
+                self.scheduler.record(rule_name, elapsed, bool(results[i][rule_name]))
+
+    def _cache_key(self, rule_name: str, filepath: str, metadata: Dict[str, Any]) -> Optional[str]:
+        if self.cache is None or rule_name not in self.cached_rules:
+            return None
+        try:
+            content_hash = get_image_handle(metadata, filepath).content_hash
+        except OSError:
+            return None
+        return RuleCache.make_key(content_hash, self.rules_by_name[rule_name]['config']['plugin'], self.cached_rules[rule_name])
+
+    def _call_plugin(self, key: Tuple[str, str, str, str], func, *args):
+        if self.profiler is not None:
+            return self.profiler.call(key, func, *args)
+        return func(*args)
+
+    def _observe(self, key: Tuple[str, str, str, str], start: float, outcomes: List[Tuple[Any, bool]]):
+        if self.metrics is not None:
+            self.metrics.observe(key, time.perf_counter() - start, files=len(outcomes),
+                                 passes=sum(1 for value, succeeded in outcomes if succeeded and value),
+                                 errors=sum(1 for _, succeeded in outcomes if not succeeded))
+
+    def _apply_rule(self, rule_name: str, filepaths: List[str], metadatas: List[Dict[str, Any]]) -> List[Tuple[Any, bool]]:
+        instance = self.rules_by_name[rule_name]['instance']
+        key = (self.name, 'rule', rule_name, self.rules_by_name[rule_name]['config']['plugin'])
+        if len(filepaths) > 1:
+            start = time.perf_counter()
             try:
-                results[rule_name] = rule['instance'].apply(filepath, metadata)
+                values = self._call_plugin(key, instance.apply_batch, filepaths, metadatas)
+                if len(values) == len(filepaths):
+                    outcomes = []
+                    for filepath, value in zip(filepaths, values):
+                        if isinstance(value, Exception):
+                            log_message("Error applying rule %s to %s: %s", rule_name, filepath, value, level=ERROR, rule=rule_name, file=filepath)
+                            outcomes.append((False, False))
+                        else:
+                            outcomes.append((value, True))
+                    self._observe(key, start, outcomes)
+                    return outcomes
+                log_message("Rule %s returned %d results for %d files, retrying one by one", rule_name, len(values), len(filepaths), level=WARNING)
             except Exception as e:
-                log_message(f"Error applying rule {rule_name} to {filepath}: {str(e)}")
-                results[rule_name] = False
-        return results
+                log_message("Error applying rule %s to a batch of %d files, retrying one by one: %s", rule_name, len(filepaths), e, level=WARNING)
 
-    def execute(self, filepaths: List[str], metadata: Dict[str, Any], rule_results: Dict[str, bool]) -> List[str]:
-        current_filepaths = filepaths
+        outcomes = []
+        for filepath, metadata in zip(filepaths, metadatas):
+            start = time.perf_counter()
+            try:
+                outcome = (self._call_plugin(key, instance.apply, filepath, metadata), True)
+            except Exception as e:
+                log_message("Error applying rule %s to %s: %s", rule_name, filepath, e, level=ERROR, rule=rule_name, file=filepath)
+                outcome = (False, False)
+            self._observe(key, start, [outcome])
+            outcomes.append(outcome)
+        return outcomes
+
+    def execute_batch(self, filepaths: List[str], metadatas: List[Dict[str, Any]],
+                      rule_results: List[Dict[str, bool]]) -> List[Tuple[Optional[str], Optional[Exception]]]:
+        # Each action runs over every file that meets its conditions, in groups of its batch size,
+        # before the next action starts. A file whose action fails gets no further actions.
+        paths = list(filepaths)
+        errors: List[Optional[Exception]] = [None] * len(filepaths)
         for action in self.actions:
             conditions = action['config'].get('conditions', [])
-            if all(rule_results.get(condition, False) for condition in conditions):
-                try:
-                    current_filepaths = action['instance'].execute(current_filepaths, metadata)
-                    log_message(f"Executed action {action['config']['name']} on {current_filepaths}")
-                except Exception as e:
-                    raise RuntimeError(f"Error executing action {action['config']['name']}: {str(e)}") from e
-            else:
-                log_message(f"Skipped action {action['config']['name']} due to unmet conditions: {conditions}")
-        return current_filepaths
+            selected = []
+            for i in range(len(paths)):
+                if errors[i] is not None:
+                    continue
+                if all(rule_results[i].get(condition, False) for condition in conditions):
+                    selected.append(i)
+                else:
+                    log_message("Skipped action %s for %s due to unmet conditions: %s", action['config']['name'], paths[i], conditions, level=DEBUG)
+            group_size = max(1, action['config'].get('batch_size', self.action_batch_size))
+            for start in range(0, len(selected), group_size):
+                self._execute_action(action, selected[start:start + group_size], paths, metadatas, errors)
+        return list(zip(paths, errors))
+
+    def _execute_action(self, action: Dict[str, Any], indices: List[int], paths: List[Optional[str]],
+                        metadatas: List[Dict[str, Any]], errors: List[Optional[Exception]]):
+        action_name = action['config']['name']
+        key = (self.name, 'action', action_name, action['config']['plugin'])
+        identities = [ImageProcessor._file_identity(paths[i]) for i in indices]
+        start = time.perf_counter()
+        try:
+            new_paths = self._call_plugin(key, action['instance'].execute_batch,
+                                          [paths[i] for i in indices], [metadatas[i] for i in indices])
+            if len(new_paths) != len(indices):
+                raise ValueError(f"returned {len(new_paths)} paths for {len(indices)} files")
+        except Exception as e:
+            # Actions have side effects, so a failed group is not retried file by file
+            new_paths = [e] * len(indices)
+        self._observe(key, start, [(False, False) if isinstance(new_path, Exception) else (True, True) for new_path in new_paths])
+        for i, new_path, identity in zip(indices, new_paths, identities):
+            if isinstance(new_path, Exception):
+                error = RuntimeError(f"Error executing action {action_name}: {str(new_path)}")
+                error.__cause__ = new_path
+                errors[i] = error
+                continue
+            if new_path != paths[i]:
+                self._follow_file(metadatas[i], new_path, identity)
+            paths[i] = new_path
+            # For the results export
+            metadatas[i].setdefault('actions', []).append(f"{self.name}/{action_name}")
+        log_message("Executed action %s on %s", action_name, [paths[i] for i in indices], level=DEBUG)
+
+    @staticmethod
+    def _follow_file(metadata: Dict[str, Any], new_path: str, identity: Optional[Tuple[int, int]]):
+        # Later actions and processes look the handle up by the new path. A move, or a copy that
+        # kept size and mtime, has the same bytes, so the decoded pixels stay shared; anything
+        # else gets a fresh handle that the remaining plugins share instead.
+        handle = metadata.get('image')
+        if not isinstance(handle, ImageHandle):
+            return
+        if identity is not None and ImageProcessor._file_identity(new_path) == identity:
+            handle.filepath = new_path
+        else:
+            handle.close()
+            metadata['image'] = ImageHandle(new_path, handle.downscale_size)
 
 class ImageProcessor:
     def __init__(self, config: Dict[str, Any]):
         self.config = config
+        # Checked before anything starts: an unknown name would only fail later, in level comparisons
+        self.log_level = parse_level(self.config['general']['log_level'])
         self.processes: Dict[str, Process] = {}
         self.logger = self._setup_logger()
+        self.rule_cache = self._open_rule_cache()
+        self.journal: Optional[Journal] = None
+        self.manifest: Optional[ManifestWriter] = None
+        self.shard = parse_shard(self.config['general'].get('shard'))
+        model_registry.configure(self.config['general'].get('model_memory_mb'))
+        event_log.configure(level=self.log_level,
+                            ring_size=self.config['general'].get('log_ring_size'),
+                            path=self.config['general'].get('log_file'))
+        # (phase, name, seconds) for the startup report
+        self.startup_timings: List[Tuple[str, str, float]] = []
+        self._warmup_thread: Optional[threading.Thread] = None
+        self.metrics = Metrics()
+        profile_dir = self.config['general'].get('profile_dir')
+        self.profiler = PluginProfiler(profile_dir) if profile_dir else None
+        self._worker_bytes_read = 0
+        self._metrics_written = 0.0
+        self._scanner: Optional[DirectoryScanner] = None
+        self._watcher: Optional[FolderWatcher] = None
+        self.results_writer: Optional[ResultsWriter] = None
+
+    def _open_rule_cache(self) -> Optional[RuleCache]:
+        cache_config = self.config['general'].get('rule_cache')
+        if not cache_config:
+            return None
+        return RuleCache(cache_config.get('path', DEFAULT_CACHE_PATH), cache_config.get('max_size_mb', DEFAULT_MAX_SIZE_MB))
+
+    def close(self):
+        if self.profiler is not None and self.profiler.profiles:
+            for path in self.profiler.dump():
+                log_message(f"Wrote plugin profile {path}")
+        for process in self.processes.values():
+            for plugin in process.rules + process.actions:
+                try:
+                    plugin['instance'].close()
+                except Exception as e:
+                    log_message(f"Error closing plugin {plugin['config']['name']}: {str(e)}", level=ERROR)
+        self.processes = {}
+        self._close_results_writer()
+        if self.rule_cache is not None:
+            self.rule_cache.close()
+            self.rule_cache = None
+        event_log.close()
 
     def _setup_logger(self):
         logger = logging.getLogger('ImageProcessor')
-        logger.setLevel(self.config['general']['log_level'])
+        logger.setLevel(self.log_level)
+        if logger.handlers:
+            return logger
         handler = logging.FileHandler('image_processor.log')
         formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
         handler.setFormatter(formatter)
@@ -105,8 +445,8 @@ class ImageProcessor:
                 rule_name = rule_config['plugin'].split("/")[-1].split(".")[0]
                 rule_config['name'] = rule_config.get('name', rule_name)
                 rule_path = os.path.abspath(os.path.join(plugin_dir, rule_config['plugin'].split('/')[0], 'rules', *rule_config['plugin'].split('/')[1:]) + ".py")
-                rule = PluginLoader.load_plugin(rule_path, Rule)
-                rule.initialize(rule_config.get('params', {}))
+                rule = self._timed('import', rule_config['plugin'], PluginLoader.load_plugin, rule_path, Rule)
+                self._timed('initialize', rule_config['name'], rule.initialize, rule_config.get('params', {}))
                 rules.append({'instance': rule, 'config': rule_config})
 
         if 'actions' in process_config:
@@ -114,54 +454,668 @@ class ImageProcessor:
                 action_name = action_config['plugin'].split("/")[-1].split(".")[0]
                 action_config['name'] = action_config.get('name', action_name)
                 action_path = os.path.abspath(os.path.join(plugin_dir, action_config['plugin'].split('/')[0], 'actions', *action_config['plugin'].split('/')[1:]) + ".py")
-                action = PluginLoader.load_plugin(action_path, Action)
-                action.initialize(action_config.get('params', {}))
+                action = self._timed('import', action_config['plugin'], PluginLoader.load_plugin, action_path, Action)
+                self._timed('initialize', action_config['name'], action.initialize, action_config.get('params', {}))
                 actions.append({'instance': action, 'config': action_config})
 
-        self.processes[process_name] = Process(process_name, rules, actions)
+        general = self.config['general']
+        cache_min_cost = RULE_COSTS[(general.get('rule_cache') or {}).get('min_cost', 'model')]
+        process = Process(process_name, rules, actions, lazy=general.get('lazy_rules', True),
+                          adaptive=general.get('adaptive_rules', False),
+                          cache=self.rule_cache, cache_min_cost=cache_min_cost,
+                          action_batch_size=general.get('action_batch_size', 1),
+                          metrics=self.metrics, profiler=self.profiler)
+        if process.scheduler:
+            process.scheduler.load(self._load_rule_stats().get(process_name, {}))
+        self.processes[process_name] = process
+
+    def _timed(self, phase: str, name: str, func, *args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.startup_timings.append((phase, name, time.perf_counter() - start))
+
+    def warmup(self):
+        for process in list(self.processes.values()):
+            for plugin in process.rules + process.actions:
+                try:
+                    self._timed('warmup', plugin['config']['name'], plugin['instance'].warmup)
+                except Exception as e:
+                    log_message(f"Error warming up plugin {plugin['config']['name']}: {str(e)}", level=ERROR)
+
+    def start_warmup(self):
+        # Models load while discovery runs; a rule that needs one first simply waits for it
+        if self._warmup_thread is None:
+            self._warmup_thread = threading.Thread(target=self.warmup, name="PluginWarmup", daemon=True)
+            self._warmup_thread.start()
+
+    def startup_report(self) -> str:
+        lines = ["Startup time breakdown:"]
+        for phase, name, seconds in self.startup_timings:
+            lines.append(f"  {phase:<12} {name:<40} {seconds * 1000:10.1f} ms")
+        for module_name, seconds in import_times.items():
+            lines.append(f"  {'lazy import':<12} {module_name:<40} {seconds * 1000:10.1f} ms")
+        return "\n".join(lines)
+
+    def _rule_stats_file(self) -> str:
+        return self.config['general'].get('rule_stats_file', 'rule_stats.json')
+
+    def _load_rule_stats(self) -> Dict[str, Any]:
+        if not os.path.exists(self._rule_stats_file()):
+            return {}
+        with open(self._rule_stats_file(), 'r') as f:
+            return json.load(f)
+
+    def save_rule_stats(self):
+        saved = self._load_rule_stats()
+        for process_name, process in self.processes.items():
+            if process.scheduler:
+                saved[process_name] = process.scheduler.to_dict()
+        with open(self._rule_stats_file(), 'w') as f:
+            json.dump(saved, f, indent=2)
+        log_message(f"Saved rule statistics to {self._rule_stats_file()}")
 
     def process_images(self, source_dir: str):
-        all_files = []
-        for root, _, files in os.walk(source_dir):
-            for filename in files:
-                all_files.append(os.path.join(root, filename))
+        general = self.config['general']
+        scanner = DirectoryScanner(
+            source_dir,
+            threads=general.get('discovery_threads', 4),
+            queue_size=general.get('discovery_queue_size', 10000),
+            recursive=general.get('recursive', True),
+            shard=self.shard,
+            **self._discovery_options(),
+        )
+        workers = general.get('workers', 1) or 1
+        # Worker processes warm up their own plugins
+        if general.get('warmup', False) and workers <= 1:
+            self.start_warmup()
+        if len(self.processes) > 1:
+            self._log_plan()
+        self._run_start = time.perf_counter()
+        self.metrics.started = time.time()
+        self._scanner = scanner
+        self.journal = self._open_journal(source_dir)
+        if self.shard is not None:
+            path = manifest_path(general.get('manifest_dir', DEFAULT_MANIFEST_DIR), list(self.processes), self.shard)
+            self.manifest = ManifestWriter(path, source_dir, self.shard, list(self.processes), self._fingerprint())
+            log_message(f"Processing shard {self.shard[0]} of {self.shard[1]}, writing manifest {path}")
+        files = self._unprocessed_files(scanner)
+        completed = False
+
+        try:
+            with tqdm(total=0, desc="Processing Images", unit="image") as pbar:
+                if workers > 1:
+                    self._process_files_parallel(self._batches(files), scanner, workers, pbar)
+                elif general.get('prefetch'):
+                    for batch, metadatas in self._prefetcher(self._batches(files)):
+                        self._finish_batch(self._process_batch(batch, metadatas), pbar, scanner)
+                else:
+                    for batch in self._batches(files):
+                        self._finish_batch(self._process_batch(batch), pbar, scanner)
+            completed = True
+        finally:
+            scanner.close()
+            if self.journal is not None:
+                # An unfinished run is what --resume picks up
+                if completed:
+                    self.journal.finish_run()
+                self.journal.close()
+                log_message(f"Skipped {self.journal.skipped} unchanged files already in the journal.")
+            if self.manifest is not None:
+                self.manifest.close(completed, self._shard_states())
+                self.manifest = None
+            if any(process.scheduler for process in self.processes.values()):
+                self.save_rule_stats()
+            if self.rule_cache is not None:
+                self.rule_cache.flush()
+                log_message(f"Rule cache: {self.rule_cache.hits} hits, {self.rule_cache.misses} misses")
+            # Also on an aborted run, so the rows of the files that were processed are kept
+            self._close_results_writer()
+            if self.metrics.shared_results:
+                log_message(f"Reused {self.metrics.shared_results} rule results across rules with identical plugin and params")
+            self._export_metrics(final=True)
+
+        log_message(f"Found {scanner.files_found} files in total.")
+        log_message(f"Identified {scanner.images_found} image files.")
+        self._log_rejected(scanner.rejected)
+        if self.shard is not None:
+            log_message(f"Left {scanner.other_shards} image files to other shards.")
+        log_message("Image processing completed.")
+
+    def _discovery_options(self) -> Dict[str, Any]:
+        general = self.config['general']
+        return {
+            'formats': general.get('formats') or DEFAULT_FORMATS,
+            'sniff': general.get('sniff', True),
+            'check_trailer': general.get('sniff_trailers', False),
+        }
+
+    def _log_rejected(self, rejected: Dict[str, int]):
+        if any(rejected.values()):
+            reasons = ', '.join(f"{count} {reason}" for reason, count in rejected.items() if count)
+            log_message(f"Rejected {sum(rejected.values())} files by content: {reasons}.")
+
+    def watch(self, source_dir: str):
+        # Long-running mode: plugins stay initialized and models stay loaded while new files
+        # in source_dir are processed in micro-batches as they arrive. Stops on SIGTERM or Ctrl-C.
+        general = self.config['general']
+        watch_config = general.get('watch') or {}
+        watcher = FolderWatcher(
+            source_dir,
+            settle_seconds=watch_config.get('settle_seconds', DEFAULT_SETTLE_SECONDS),
+            poll_interval=watch_config.get('poll_interval', DEFAULT_POLL_INTERVAL),
+            use_inotify=watch_config.get('inotify', True),
+            recursive=general.get('recursive', True),
+            existing=watch_config.get('existing', True),
+            shard=self.shard,
+            **self._discovery_options(),
+        )
+        workers = general.get('workers', 1) or 1
+        if workers <= 1:
+            self.start_warmup()
+        if len(self.processes) > 1:
+            self._log_plan()
+        self._run_start = time.perf_counter()
+        self.metrics.started = time.time()
+        self._scanner = self._watcher = watcher
+        self.journal = self._open_journal(source_dir)
+        previous_handler = signal.signal(signal.SIGTERM, lambda signum, frame: watcher.close())
+        status = threading.Thread(target=self._watch_status, args=(watcher, watch_config.get('status_interval', 60)),
+                                  name="WatchStatus", daemon=True)
+        log_message(f"Watching {source_dir} for new images ({watcher.mode})")
+        watcher.start()
+        status.start()
+        batches = watcher.batches(max(self._rule_batch_size(), general.get('action_batch_size', 1)),
+                                  watch_config.get('max_wait', DEFAULT_MAX_WAIT),
+                                  skip=self.journal.should_skip if self.journal is not None else None)
+        try:
+            with tqdm(total=0, desc="Watching", unit="image") as pbar:
+                if workers > 1:
+                    self._process_files_parallel(batches, watcher, workers, pbar)
+                else:
+                    for batch in batches:
+                        self._finish_batch(self._process_batch(batch), pbar, watcher)
+        except KeyboardInterrupt:
+            log_message("Stopping watch mode.")
+        finally:
+            watcher.close()
+            signal.signal(signal.SIGTERM, previous_handler)
+            self._watcher = None
+            if self.journal is not None:
+                self.journal.finish_run()
+                self.journal.close()
+            if any(process.scheduler for process in self.processes.values()):
+                self.save_rule_stats()
+            if self.rule_cache is not None:
+                self.rule_cache.flush()
+            self._close_results_writer()
+            self._export_metrics(final=True)
+            self._log_rejected(watcher.rejected)
+
+    def serve(self):
+        # Hosts the loaded processes for other services until SIGTERM or Ctrl-C
+        server_config = self.config['general'].get('server') or {}
+        # Load models before accepting requests, so the first caller doesn't pay for them
+        self.warmup()
+        server = JobServer(
+            self,
+            host=server_config.get('host', DEFAULT_HOST),
+            port=server_config.get('port', DEFAULT_PORT),
+            socket_path=server_config.get('socket'),
+            max_batch=server_config.get('max_batch', DEFAULT_MAX_BATCH),
+            max_wait_ms=server_config.get('max_wait_ms', DEFAULT_MAX_WAIT_MS),
+            max_body_mb=server_config.get('max_body_mb', DEFAULT_MAX_BODY_MB),
+            # The environment keeps the secret out of the config file
+            token=server_config.get('token') or os.environ.get('SIDM_SERVER_TOKEN'),
+            allowed_origins=server_config.get('allowed_origins'),
+        )
+        self.metrics.started = time.time()
+        previous_handler = signal.signal(signal.SIGTERM, lambda signum, frame: server.shutdown())
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            log_message("Stopping server.")
+        finally:
+            signal.signal(signal.SIGTERM, previous_handler)
+            server.close()
+            if self.rule_cache is not None:
+                self.rule_cache.flush()
+            self._export_metrics(final=True)
 
-        log_message(f"Found {len(all_files)} files in total.")
+    def _watch_status(self, watcher: FolderWatcher, interval: float):
+        last_done = 0
+        last_time = time.time()
+        while not watcher.finished:
+            time.sleep(interval)
+            done = self.metrics.files_done + self.metrics.files_failed
+            now = time.time()
+            log_message(f"Watch: {done} files processed, {(done - last_done) / (now - last_time):.1f} files/s, "
+                        f"{watcher.queue_depth} queued, {watcher.settling} settling",
+                        processed=done, queue_depth=watcher.queue_depth, settling=watcher.settling)
+            last_done, last_time = done, now
 
-        image_files = [f for f in all_files if f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp'))]
-        log_message(f"Identified {len(image_files)} image files.")
+    def _log_plan(self):
+        signatures = [signature for process in self.processes.values() for signature in process.rule_signatures.values()]
+        log_message(f"Running processes {', '.join(self.processes)} in one pass: {len(signatures)} rules, "
+                    f"{len(set(signatures))} distinct, each evaluated at most once per file")
 
-        with tqdm(total=len(image_files), desc="Processing Images", unit="image") as pbar:
-            for filepath in image_files:
-                log_message(f"Processing file: {filepath}")
+    def _open_journal(self, source_dir: str) -> Optional[Journal]:
+        general = self.config['general']
+        journal_config = general.get('journal')
+        if not journal_config and not general.get('resume'):
+            return None
+        if not isinstance(journal_config, dict):
+            journal_config = {}
+        journal_name = '+'.join(sorted(self.processes))
+        if self.shard is not None:
+            journal_name += f".shard-{self.shard[0]}-of-{self.shard[1]}"
+        journal_path = os.path.join(journal_config.get('dir', DEFAULT_JOURNAL_DIR), journal_name + '.sqlite')
+        # Outcomes recorded under a different process configuration don't count
+        journal = Journal(journal_path, self._fingerprint(), journal_config.get('batch_size', DEFAULT_BATCH_SIZE))
+        run_id = journal.start_run(source_dir, resume=general.get('resume', False))
+        if journal.resumed:
+            log_message(f"Resuming interrupted run {run_id} from journal {journal_path}")
+        else:
+            log_message(f"Started run {run_id} with journal {journal_path}")
+        return journal
+
+    def _fingerprint(self) -> str:
+        process_configs = [self.config['processes'][process_name] for process_name in sorted(self.processes)]
+        return hashlib.sha256(json.dumps(process_configs, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def _shard_states(self) -> Dict[str, Dict[str, Any]]:
+        # In a parallel run these instances hold the states merged from the workers
+        states = {}
+        for process_name, process in self.processes.items():
+            for action in process.actions:
                 try:
-                    metadata = self._get_metadata(filepath)
-                    for process_name, process in self.processes.items():
-                        log_message(f"Applying process '{process_name}' to {filepath}")
-                        rule_results = process.apply(filepath, metadata)
-                        log_message(f"Rule results for {filepath}: {rule_results}")
-                        if any(rule_results.values()):
-                            filepath = process.execute([filepath], metadata, rule_results)[0]
-                            self.logger.info(f"Applied process '{process_name}' to {filepath}")
-                            log_message(f"Applied process '{process_name}' to {filepath}")
-                        else:
-                            log_message(f"Skipped process '{process_name}' for {filepath}")
+                    state = action['instance'].shard_state()
                 except Exception as e:
-                    error_message = f"Error processing {filepath}: {str(e)}"
-                    self.logger.error(error_message)
-                    log_message(error_message)
-                    if self.config['general'].get('stop_on_error', False):
-                        raise RuntimeError("Critical error occurred. Stopping the process.") from e
-                finally:
-                    pbar.update(1)
+                    log_message(f"Error collecting shard state of action {action['config']['name']}: {str(e)}", level=ERROR)
+                    continue
+                if state is not None:
+                    states.setdefault(process_name, {})[action['config']['name']] = state
+        return states
 
-        log_message("Image processing completed.")
+    def merge_shards(self, manifest_paths: List[str], output: str) -> Dict[str, Any]:
+        merged = merge_manifests(manifest_paths)
+        for process_name in merged['processes']:
+            if process_name not in self.processes:
+                self.load_plugins(process_name)
+        self._merge_action_states(merged['states'])
+        with open(output, 'w') as f:
+            json.dump(merged, f, indent=2, default=str)
+        if merged['missing_shards']:
+            log_message(f"Missing manifests for shards {merged['missing_shards']}", level=WARNING)
+        if merged['incomplete_shards']:
+            log_message(f"Shards {merged['incomplete_shards']} did not finish their run", level=WARNING)
+        log_message(f"Merged {len(merged['shards'])} of {merged['count']} shards into {output}: "
+                    f"{merged['files_done']} files done, {merged['files_failed']} failed")
+        return merged
+
+    def _unprocessed_files(self, scanner: DirectoryScanner):
+        for filepath in scanner:
+            if self.journal is not None and self.journal.should_skip(filepath):
+                continue
+            yield filepath
+
+    def _rule_batch_size(self) -> int:
+        return max(1, self.config['general'].get('batch_size', 1))
+
+    def _batches(self, files: Iterator[str]) -> Iterator[List[str]]:
+        # Micro-batches let rules with a real apply_batch run one model call for many files,
+        # and bulk actions see a whole group of files at once
+        batch_size = max(self._rule_batch_size(), self.config['general'].get('action_batch_size', 1))
+        batch = []
+        for filepath in files:
+            batch.append(filepath)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _export_metrics(self, final: bool = False):
+        metrics_config = self.config['general'].get('metrics')
+        if not metrics_config:
+            return
+        if not isinstance(metrics_config, dict):
+            metrics_config = {}
+        self.metrics.bytes_read = bytes_read() + self._worker_bytes_read
+        # A server has no discovery
+        if self._scanner is not None:
+            self.metrics.discovery = self._scanner.stats()
+        prometheus_file = metrics_config.get('prometheus_file')
+        if prometheus_file:
+            # Long runs refresh the textfile every prometheus_interval seconds
+            if final or time.time() - self._metrics_written >= metrics_config.get('prometheus_interval', 15):
+                self.metrics.write_prometheus(prometheus_file)
+                self._metrics_written = time.time()
+        if final:
+            json_file = metrics_config.get('json_file', 'metrics.json')
+            self.metrics.write_json(json_file)
+            log_message(f"Wrote run metrics to {json_file}")
+
+    def _prefetcher(self, batches: Iterator[List[str]]) -> Prefetcher:
+        prefetch_config = self.config['general']['prefetch']
+        if not isinstance(prefetch_config, dict):
+            prefetch_config = {}
+        return Prefetcher(
+            batches,
+            self._get_metadata,
+            window=prefetch_config.get('window', DEFAULT_WINDOW),
+            threads=prefetch_config.get('threads', DEFAULT_THREADS),
+            max_memory_mb=prefetch_config.get('max_memory_mb', DEFAULT_MAX_MEMORY_MB),
+            views=tuple(prefetch_config.get('views', DEFAULT_VIEWS)),
+            downscale_sizes=tuple(prefetch_config.get('downscale_sizes', ())),
+        )
+
+    def _finish_batch(self, outcomes: List[Tuple[str, Optional[str], Optional[Exception]]], pbar: tqdm, scanner: DirectoryScanner):
+        if not any(phase == 'run' for phase, _, _ in self.startup_timings):
+            self.startup_timings.append(('run', 'first batch done', time.perf_counter() - self._run_start))
+        # Journal the whole batch first: every file in it has been through its actions
+        for filepath, final_path, error in outcomes:
+            self._record_outcome(filepath, OUTCOME_DONE if error is None else OUTCOME_ERROR, final_path)
+            if self.manifest is not None:
+                self.manifest.record(filepath, OUTCOME_DONE if error is None else OUTCOME_ERROR, final_path,
+                                     str(error) if error is not None else None)
+        if self._watcher is not None:
+            self._watcher.mark_processed([filepath for filepath, _, _ in outcomes] +
+                                         [final_path for _, final_path, error in outcomes if error is None and final_path])
+        failed = sum(1 for _, _, error in outcomes if error is not None)
+        self.metrics.count_files(len(outcomes) - failed, failed)
+        self._export_metrics()
+        for filepath, _, error in outcomes:
+            try:
+                if error is not None:
+                    self._handle_file_error(filepath, error)
+            finally:
+                self._update_progress(pbar, scanner)
+
+    def _record_outcome(self, filepath: str, outcome: str, final_path: Optional[str] = None):
+        if self.journal is not None:
+            self.journal.record(filepath, outcome, final_path)
+
+    def _update_progress(self, pbar: tqdm, scanner: DirectoryScanner):
+        # The total grows while discovery is still running
+        total = scanner.images_found - (self.journal.skipped if self.journal is not None else 0)
+        if pbar.total != total:
+            pbar.total = total
+        pbar.update(1)
+
+    def _process_files_parallel(self, batches: Iterator[List[str]], scanner: DirectoryScanner, workers: int, pbar: tqdm):
+        log_message(f"Processing with {workers} worker processes.")
+        self._warn_stateful_actions(workers)
+        # Spawn rather than fork: the parent may already hold torch/TensorFlow state that
+        # does not survive a fork, and every worker loads its own plugins anyway.
+        context = multiprocessing.get_context("spawn")
+        # Makes each worker take exactly one of the final _finish_worker tasks
+        barrier = context.Barrier(workers)
+        initargs = (self.config, list(self.processes), event_log.echo, barrier)
+        # Pool.imap drains its input eagerly, so cap the number of files in flight
+        slots = threading.Semaphore(workers * 4)
+        stopped = threading.Event()
+
+        def feed():
+            for batch in batches:
+                slots.acquire()
+                if stopped.is_set():
+                    return
+                yield batch
+
+        with context.Pool(workers, initializer=_init_worker, initargs=initargs) as pool:
+            try:
+                for result in pool.imap_unordered(_process_batch_in_worker, feed()):
+                    slots.release()
+                    event_log.replay(result['events'])
+                    self.metrics.merge(result['metrics'])
+                    self._worker_bytes_read += result['bytes_read']
+                    self.metrics.count_shared(result['shared_results'])
+                    for process_name, delta in result['rule_stats'].items():
+                        self.processes[process_name].scheduler.merge(delta)
+                    if self.rule_cache is not None:
+                        self.rule_cache.hits += result['cache_hits']
+                        self.rule_cache.misses += result['cache_misses']
+                    outcomes = [(filepath, final_path, RuntimeError(error) if error is not None else None)
+                                for filepath, final_path, error in result['files']]
+                    self._finish_batch(outcomes, pbar, scanner)
+            except Exception:
+                # E.g. stop_on_error: leaving the block terminates the pool, which skips the workers'
+                # finalizers, so have them write out what they buffered first
+                stopped.set()
+                slots.release()
+                self._finish_workers(pool, workers)
+                raise
+            finally:
+                stopped.set()
+                slots.release()
+            self._finish_workers(pool, workers)
+            # Let the workers exit normally so their finalizers close the rule cache
+            pool.close()
+            pool.join()
+
+    def _warn_stateful_actions(self, workers: int):
+        stateful = [action['config']['name'] for process in self.processes.values() for action in process.actions
+                    if type(action['instance']).shard_state is not Plugin.shard_state]
+        if stateful:
+            log_message(f"Actions {', '.join(stateful)} keep state per worker process. With {workers} workers, their "
+                        f"results across workers (e.g. duplicates) are only merged when the run ends.", level=WARNING)
+
+    def _finish_workers(self, pool, workers: int):
+        try:
+            finished = pool.map_async(_finish_worker, range(workers), chunksize=1).get(timeout=WORKER_FINISH_TIMEOUT)
+        except Exception as e:
+            log_message(f"Could not finish worker processes: {str(e)}", level=ERROR)
+            return
+        # Each worker's stateful actions only saw its own files. Merging their states into this
+        # process's (unused) instances gives the run-wide result, e.g. duplicates across workers,
+        # and is what the shard manifest records.
+        states: Dict[str, Dict[str, List[Any]]] = {}
+        for worker_states in finished:
+            for process_name, actions in worker_states.items():
+                for action_name, state in actions.items():
+                    states.setdefault(process_name, {}).setdefault(action_name, []).append(state)
+        self._merge_action_states(states)
+
+    def _merge_action_states(self, states: Dict[str, Dict[str, List[Any]]]):
+        for process_name, actions in states.items():
+            for action in self.processes[process_name].actions:
+                if action['config']['name'] in actions:
+                    try:
+                        action['instance'].merge_shards(actions[action['config']['name']])
+                    except Exception as e:
+                        log_message(f"Error merging state of action {action['config']['name']}: {str(e)}", level=ERROR)
+
+    def _process_batch(self, filepaths: List[str], metadatas: Optional[List[Any]] = None) -> List[Tuple[str, Optional[str], Optional[Exception]]]:
+        # metadatas come from the prefetcher: a metadata dict, or the exception building it raised
+        entries = []
+        for i, filepath in enumerate(filepaths):
+            log_message("Processing file: %s", filepath, level=DEBUG)
+            entry = {'filepath': filepath, 'path': filepath, 'metadata': None, 'error': None, 'rules': {}}
+            try:
+                metadata = metadatas[i] if metadatas is not None else self._get_metadata(filepath)
+                if isinstance(metadata, Exception):
+                    raise metadata
+                entry['metadata'] = metadata
+            except Exception as e:
+                entry['error'] = e
+            entries.append(entry)
+
+        rule_batch_size = self._rule_batch_size()
+        try:
+            for process_name, process in self.processes.items():
+                live = [entry for entry in entries if entry['error'] is None]
+                if not live:
+                    break
+                batch_results = []
+                for start in range(0, len(live), rule_batch_size):
+                    chunk = live[start:start + rule_batch_size]
+                    for entry in chunk:
+                        log_message("Applying process '%s' to %s", process_name, entry['path'], level=DEBUG)
+                    batch_results.extend(process.apply_batch([entry['path'] for entry in chunk], [entry['metadata'] for entry in chunk]))
+                    if len(live) > rule_batch_size:
+                        # Hold at most one rule batch of decoded pixels; actions decode again if they need to
+                        for entry in chunk:
+                            entry['metadata']['image'].close()
+
+                selected = []
+                for entry, rule_results in zip(live, batch_results):
+                    entry['rules'][process_name] = rule_results
+                    log_message("Rule results for %s: %s", entry['path'], rule_results, level=DEBUG)
+                    if any(rule_results.values()):
+                        selected.append((entry, rule_results))
+                    else:
+                        log_message("Skipped process '%s' for %s", process_name, entry['path'], level=DEBUG)
+                if not selected:
+                    continue
+                identities = [self._file_identity(entry['path']) for entry, _ in selected]
+                outcomes = process.execute_batch([entry['path'] for entry, _ in selected],
+                                                 [entry['metadata'] for entry, _ in selected],
+                                                 [rule_results for _, rule_results in selected])
+                for (entry, _), (path, error), identity in zip(selected, outcomes, identities):
+                    if error is not None:
+                        entry['error'] = error
+                        continue
+                    self._carry_rule_results(entry['metadata'], entry['path'], path, identity)
+                    entry['path'] = path
+                    self.logger.info("Applied process '%s' to %s", process_name, entry['path'])
+                    log_message("Applied process '%s' to %s", process_name, entry['path'], level=DEBUG)
+        finally:
+            # Drop the decoded pixels as soon as the batch's pass is done
+            for entry in entries:
+                if entry['metadata'] is not None:
+                    entry['metadata']['image'].close()
+
+        results_writer = self._results_writer()
+        if results_writer is not None:
+            for entry in entries:
+                results_writer.write(entry['filepath'], entry['path'] if entry['error'] is None else None, entry['metadata'],
+                                     entry['error'], entry['rules'], (entry['metadata'] or {}).get('actions', []))
+        return [(entry['filepath'], entry['path'] if entry['error'] is None else None, entry['error']) for entry in entries]
+
+    def _carry_rule_results(self, metadata: Dict[str, Any], old_path: str, new_path: str,
+                            identity: Optional[Tuple[int, int]]):
+        # Rule results carry over to the next process only while the content is untouched: a
+        # rename keeps size and mtime, a rewrite or a plain copy does not. Metadata-cost rules
+        # may look at the path itself, so a moved file evaluates those again.
+        shared = metadata.get('rule_results')
+        if not shared:
+            return
+        if identity is None or self._file_identity(new_path) != identity:
+            metadata.pop('rule_results')
+        elif new_path != old_path:
+            metadata['rule_results'] = {signature: result for signature, result in shared.items() if result[1] > COST_METADATA}
+
+    @staticmethod
+    def _file_identity(filepath: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def _results_writer(self) -> Optional[ResultsWriter]:
+        # Opened on first use, so worker processes only create a part file once they get files
+        results_config = self.config['general'].get('results')
+        if not results_config or self.results_writer is not None:
+            return self.results_writer
+        if not isinstance(results_config, dict):
+            results_config = {}
+        rule_columns = [(process_name, rule_name) for process_name, process in self.processes.items()
+                        for rule_name in process.rules_by_name]
+        self.results_writer = ResultsWriter(results_config.get('dir', DEFAULT_RESULTS_DIR), rule_columns,
+                                            results_config.get('format', DEFAULT_FORMAT),
+                                            results_config.get('batch_rows', DEFAULT_BATCH_ROWS))
+        return self.results_writer
+
+    def _close_results_writer(self):
+        # Writes the buffered rows and, for Parquet, the footer that makes the part file readable
+        if self.results_writer is not None:
+            self.results_writer.close()
+            log_message(f"Wrote {self.results_writer.rows_written} result rows to {self.results_writer.path}")
+            self.results_writer = None
+
+    def _handle_file_error(self, filepath: str, error: Exception):
+        error_message = f"Error processing {filepath}: {str(error)}"
+        self.logger.error(error_message)
+        log_message(error_message, level=ERROR, file=filepath)
+        if self.config['general'].get('stop_on_error', False):
+            raise RuntimeError("Critical error occurred. Stopping the process.") from error
 
     def _get_metadata(self, filepath: str) -> Dict[str, Any]:
-        return {
+        st = os.stat(filepath)
+        handle = ImageHandle(filepath, self.config['general'].get('downscale_size', DEFAULT_DOWNSCALE_SIZE))
+        metadata = {
             'filename': os.path.basename(filepath),
-            'size': os.path.getsize(filepath),
+            'size': st.st_size,
+            'mtime': st.st_mtime,
+            'ctime': st.st_ctime,
+            'image': handle,
         }
+        # format, width, height, mode, EXIF orientation and taken_at from the container
+        # header, so dimension, format and date rules never need the pixels
+        if self.config['general'].get('probe_headers', True):
+            metadata.update(handle.header)
+        if self.config['general'].get('probe_frames', False):
+            metadata['frames'] = handle.frames
+        return metadata
+
+    def get_log(self, limit: Optional[int] = None) -> List[str]:
+        # Only the most recent events are kept in memory; general.log_file has the full run
+        return event_log.recent(limit)
+
+
+_worker_processor = None
+_worker_barrier = None
+_worker_finished = False
+
+def _init_worker(config: Dict[str, Any], process_names: List[str], log_enabled: bool, barrier):
+    global _worker_processor, _worker_barrier
+    _worker_barrier = barrier
+    set_logging(log_enabled)
+    # Only the parent writes the log file; worker events reach it with each batch's result
+    config = dict(config, general=dict(config['general'], log_file=None))
+    _worker_processor = ImageProcessor(config)
+    event_log.start_capture()
+    for process_name in process_names:
+        _worker_processor.load_plugins(process_name)
+    if config['general'].get('warmup', False):
+        _worker_processor.start_warmup()
+    multiprocessing.util.Finalize(None, _worker_processor.close, exitpriority=10)
+
+def _finish_worker(_):
+    # Waiting for the other workers keeps this worker from taking a second finish task
+    try:
+        _worker_barrier.wait(timeout=WORKER_FINISH_TIMEOUT)
+    except threading.BrokenBarrierError:
+        pass
+    global _worker_finished
+    _worker_processor._close_results_writer()
+    if _worker_processor.rule_cache is not None:
+        _worker_processor.rule_cache.flush()
+    # If the barrier timed out a worker can get two tasks; its state must only count once
+    if _worker_finished:
+        return {}
+    _worker_finished = True
+    return _worker_processor._shard_states()
 
-    def get_log(self) -> List[str]:
-        return global_log
+def _process_batch_in_worker(filepaths: List[str]):
+    # Events logged while handling these files are shipped back so the parent's log stays complete
+    cache = _worker_processor.rule_cache
+    cache_counts = (cache.hits, cache.misses) if cache is not None else (0, 0)
+    bytes_start = bytes_read()
+    shared_start = _worker_processor.metrics.shared_results
+    try:
+        outcomes = _worker_processor._process_batch(filepaths)
+        files = [(filepath, final_path, str(error) if error is not None else None) for filepath, final_path, error in outcomes]
+    except Exception as e:
+        files = [(filepath, None, str(e)) for filepath in filepaths]
+    events = event_log.take_captured()
+    rule_stats = {process_name: process.scheduler.take_pending()
+                  for process_name, process in _worker_processor.processes.items() if process.scheduler}
+    cache_hits, cache_misses = (cache.hits - cache_counts[0], cache.misses - cache_counts[1]) if cache is not None else (0, 0)
+    return {'files': files, 'events': events, 'rule_stats': rule_stats,
+            'cache_hits': cache_hits, 'cache_misses': cache_misses,
+            'metrics': _worker_processor.metrics.take_pending(), 'bytes_read': bytes_read() - bytes_start,
+            'shared_results': _worker_processor.metrics.shared_results - shared_start}
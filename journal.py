@@ -0,0 +1,119 @@
+import os
+import time
+import sqlite3
+import threading
+from typing import List, Optional, Tuple
+
+DEFAULT_JOURNAL_DIR = './journal'
+DEFAULT_BATCH_SIZE = 500
+
+OUTCOME_DONE = 'done'
+OUTCOME_ERROR = 'error'
+
+# Records every file's identity (size, mtime, inode) and outcome so a later run can skip files
+# that are unchanged and already processed. Outcomes are buffered and written in batches, so
+# a crash loses at most the last batch and those files are simply processed again.
+class Journal:
+    def __init__(self, path: str, fingerprint: str, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.batch_size = batch_size
+        self.run_id = None
+        self.resumed = False
+        self.skipped = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            "run_id INTEGER PRIMARY KEY AUTOINCREMENT, source_dir TEXT NOT NULL, fingerprint TEXT NOT NULL, "
+            "started REAL NOT NULL, finished REAL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, inode INTEGER, outcome TEXT NOT NULL, "
+            "final_path TEXT, fingerprint TEXT NOT NULL, run_id INTEGER NOT NULL, updated REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._pending: List[Tuple] = []
+
+    def start_run(self, source_dir: str, resume: bool = False) -> int:
+        source_dir = os.path.abspath(source_dir)
+        with self._lock:
+            if resume:
+                row = self._conn.execute(
+                    "SELECT run_id FROM runs WHERE source_dir = ? AND fingerprint = ? AND finished IS NULL "
+                    "ORDER BY run_id DESC LIMIT 1",
+                    (source_dir, self.fingerprint),
+                ).fetchone()
+                if row is not None:
+                    self.run_id = row[0]
+                    self.resumed = True
+                    return self.run_id
+            cursor = self._conn.execute(
+                "INSERT INTO runs (source_dir, fingerprint, started) VALUES (?, ?, ?)",
+                (source_dir, self.fingerprint, time.time()),
+            )
+            self._conn.commit()
+            self.run_id = cursor.lastrowid
+            return self.run_id
+
+    def should_skip(self, filepath: str) -> bool:
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            return False
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, inode, outcome, fingerprint, run_id FROM files WHERE path = ?",
+                (os.path.abspath(filepath),),
+            ).fetchone()
+        if row is None:
+            return False
+        size, mtime_ns, inode, outcome, fingerprint, run_id = row
+        if (size, mtime_ns, inode) != (st.st_size, st.st_mtime_ns, st.st_ino) or fingerprint != self.fingerprint:
+            return False
+        # Failed files are retried on a fresh run, but a resumed run picks up exactly where it stopped
+        skip = outcome == OUTCOME_DONE or (self.resumed and outcome == OUTCOME_ERROR and run_id == self.run_id)
+        if skip:
+            self.skipped += 1
+        return skip
+
+    def record(self, filepath: str, outcome: str, final_path: Optional[str] = None):
+        # Stat after processing so in-place edits by actions don't make the file look changed next time
+        try:
+            st = os.stat(filepath)
+            identity = (st.st_size, st.st_mtime_ns, st.st_ino)
+        except OSError:
+            identity = (None, None, None)
+        with self._lock:
+            self._pending.append((os.path.abspath(filepath), *identity, outcome, final_path,
+                                  self.fingerprint, self.run_id, time.time()))
+            if len(self._pending) >= self.batch_size:
+                self._write_pending()
+
+    def flush(self):
+        with self._lock:
+            self._write_pending()
+
+    def finish_run(self):
+        with self._lock:
+            self._write_pending()
+            self._conn.execute("UPDATE runs SET finished = ? WHERE run_id = ?", (time.time(), self.run_id))
+            self._conn.commit()
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+    def _write_pending(self):
+        if not self._pending:
+            return
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO files (path, size, mtime_ns, inode, outcome, final_path, fingerprint, run_id, updated) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            self._pending,
+        )
+        self._conn.commit()
+        self._pending = []
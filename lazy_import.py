@@ -0,0 +1,37 @@
+import time
+import importlib
+import threading
+from typing import Any, Dict
+
+# Seconds spent importing each deferred module, for the startup report
+import_times: Dict[str, float] = {}
+_lock = threading.Lock()
+
+# Stands in for a heavy module (torch, transformers, deepface, ...) until an attribute is first
+# used, so loading a plugin doesn't pay for imports a short run may never need.
+class LazyModule:
+    def __init__(self, name: str):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            with _lock:
+                module = self.__dict__['_module']
+                if module is None:
+                    start = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    import_times[self._name] = time.perf_counter() - start
+                    self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.load(), attr)
+
+    def __repr__(self) -> str:
+        state = 'loaded' if self.__dict__['_module'] is not None else 'not loaded'
+        return f"<lazy module '{self._name}' ({state})>"
+
+def lazy_import(name: str) -> LazyModule:
+    return LazyModule(name)
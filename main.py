@@ -25,13 +25,44 @@ def load_config(config_file):
 
 def main():
     parser = argparse.ArgumentParser(description="Smart Image Dataset Manager")
-    parser.add_argument("process", help="Name of the process to run")
+    parser.add_argument("process", nargs='?', default=None, help="Name of the process to run; separate several with commas")
     parser.add_argument("source_dir", nargs='?', default=None, help="Directory containing images to process (optional)")
+    parser.add_argument("--all", action="store_true", help="Run every configured process in one pass")
+    parser.add_argument("--shard", default=None, metavar="I/N", help="Only process the files of shard I of N (numbered from 0)")
+    parser.add_argument("--merge", nargs='+', default=None, metavar="MANIFEST", help="Merge the manifests of a sharded run and exit")
+    parser.add_argument("-o", "--output", default="merged_manifest.json", help="Where --merge writes the merged result")
     parser.add_argument("-c", "--config", default="sidm_config.yaml", help="Path to configuration file")
     parser.add_argument("--stop-on-error", action="store_true", help="Stop processing if an error occurs")
     parser.add_argument("--log", action="store_true", help="Enable detailed logging")
+    parser.add_argument("--log-file", default=None, help="Stream log events to this JSONL file")
     parser.add_argument("--install", action="store_true", help="Install plugin requirements")
-    args = parser.parse_args()
+    parser.add_argument("--adaptive-rules", action="store_true", help="Reorder rule evaluation from measured latency and pass rates")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the persistent rule result cache")
+    parser.add_argument("--clear-cache", action="store_true", help="Clear the persistent rule result cache before running")
+    parser.add_argument("--resume", action="store_true", help="Continue the last interrupted run recorded in the journal")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes to split files across")
+    parser.add_argument("--warmup", action="store_true", help="Load deferred imports and models in the background while files are discovered")
+    parser.add_argument("--profile", nargs='?', const='./profiles', default=None, metavar="DIR",
+                        help="Profile each plugin's calls with cProfile and write per-plugin stats to DIR")
+    parser.add_argument("--startup-report", action="store_true", help="Print a breakdown of startup time")
+    parser.add_argument("--host", default=None, help="Address serve listens on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=None, help="Port serve listens on (default: 8765)")
+    parser.add_argument("--socket", default=None, help="Serve on this Unix socket instead of HTTP on localhost")
+    # "main.py watch <process> <dir>" runs the daemon mode, "main.py serve <process>" the job server
+    argv = sys.argv[1:]
+    mode = argv[0] if argv[:1] in (['watch'], ['serve']) else None
+    args = parser.parse_args(argv[1:] if mode else argv)
+    watch = mode == 'watch'
+
+    if args.all:
+        # With --all the only positional argument is the source directory
+        if args.source_dir is not None:
+            parser.error("--all takes no process names")
+        args.source_dir, args.process = args.process, None
+    elif not args.process and not args.merge:
+        parser.error("a process name or --all is required")
+    if watch and not args.source_dir:
+        parser.error("watch needs a directory to watch")
 
     # Conditionally install plugin requirements
     if args.install:
@@ -45,23 +76,76 @@ def main():
     if args.stop_on_error:
         config['general']['stop_on_error'] = True
 
+    if args.adaptive_rules:
+        config['general']['adaptive_rules'] = True
+
+    if args.workers:
+        config['general']['workers'] = args.workers
+
+    if args.resume:
+        config['general']['resume'] = True
+
+    if args.profile:
+        config['general']['profile_dir'] = args.profile
+
+    if args.log_file:
+        config['general']['log_file'] = args.log_file
+
+    if args.warmup:
+        config['general']['warmup'] = True
+
+    if args.shard:
+        config['general']['shard'] = args.shard
+
+    server_options = {option: getattr(args, option) for option in ('host', 'port', 'socket') if getattr(args, option) is not None}
+    if server_options:
+        config['general']['server'] = dict(config['general'].get('server') or {}, **server_options)
+
+    if args.no_cache:
+        config['general']['rule_cache'] = None
+
     processor = ImageProcessor(config)
-    processor.load_plugins(args.process)
-
-    if args.source_dir:
-        print(f"Processing images in directory: {args.source_dir}")
-        processor.process_images(args.source_dir)
-    else:
-        print("No source directory provided. Executing action directly.")
-        # Directly invoke the first action if no source directory is provided
-        for action in processor.processes[args.process].actions:
-            generated_image_path = action['instance'].execute()
-            print(f"Generated image saved at: {generated_image_path}")
-
-    if args.log:
-        print("\nProcessing Log:")
-        for log_entry in processor.get_log():
-            print(log_entry)
+    if args.clear_cache:
+        if processor.rule_cache is not None:
+            processor.rule_cache.clear()
+            print(f"Cleared rule cache at {processor.rule_cache.path}")
+        else:
+            print("No rule cache configured; nothing to clear.")
+    if args.merge:
+        merged = processor.merge_shards(args.merge, args.output)
+        processor.close()
+        print(f"Merged {len(merged['shards'])} of {merged['count']} shards into {args.output}")
+        if not merged['complete']:
+            print(f"Missing shards: {merged['missing_shards']}, unfinished shards: {merged['incomplete_shards']}")
+            sys.exit(1)
+        return
+
+    process_names = list(config['processes']) if args.all else [name.strip() for name in args.process.split(',') if name.strip()]
+    for process_name in process_names:
+        processor.load_plugins(process_name)
+
+    # Closing flushes buffered results and caches even when the run stops on an error
+    try:
+        if mode == 'serve':
+            processor.serve()
+        elif watch:
+            print(f"Watching {args.source_dir} for new images; press Ctrl-C to stop")
+            processor.watch(args.source_dir)
+        elif args.source_dir:
+            print(f"Processing images in directory: {args.source_dir}")
+            processor.process_images(args.source_dir)
+        else:
+            print("No source directory provided. Executing action directly.")
+            # Directly invoke the first action if no source directory is provided
+            for process_name in process_names:
+                for action in processor.processes[process_name].actions:
+                    generated_image_path = action['instance'].execute()
+                    print(f"Generated image saved at: {generated_image_path}")
+    finally:
+        processor.close()
+
+    if args.startup_report:
+        print(processor.startup_report())
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,188 @@
+import os
+import json
+import time
+import pstats
+import cProfile
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+# Upper bounds in seconds of the per-file latency histogram buckets
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, float('inf'))
+
+PluginKey = Tuple[str, str, str, str]  # (process, kind, name, plugin)
+
+def _label_value(value: Any) -> str:
+    # Text exposition format: backslash, double quote and newline are escaped in label values
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class PluginMetrics:
+    def __init__(self, calls: int = 0, files: int = 0, total_time: float = 0.0, passes: int = 0, errors: int = 0,
+                 buckets: Optional[List[int]] = None):
+        self.calls = calls
+        self.files = files
+        self.total_time = total_time
+        self.passes = passes
+        self.errors = errors
+        self.buckets = list(buckets) if buckets else [0] * len(LATENCY_BUCKETS)
+
+    def observe(self, elapsed: float, files: int, passes: int, errors: int):
+        self.calls += 1
+        self.files += files
+        self.total_time += elapsed
+        self.passes += passes
+        self.errors += errors
+        # A batched call counts once per file, at its share of the call's time
+        per_file = elapsed / max(1, files)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if per_file <= bound:
+                self.buckets[i] += max(1, files)
+                break
+
+    def merge(self, other: 'PluginMetrics'):
+        self.calls += other.calls
+        self.files += other.files
+        self.total_time += other.total_time
+        self.passes += other.passes
+        self.errors += other.errors
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'calls': self.calls, 'files': self.files, 'total_time': self.total_time, 'passes': self.passes,
+                'errors': self.errors, 'buckets': self.buckets}
+
+# Per-plugin call counts, latency histograms, pass rates and run throughput. Worker processes
+# keep their own Metrics and ship what they recorded since the last batch with each result.
+class Metrics:
+    def __init__(self):
+        self.plugins: Dict[PluginKey, PluginMetrics] = {}
+        self.pending: Dict[PluginKey, PluginMetrics] = {}
+        self.files_done = 0
+        self.files_failed = 0
+        self.bytes_read = 0
+        # Rule evaluations answered by an identical rule already evaluated for the same file
+        self.shared_results = 0
+        self.discovery: Dict[str, Any] = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def observe(self, key: PluginKey, elapsed: float, files: int = 1, passes: int = 0, errors: int = 0):
+        with self._lock:
+            for table in (self.plugins, self.pending):
+                if key not in table:
+                    table[key] = PluginMetrics()
+                table[key].observe(elapsed, files, passes, errors)
+
+    def count_files(self, done: int, failed: int):
+        with self._lock:
+            self.files_done += done
+            self.files_failed += failed
+
+    def count_shared(self, count: int):
+        with self._lock:
+            self.shared_results += count
+
+    def take_pending(self) -> List[Tuple[PluginKey, Dict[str, Any]]]:
+        with self._lock:
+            delta = [(key, metrics.to_dict()) for key, metrics in self.pending.items()]
+            self.pending = {}
+        return delta
+
+    def merge(self, delta: List[Tuple[PluginKey, Dict[str, Any]]]):
+        with self._lock:
+            for key, values in delta:
+                key = tuple(key)
+                if key not in self.plugins:
+                    self.plugins[key] = PluginMetrics()
+                self.plugins[key].merge(PluginMetrics(**values))
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed = max(time.time() - self.started, 1e-9)
+        with self._lock:
+            plugins = []
+            for (process, kind, name, plugin), metrics in sorted(self.plugins.items()):
+                entry = {'process': process, 'kind': kind, 'name': name, 'plugin': plugin, **metrics.to_dict()}
+                entry['mean_latency'] = metrics.total_time / metrics.files if metrics.files else 0.0
+                entry['files_per_sec'] = metrics.files / metrics.total_time if metrics.total_time else 0.0
+                if kind == 'rule':
+                    entry['pass_rate'] = metrics.passes / metrics.files if metrics.files else 0.0
+                entry['buckets'] = dict(zip([str(bound) for bound in LATENCY_BUCKETS], metrics.buckets))
+                plugins.append(entry)
+            return {
+                'elapsed': elapsed,
+                'files_done': self.files_done,
+                'files_failed': self.files_failed,
+                'files_per_sec': (self.files_done + self.files_failed) / elapsed,
+                'bytes_read': self.bytes_read,
+                'shared_results': self.shared_results,
+                'discovery': dict(self.discovery),
+                'plugins': plugins,
+            }
+
+    def write_json(self, path: str):
+        _write_atomic(path, json.dumps(self.summary(), indent=2))
+
+    def write_prometheus(self, path: str):
+        summary = self.summary()
+        lines = [
+            '# TYPE sidm_files_total counter',
+            f'sidm_files_total{{outcome="done"}} {summary["files_done"]}',
+            f'sidm_files_total{{outcome="error"}} {summary["files_failed"]}',
+            '# TYPE sidm_files_per_second gauge',
+            f'sidm_files_per_second {summary["files_per_sec"]}',
+            '# TYPE sidm_bytes_read_total counter',
+            f'sidm_bytes_read_total {summary["bytes_read"]}',
+            '# TYPE sidm_shared_rule_results_total counter',
+            f'sidm_shared_rule_results_total {summary["shared_results"]}',
+        ]
+        for field, value in sorted(summary['discovery'].items()):
+            lines.append(f'# TYPE sidm_discovery_{field} gauge')
+            lines.append(f'sidm_discovery_{field} {value}')
+        lines += ['# TYPE sidm_plugin_calls_total counter', '# TYPE sidm_plugin_passes_total counter',
+                  '# TYPE sidm_plugin_errors_total counter', '# TYPE sidm_plugin_latency_seconds histogram']
+        for entry in summary['plugins']:
+            labels = ','.join(f'{label}="{_label_value(entry[label])}"' for label in ('process', 'kind', 'name', 'plugin'))
+            lines.append(f'sidm_plugin_calls_total{{{labels}}} {entry["calls"]}')
+            lines.append(f'sidm_plugin_passes_total{{{labels}}} {entry["passes"]}')
+            lines.append(f'sidm_plugin_errors_total{{{labels}}} {entry["errors"]}')
+            cumulative = 0
+            for bound, count in entry['buckets'].items():
+                cumulative += count
+                le = '+Inf' if bound == 'inf' else bound
+                lines.append(f'sidm_plugin_latency_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f'sidm_plugin_latency_seconds_sum{{{labels}}} {entry["total_time"]}')
+            lines.append(f'sidm_plugin_latency_seconds_count{{{labels}}} {entry["files"]}')
+        _write_atomic(path, '\n'.join(lines) + '\n')
+
+# One cProfile.Profile per plugin, enabled only around that plugin's calls
+class PluginProfiler:
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self.profiles: Dict[PluginKey, cProfile.Profile] = {}
+        self._lock = threading.Lock()
+
+    def call(self, key: PluginKey, func, *args):
+        with self._lock:
+            profile = self.profiles.get(key)
+            if profile is None:
+                profile = self.profiles[key] = cProfile.Profile()
+        return profile.runcall(func, *args)
+
+    def dump(self) -> List[str]:
+        os.makedirs(self.output_dir, exist_ok=True)
+        written = []
+        for (process, kind, name, _), profile in self.profiles.items():
+            # Worker processes dump their own profiles, so the pid keeps the files apart
+            base = os.path.join(self.output_dir, f"{process}.{kind}.{name}.{os.getpid()}")
+            profile.dump_stats(base + '.prof')
+            with open(base + '.txt', 'w') as f:
+                pstats.Stats(profile, stream=f).sort_stats('cumulative').print_stats(30)
+            written.append(base + '.prof')
+        return written
+
+def _write_atomic(path: str, text: str):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
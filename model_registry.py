@@ -0,0 +1,144 @@
+import gc
+import sys
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+ModelKey = Tuple[str, str, Optional[str], Optional[str], Optional[str]]
+
+def model_key(backend: str, model_id: str, revision: Optional[str] = None, dtype: Optional[str] = None,
+              device: Optional[str] = None) -> ModelKey:
+    return (backend, model_id, revision, None if dtype is None else str(dtype), None if device is None else str(device))
+
+def estimate_size(obj: Any) -> int:
+    # Bytes held by parameters and buffers; objects we can't measure count as zero
+    if hasattr(obj, 'parameters') and callable(obj.parameters):
+        try:
+            tensors = list(obj.parameters()) + (list(obj.buffers()) if hasattr(obj, 'buffers') else [])
+            return sum(t.numel() * t.element_size() for t in tensors)
+        except Exception:
+            return 0
+    if hasattr(obj, 'components') and isinstance(obj.components, dict):
+        # diffusers pipelines
+        return sum(estimate_size(component) for component in obj.components.values())
+    if hasattr(obj, 'nbytes'):
+        return int(obj.nbytes)
+    if isinstance(obj, (list, tuple)):
+        return sum(estimate_size(item) for item in obj)
+    if isinstance(obj, dict):
+        return sum(estimate_size(item) for item in obj.values())
+    return 0
+
+class _Entry:
+    def __init__(self, loader: Callable[[], Any]):
+        self.loader = loader
+        self.model = None
+        self.size = 0
+        self.refs = 0
+        self.last_used = 0
+        self.loads = 0
+        self.lock = threading.Lock()
+
+# A handle on a shared model. Call get() for each use rather than keeping the model around,
+# so the registry can unload it under memory pressure and load it again on demand.
+class ModelLease:
+    def __init__(self, registry: 'ModelRegistry', key: ModelKey):
+        self.registry = registry
+        self.key = key
+        self.released = False
+
+    def get(self) -> Any:
+        return self.registry._get(self.key)
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.registry._release(self.key)
+
+# One instance of each model per process, no matter how many plugins ask for it. Models are
+# unloaded when their last lease is released, and least recently used ones are unloaded
+# once the loaded models exceed the memory budget.
+class ModelRegistry:
+    def __init__(self, memory_budget_mb: Optional[float] = None):
+        self.memory_budget = None
+        self.configure(memory_budget_mb)
+        self._entries: Dict[ModelKey, _Entry] = {}
+        self._clock = 0
+        self._lock = threading.Lock()
+
+    def configure(self, memory_budget_mb: Optional[float]):
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024) if memory_budget_mb else None
+
+    def acquire(self, key: ModelKey, loader: Callable[[], Any]) -> ModelLease:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry(loader)
+            entry.refs += 1
+        return ModelLease(self, key)
+
+    def loaded_size(self) -> int:
+        with self._lock:
+            return sum(entry.size for entry in self._entries.values() if entry.model is not None)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                '/'.join(str(part) for part in key if part is not None): {
+                    'refs': entry.refs, 'loaded': entry.model is not None, 'size': entry.size, 'loads': entry.loads,
+                }
+                for key, entry in self._entries.items()
+            }
+
+    def _get(self, key: ModelKey) -> Any:
+        with self._lock:
+            entry = self._entries[key]
+            self._clock += 1
+            entry.last_used = self._clock
+        # Loading can take a while, so only callers of this model wait for it
+        with entry.lock:
+            model = entry.model
+            if model is None:
+                model = entry.model = entry.loader()
+                entry.size = estimate_size(model)
+                entry.loads += 1
+        self._evict(keep=key)
+        return model
+
+    def _release(self, key: ModelKey):
+        with self._lock:
+            entry = self._entries[key]
+            entry.refs -= 1
+            if entry.refs > 0:
+                return
+            del self._entries[key]
+            entry.model = None
+        self._free_memory()
+
+    def _evict(self, keep: ModelKey):
+        if self.memory_budget is None:
+            return
+        with self._lock:
+            loaded = [(entry.last_used, key) for key, entry in self._entries.items() if entry.model is not None]
+            total = sum(self._entries[key].size for _, key in loaded)
+            evicted = False
+            for _, key in sorted(loaded):
+                if total <= self.memory_budget:
+                    break
+                if key == keep:
+                    continue
+                entry = self._entries[key]
+                total -= entry.size
+                # Callers in the middle of a call still hold their own reference
+                entry.model = None
+                evicted = True
+        if evicted:
+            self._free_memory()
+
+    @staticmethod
+    def _free_memory():
+        gc.collect()
+        torch = sys.modules.get('torch')
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+model_registry = ModelRegistry()
@@ -0,0 +1,99 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple, Union
+import numpy as np
+from PIL import Image
+from image_handle import ImageHandle
+from lazy_import import lazy_import
+
+# imagehash computes its DCT with scipy.fftpack; the same routine keeps the bits identical
+fftpack = lazy_import('scipy.fftpack')
+
+HASH_METHODS = ('phash', 'dhash', 'ahash')
+DEFAULT_HASH_SIZE = 8
+DEFAULT_HIGHFREQ_FACTOR = 4
+DEFAULT_THREADS = 4
+
+Source = Union[str, ImageHandle, Image.Image]
+
+def pack_bits(bits: np.ndarray) -> List[int]:
+    # Row-major, first bit most significant: the integer value of imagehash's hex string
+    flat = bits.reshape(len(bits), -1)
+    padding = -flat.shape[1] % 8
+    packed = np.packbits(flat, axis=1)
+    return [int.from_bytes(row.tobytes(), 'big') >> padding for row in packed]
+
+def phash_bits(pixels: np.ndarray, hash_size: int = DEFAULT_HASH_SIZE) -> np.ndarray:
+    # pixels: (batch, n, n) grayscale at hash_size * highfreq_factor
+    dct = fftpack.dct(fftpack.dct(pixels, axis=1), axis=2)
+    low = dct[:, :hash_size, :hash_size]
+    median = np.median(low.reshape(len(low), -1), axis=1)
+    return low > median[:, None, None]
+
+def dhash_bits(pixels: np.ndarray) -> np.ndarray:
+    # pixels: (batch, hash_size, hash_size + 1); differences between neighbouring columns
+    return pixels[:, :, 1:] > pixels[:, :, :-1]
+
+def ahash_bits(pixels: np.ndarray) -> np.ndarray:
+    # Sums of uint8 pixels are exact in float64, so the batched mean equals the per-image one
+    return pixels > pixels.mean(axis=(1, 2))[:, None, None]
+
+# Hashes groups of images the way imagehash.phash, dhash and average_hash do, bit for bit.
+# Decoding and the grayscale resize run on a thread pool (PIL releases the GIL for both); the
+# DCT, median and comparisons then run once over the whole group as one NumPy array.
+class PerceptualHasher:
+    def __init__(self, method: str = 'phash', hash_size: int = DEFAULT_HASH_SIZE,
+                 highfreq_factor: int = DEFAULT_HIGHFREQ_FACTOR, threads: int = DEFAULT_THREADS,
+                 draft: bool = False):
+        if method not in HASH_METHODS:
+            raise ValueError(f"Unknown hash method '{method}', expected one of {list(HASH_METHODS)}")
+        if hash_size < 2:
+            raise ValueError('Hash size must be greater than or equal to 2')
+        self.method = method
+        self.hash_size = hash_size
+        self.bits = hash_size * hash_size
+        if method == 'phash':
+            side = hash_size * highfreq_factor
+            self.resize_to: Tuple[int, int] = (side, side)
+        elif method == 'dhash':
+            self.resize_to = (hash_size + 1, hash_size)
+        else:
+            self.resize_to = (hash_size, hash_size)
+        # JPEG files given by path are decoded at a reduced scale straight to grayscale. Faster,
+        # but the resize then starts from different pixels, so bits can differ from imagehash.
+        self.draft = draft
+        self._pool = ThreadPoolExecutor(max_workers=max(1, threads), thread_name_prefix="PerceptualHash")
+
+    def hash_images(self, sources: List[Source]) -> List[Union[int, Exception]]:
+        # One packed hash per source, or the exception that kept it from loading
+        loaded = list(self._pool.map(self._load, sources))
+        valid = [i for i, pixels in enumerate(loaded) if not isinstance(pixels, Exception)]
+        if valid:
+            pixels = np.stack([loaded[i] for i in valid])
+            if self.method == 'phash':
+                bits = phash_bits(pixels, self.hash_size)
+            elif self.method == 'dhash':
+                bits = dhash_bits(pixels)
+            else:
+                bits = ahash_bits(pixels)
+            for i, value in zip(valid, pack_bits(bits)):
+                loaded[i] = value
+        return loaded
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+
+    def _load(self, source: Source) -> Union[np.ndarray, Exception]:
+        try:
+            if isinstance(source, ImageHandle):
+                return self._gray(source.pil)
+            if isinstance(source, Image.Image):
+                return self._gray(source)
+            with Image.open(source) as image:
+                if self.draft:
+                    image.draft('L', self.resize_to)
+                return self._gray(image)
+        except Exception as e:
+            return e
+
+    def _gray(self, image: Image.Image) -> np.ndarray:
+        return np.asarray(image.convert('L').resize(self.resize_to, Image.LANCZOS))
@@ -1,6 +1,6 @@
 from typing import Dict, Any
-from image_processor import Action, log_message
-from PIL import Image, ImageDraw, ImageFont
+from image_processor import Action, log_message, get_image_handle
+from PIL import ImageDraw, ImageFont
 
 class AddWatermark(Action):
     def initialize(self, config: Dict[str, Any]) -> None:
@@ -8,7 +8,9 @@ class AddWatermark(Action):
         log_message(f"Initialized AddWatermark with text: {self.watermark_text}")
 
     def execute(self, filepath: str, metadata: Dict[str, Any]) -> str:
-        with Image.open(filepath) as img:
+        image = get_image_handle(metadata, filepath)
+        # Draw on a copy: the decoded image is shared with the other plugins
+        with image.pil.copy() as img:
             draw = ImageDraw.Draw(img)
             width, height = img.size
             font = ImageFont.load_default()
@@ -22,5 +24,6 @@ class AddWatermark(Action):
             y = height - textheight - 10
             draw.text((x, y), self.watermark_text, font=font, fill=(255, 255, 255, 128))
             img.save(filepath)
+        image.invalidate()
         log_message(f"Added watermark to {filepath}")
         return filepath
\ No newline at end of file
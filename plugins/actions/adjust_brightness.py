@@ -1,6 +1,6 @@
 from typing import Dict, Any
-from image_processor import Action, log_message
-from PIL import Image, ImageEnhance
+from image_processor import Action, log_message, get_image_handle
+from PIL import ImageEnhance
 
 class AdjustBrightness(Action):
     def initialize(self, config: Dict[str, Any]) -> None:
@@ -8,9 +8,10 @@ class AdjustBrightness(Action):
         log_message(f"Initialized AdjustBrightness with factor: {self.brightness_factor}")
 
     def execute(self, filepath: str, metadata: Dict[str, Any]) -> str:
-        with Image.open(filepath) as img:
-            enhancer = ImageEnhance.Brightness(img)
-            brightened_img = enhancer.enhance(self.brightness_factor)
-            brightened_img.save(filepath)
+        image = get_image_handle(metadata, filepath)
+        enhancer = ImageEnhance.Brightness(image.pil)
+        brightened_img = enhancer.enhance(self.brightness_factor)
+        brightened_img.save(filepath)
+        image.invalidate()
         log_message(f"Adjusted brightness of {filepath}")
         return filepath
\ No newline at end of file
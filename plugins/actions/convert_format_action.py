@@ -1,6 +1,6 @@
 import os
 from typing import Dict, Any
-from image_processor import Action, log_message
+from image_processor import Action, log_message, get_image_handle
 from PIL import Image
 
 class ConvertFormatAction(Action):
@@ -24,21 +24,21 @@ class ConvertFormatAction(Action):
                 log_message(f"Unsupported input format for {filepath}")
                 return filepath
 
-            # Open the image
-            with Image.open(filepath) as img:
-                # Convert to RGB if necessary (for PNG with transparency)
-                if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
-                    bg = Image.new('RGB', img.size, (255, 255, 255))
-                    bg.paste(img, mask=img.split()[3] if img.mode == 'RGBA' else img.split()[1])
-                    img = bg
-
-                # Generate output filename
-                base_name = os.path.splitext(os.path.basename(filepath))[0]
-                output_filename = f"{base_name}.{self.output_format.lower()}"
-                output_path = os.path.join(self.output_dir, output_filename)
-
-                # Save the image in the new format
-                img.save(output_path, format=self.output_format, quality=self.quality)
+            # Reuse the decoded image shared by this file's rules
+            img = get_image_handle(metadata, filepath).pil
+            # Convert to RGB if necessary (for PNG with transparency)
+            if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+                bg = Image.new('RGB', img.size, (255, 255, 255))
+                bg.paste(img, mask=img.split()[3] if img.mode == 'RGBA' else img.split()[1])
+                img = bg
+
+            # Generate output filename
+            base_name = os.path.splitext(os.path.basename(filepath))[0]
+            output_filename = f"{base_name}.{self.output_format.lower()}"
+            output_path = os.path.join(self.output_dir, output_filename)
+
+            # Save the image in the new format
+            img.save(output_path, format=self.output_format, quality=self.quality)
 
             log_message(f"Converted {filepath} to {output_path}")
             return output_path
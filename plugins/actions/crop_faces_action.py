@@ -1,9 +1,9 @@
 import os
 from typing import Dict, Any
-from image_processor import Action, log_message
-from deepface import DeepFace
+from image_processor import Action, log_message, get_image_handle, lazy_import
 from PIL import Image
-import numpy as np
+
+DeepFace = lazy_import('deepface.DeepFace')
 
 class CropFacesAction(Action):
     def initialize(self, config: Dict[str, Any]) -> None:
@@ -22,12 +22,10 @@ class CropFacesAction(Action):
 
     def execute(self, filepath: str, metadata: Dict[str, Any]) -> str:
         try:
-            # Open image with PIL
-            with Image.open(filepath) as img:
-                # Convert to RGB
-                img_rgb = img.convert('RGB')
-                # Convert to numpy array for DeepFace
-                img_array = np.array(img_rgb)
+            # Reuse the RGB decode shared by this file's rules
+            image = get_image_handle(metadata, filepath)
+            img_rgb = image.rgb_image
+            img_array = image.rgb
 
             # Extract faces from the image
             face_objs = DeepFace.extract_faces(
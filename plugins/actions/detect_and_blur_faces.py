@@ -1,9 +1,9 @@
 import os
 import cv2
-import numpy as np
 from typing import Dict, Any
-from image_processor import Action, log_message
-from deepface import DeepFace
+from image_processor import Action, log_message, get_image_handle, lazy_import
+
+DeepFace = lazy_import('deepface.DeepFace')
 
 class DetectAndBlurFaces(Action):
     def initialize(self, config: Dict[str, Any]) -> None:
@@ -21,10 +21,8 @@ class DetectAndBlurFaces(Action):
 
     def execute(self, filepath: str, metadata: Dict[str, Any]) -> str:
         try:
-            # Read the image
-            img = cv2.imread(filepath)
-            if img is None:
-                raise ValueError(f"Failed to read image: {filepath}")
+            # Faces are blurred in place, so work on a copy of the shared decode
+            img = get_image_handle(metadata, filepath).bgr.copy()
 
             # Detect faces
             faces = DeepFace.extract_faces(img_path=img, 
@@ -1,8 +1,7 @@
 import os
 import json
 from typing import Dict, Any
-from image_processor import Action, log_message
-from PIL import Image
+from image_processor import Action, log_message, get_image_handle
 from PIL.ExifTags import TAGS
 
 class ExtractMetadata(Action):
@@ -11,12 +10,11 @@ class ExtractMetadata(Action):
 
     def execute(self, filepath: str, metadata: Dict[str, Any]) -> str:
         exif_data = {}
-        with Image.open(filepath) as img:
-            exif = img._getexif()
-            if exif:
-                for tag_id, value in exif.items():
-                    tag = TAGS.get(tag_id, tag_id)
-                    exif_data[tag] = str(value)
+        exif = get_image_handle(metadata, filepath).pil._getexif()
+        if exif:
+            for tag_id, value in exif.items():
+                tag = TAGS.get(tag_id, tag_id)
+                exif_data[tag] = str(value)
         
         metadata_filepath = os.path.splitext(filepath)[0] + "_metadata.json"
         with open(metadata_filepath, 'w') as f:
@@ -1,16 +1,19 @@
 import os
-from typing import Dict, Any
-from image_processor import Action, log_message
-from PIL import Image
-import imagehash
-from collections import defaultdict
+from typing import Dict, Any, List, Optional
+from image_processor import (Action, log_message, get_image_handle, HammingIndex, DEFAULT_INDEX_CAPACITY,
+                             PerceptualHasher, DEFAULT_HASH_THREADS)
 
 class FindAndRemoveDuplicatesAction(Action):
     def initialize(self, config: Dict[str, Any]) -> None:
         self.hash_size = config.get('hash_size', 8)
         self.similarity_threshold = config.get('similarity_threshold', 5)
         self.dry_run = config.get('dry_run', True)
-        self.hash_dict = defaultdict(list)
+        # First file seen for each distinct hash, searchable by Hamming distance
+        self.index = HammingIndex(self.hash_size ** 2, self.similarity_threshold,
+                                  config.get('index_capacity', DEFAULT_INDEX_CAPACITY))
+        self.hasher = PerceptualHasher(config.get('hash_method', 'phash'), self.hash_size,
+                                       threads=config.get('hash_threads', DEFAULT_HASH_THREADS),
+                                       draft=config.get('draft_decode', False))
         self.duplicates = []
         self.removed_files = []
 
@@ -18,23 +21,33 @@ class FindAndRemoveDuplicatesAction(Action):
                     f"similarity_threshold: {self.similarity_threshold}, dry_run: {self.dry_run}")
 
     def execute(self, filepath: str, metadata: Dict[str, Any]) -> str:
-        try:
-            with Image.open(filepath) as img:
-                hash = imagehash.phash(img, hash_size=self.hash_size)
+        return self.execute_batch([filepath], [metadata])[0]
+
+    def execute_batch(self, filepaths: List[str], metadatas: List[Dict[str, Any]]) -> List[str]:
+        # The group is hashed in one go; files are then checked against the index in order
+        hashes = self.hasher.hash_images([filepath if self.hasher.draft else get_image_handle(metadata, filepath)
+                                          for filepath, metadata in zip(filepaths, metadatas)])
+        return [self._check(filepath, hash) for filepath, hash in zip(filepaths, hashes)]
 
+    def _check(self, filepath: str, hash) -> str:
+        if isinstance(hash, Exception):
+            log_message(f"Error processing {filepath}: {str(hash)}")
+            return filepath
+        try:
             # Check for duplicates
-            for existing_hash, existing_files in self.hash_dict.items():
-                if abs(hash - existing_hash) <= self.similarity_threshold:
-                    # Found a duplicate
-                    self.duplicates.append((filepath, existing_files[0]))
-                    if not self.dry_run:
-                        os.remove(filepath)
-                        self.removed_files.append(filepath)
-                    log_message(f"{'[DRY RUN] Would remove' if self.dry_run else 'Removed'} duplicate: {filepath} (matches {existing_files[0]})")
-                    return ""  # Return empty string as the file has been (or would be) removed
-
-            # If no duplicate found, add to hash_dict
-            self.hash_dict[hash].append(filepath)
+            match = self.index.find(hash)
+            if match is not None:
+                original = match[1]
+                # Found a duplicate
+                self.duplicates.append((filepath, original))
+                if not self.dry_run:
+                    os.remove(filepath)
+                    self.removed_files.append(filepath)
+                log_message(f"{'[DRY RUN] Would remove' if self.dry_run else 'Removed'} duplicate: {filepath} (matches {original})")
+                return ""  # Return empty string as the file has been (or would be) removed
+
+            # If no duplicate found, add to the index
+            self.index.add(hash, filepath)
             return filepath
 
         except Exception as e:
@@ -42,6 +55,35 @@ class FindAndRemoveDuplicatesAction(Action):
             log_message(error_message)
             return filepath
 
+    def shard_state(self) -> Optional[Dict[str, Any]]:
+        # Each shard only compared its own files; the merge compares the shards with each other
+        if not len(self.index) and not self.duplicates:
+            return None
+        return {
+            'hashes': [[format(hash, f'0{(self.hash_size ** 2 + 3) // 4}x'), filepath] for hash, filepath in self.index.items()],
+            'duplicates': [list(pair) for pair in self.duplicates],
+            'removed_files': self.removed_files,
+        }
+
+    def merge_shards(self, states: List[Dict[str, Any]]) -> None:
+        for state in states:
+            self.duplicates.extend(tuple(pair) for pair in state['duplicates'])
+            self.removed_files.extend(state['removed_files'])
+            for hash_hex, filepath in state['hashes']:
+                hash = int(hash_hex, 16)
+                match = self.index.find(hash)
+                if match is None:
+                    self.index.add(hash, filepath)
+                    continue
+                self.duplicates.append((filepath, match[1]))
+                if not self.dry_run and os.path.exists(filepath):
+                    os.remove(filepath)
+                    self.removed_files.append(filepath)
+        self.finalize()
+
+    def close(self) -> None:
+        self.hasher.close()
+
     def finalize(self) -> None:
         log_message("Duplicate Images Summary:")
         for original, duplicate in self.duplicates:
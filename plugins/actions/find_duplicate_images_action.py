@@ -1,16 +1,19 @@
 import os
-from typing import Dict, Any, List
-from image_processor import Action, log_message
-from PIL import Image
-import imagehash
-from collections import defaultdict
+from typing import Dict, Any, List, Optional
+from image_processor import (Action, log_message, get_image_handle, HammingIndex, DEFAULT_INDEX_CAPACITY,
+                             PerceptualHasher, DEFAULT_HASH_THREADS)
 
 class FindDuplicateImagesAction(Action):
     def initialize(self, config: Dict[str, Any]) -> None:
         self.output_dir = config.get('output_dir', 'duplicate_images')
         self.hash_size = config.get('hash_size', 8)
         self.similarity_threshold = config.get('similarity_threshold', 5)
-        self.hash_dict = defaultdict(list)
+        # First file seen for each distinct hash, searchable by Hamming distance
+        self.index = HammingIndex(self.hash_size ** 2, self.similarity_threshold,
+                                  config.get('index_capacity', DEFAULT_INDEX_CAPACITY))
+        self.hasher = PerceptualHasher(config.get('hash_method', 'phash'), self.hash_size,
+                                       threads=config.get('hash_threads', DEFAULT_HASH_THREADS),
+                                       draft=config.get('draft_decode', False))
         self.duplicates = []
 
         if not os.path.exists(self.output_dir):
@@ -20,19 +23,29 @@ class FindDuplicateImagesAction(Action):
                     f"similarity_threshold: {self.similarity_threshold}, output_dir: {self.output_dir}")
 
     def execute(self, filepath: str, metadata: Dict[str, Any]) -> str:
-        try:
-            with Image.open(filepath) as img:
-                hash = imagehash.phash(img, hash_size=self.hash_size)
+        return self.execute_batch([filepath], [metadata])[0]
+
+    def execute_batch(self, filepaths: List[str], metadatas: List[Dict[str, Any]]) -> List[str]:
+        # The group is hashed in one go; files are then checked against the index in order
+        hashes = self.hasher.hash_images([filepath if self.hasher.draft else get_image_handle(metadata, filepath)
+                                          for filepath, metadata in zip(filepaths, metadatas)])
+        return [self._check(filepath, hash) for filepath, hash in zip(filepaths, hashes)]
 
+    def _check(self, filepath: str, hash) -> str:
+        if isinstance(hash, Exception):
+            log_message(f"Error processing {filepath}: {str(hash)}")
+            return filepath
+        try:
             # Check for duplicates
-            for existing_hash, existing_files in self.hash_dict.items():
-                if abs(hash - existing_hash) <= self.similarity_threshold:
-                    self.duplicates.append((filepath, existing_files[0]))
-                    log_message(f"Found duplicate: {filepath} matches {existing_files[0]}")
-                    return filepath  # Return early as we've found a duplicate
+            match = self.index.find(hash)
+            if match is not None:
+                original = match[1]
+                self.duplicates.append((filepath, original))
+                log_message(f"Found duplicate: {filepath} matches {original}")
+                return filepath  # Return early as we've found a duplicate
 
-            # If no duplicate found, add to hash_dict
-            self.hash_dict[hash].append(filepath)
+            # If no duplicate found, add to the index
+            self.index.add(hash, filepath)
 
             return filepath
 
@@ -41,6 +54,30 @@ class FindDuplicateImagesAction(Action):
             log_message(error_message)
             return filepath
 
+    def shard_state(self) -> Optional[Dict[str, Any]]:
+        # Each shard only compared its own files; the merge compares the shards with each other
+        if not len(self.index) and not self.duplicates:
+            return None
+        return {
+            'hashes': [[format(hash, f'0{(self.hash_size ** 2 + 3) // 4}x'), filepath] for hash, filepath in self.index.items()],
+            'duplicates': [list(pair) for pair in self.duplicates],
+        }
+
+    def merge_shards(self, states: List[Dict[str, Any]]) -> None:
+        for state in states:
+            self.duplicates.extend(tuple(pair) for pair in state['duplicates'])
+            for hash_hex, filepath in state['hashes']:
+                hash = int(hash_hex, 16)
+                match = self.index.find(hash)
+                if match is None:
+                    self.index.add(hash, filepath)
+                    continue
+                self.duplicates.append((filepath, match[1]))
+        self.finalize()
+
+    def close(self) -> None:
+        self.hasher.close()
+
     def finalize(self) -> None:
         # Write duplicates to a file
         output_file = os.path.join(self.output_dir, 'duplicate_images.txt')
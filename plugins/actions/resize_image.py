@@ -1,7 +1,5 @@
-import os
 from typing import Dict, Any
-from image_processor import Action, log_message
-from PIL import Image
+from image_processor import Action, log_message, get_image_handle
 
 class ResizeImage(Action):
     def initialize(self, config: Dict[str, Any]) -> None:
@@ -10,12 +8,15 @@ class ResizeImage(Action):
         log_message(f"Initialized ResizeImage with max dimensions: {self.max_width}x{self.max_height}")
 
     def execute(self, filepath: str, metadata: Dict[str, Any]) -> str:
-        with Image.open(filepath) as img:
-            original_size = img.size
-            img.thumbnail((self.max_width, self.max_height))
-            if img.size != original_size:
+        image = get_image_handle(metadata, filepath)
+        original_size = image.pil.size
+        if original_size[0] > self.max_width or original_size[1] > self.max_height:
+            # thumbnail() resizes in place, so work on a copy of the shared decode
+            with image.pil.copy() as img:
+                img.thumbnail((self.max_width, self.max_height))
                 img.save(filepath)
-                log_message(f"Resized {filepath} from {original_size} to {img.size}")
-            else:
-                log_message(f"No resize needed for {filepath}")
+            image.invalidate()
+            log_message(f"Resized {filepath} from {original_size} to {img.size}")
+        else:
+            log_message(f"No resize needed for {filepath}")
         return filepath
\ No newline at end of file
@@ -1,7 +1,7 @@
-from PIL import Image, ImageFilter
+from PIL import ImageFilter
 import os
 from typing import Dict, Any, List
-from image_processor import Action, log_message
+from image_processor import Action, log_message, get_image_handle
 
 class BlurFacesAction(Action):
     def initialize(self, config: Dict[str, Any]) -> None:
@@ -17,13 +17,13 @@ class BlurFacesAction(Action):
         processed_files = []
 
         try:
-            with Image.open(filepath) as img:
-                blurred_img = img.filter(ImageFilter.GaussianBlur(self.blur_factor))
-                base_name = os.path.splitext(os.path.basename(filepath))[0]
-                output_path = os.path.join(self.output_dir, f"{base_name}_blurred.jpg")
-                blurred_img.save(output_path, format='JPEG', quality=95)
-                processed_files.append(output_path)
-                log_message(f"Blurred image saved to {output_path}")
+            img = get_image_handle(metadata, filepath).pil
+            blurred_img = img.filter(ImageFilter.GaussianBlur(self.blur_factor))
+            base_name = os.path.splitext(os.path.basename(filepath))[0]
+            output_path = os.path.join(self.output_dir, f"{base_name}_blurred.jpg")
+            blurred_img.save(output_path, format='JPEG', quality=95)
+            processed_files.append(output_path)
+            log_message(f"Blurred image saved to {output_path}")
 
         except Exception as e:
             raise RuntimeError(f"Error blurring faces in {filepath}: {str(e)}") from e
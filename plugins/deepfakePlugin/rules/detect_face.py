@@ -1,17 +1,25 @@
 from typing import Dict, Any
-from image_processor import Rule, log_message
+from image_processor import Rule, log_message, get_image_handle, COST_MODEL, model_registry, model_key
 import cv2
-import numpy as np
 
 class DetectFace(Rule):
+    cost = COST_MODEL
+
     def initialize(self, config: Dict[str, Any]) -> None:
-        self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        cascade_path = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+        self.cascade_lease = model_registry.acquire(model_key('opencv', cascade_path), lambda: cv2.CascadeClassifier(cascade_path))
         log_message("Initialized DetectFace")
 
+    def warmup(self):
+        self.cascade_lease.get()
+
+    def close(self):
+        self.cascade_lease.release()
+
     def apply(self, filepath: str, metadata: Dict[str, Any]) -> bool:
-        img = cv2.imread(filepath)
+        img = get_image_handle(metadata, filepath).bgr
         gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        faces = self.face_cascade.detectMultiScale(gray, 1.3, 5)
+        faces = self.cascade_lease.get().detectMultiScale(gray, 1.3, 5)
         result = len(faces) > 0
         log_message(f"DetectFace: {filepath} - {'Passed' if result else 'Failed'}")
         return result
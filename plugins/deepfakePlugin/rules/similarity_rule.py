@@ -1,10 +1,14 @@
-from typing import Dict, Any
-from image_processor import Rule, log_message
-from deepface import DeepFace
+from typing import Dict, Any, List
+from image_processor import Rule, log_message, get_image_handle, COST_MODEL, lazy_import
 import os
 import traceback
 
+DeepFace = lazy_import('deepface.DeepFace')
+verification = lazy_import('deepface.modules.verification')
+
 class SimilarityRule(Rule):
+    cost = COST_MODEL
+
     def initialize(self, config: Dict[str, Any]) -> None:
         self.threshold = config.get('threshold', 0.6)
         self.model_name = config.get('model_name', 'VGG-Face')
@@ -13,6 +17,7 @@ class SimilarityRule(Rule):
         self.negate = config.get('negate', False)
         if not self.reference_img_path or not os.path.exists(self.reference_img_path):
             raise ValueError(f"A valid reference image path must be provided. Current path: {self.reference_img_path}")
+        self.reference_embeddings = None
 
         log_message(f"Initialized SimilarityRule with threshold: {self.threshold}, "
                     f"model: {self.model_name}, metric: {self.distance_metric}, "
@@ -28,7 +33,7 @@ class SimilarityRule(Rule):
 
             result = DeepFace.verify(
                 img1_path=self.reference_img_path,
-                img2_path=filepath,
+                img2_path=get_image_handle(metadata, filepath).bgr,
                 model_name=self.model_name,
                 distance_metric=self.distance_metric,
                 enforce_detection=False
@@ -44,7 +49,7 @@ class SimilarityRule(Rule):
                         f"{'Passed' if is_similar else 'Failed'} "
                         f"(Distance: {distance}, Threshold: {self.threshold})")
 
-            return is_similar ^ self.negate
+            return is_similar if not self.negate else not is_similar
 
         except Exception as e:
             error_message = f"Error in similarity check for {filepath}: {str(e)}\n"
@@ -52,4 +57,38 @@ class SimilarityRule(Rule):
             error_message += f"Traceback:\n{traceback.format_exc()}"
             log_message(error_message)
             print(error_message)
-            return False  # Assume not similar if there's an error
+            raise
+
+    def apply_batch(self, filepaths: List[str], metadatas: List[Dict[str, Any]]) -> List[bool]:
+        # Embed the whole batch in one call and compare against reference embeddings computed once,
+        # the same way DeepFace.verify does pair by pair (closest face pair against the model's threshold)
+        images = [get_image_handle(metadata, filepath).bgr for filepath, metadata in zip(filepaths, metadatas)]
+        try:
+            batch_faces = DeepFace.represent(img_path=images, model_name=self.model_name, enforce_detection=False)
+            if len(batch_faces) != len(images) or not all(isinstance(faces, list) for faces in batch_faces):
+                raise ValueError("expected one list of faces per image")
+            reference_embeddings = self._reference_embeddings()
+            threshold = verification.find_threshold(self.model_name, self.distance_metric)
+            distances = [
+                min(verification.find_distance(reference, face['embedding'], self.distance_metric)
+                    for reference in reference_embeddings for face in faces)
+                for faces in batch_faces
+            ]
+        except Exception as e:
+            log_message(f"Batched similarity check failed, verifying one image at a time: {str(e)}")
+            return super().apply_batch(filepaths, metadatas)
+
+        results = []
+        for filepath, distance in zip(filepaths, distances):
+            is_similar = distance <= threshold
+            log_message(f"Similarity check for {filepath}: "
+                        f"{'Passed' if is_similar else 'Failed'} "
+                        f"(Distance: {distance}, Threshold: {self.threshold})")
+            results.append(is_similar if not self.negate else not is_similar)
+        return results
+
+    def _reference_embeddings(self) -> List[List[float]]:
+        if self.reference_embeddings is None:
+            faces = DeepFace.represent(img_path=self.reference_img_path, model_name=self.model_name, enforce_detection=False)
+            self.reference_embeddings = [face['embedding'] for face in faces]
+        return self.reference_embeddings
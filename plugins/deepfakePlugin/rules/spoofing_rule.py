@@ -1,8 +1,11 @@
 from typing import Dict, Any
-from image_processor import Rule, log_message
-from deepface import DeepFace
+from image_processor import Rule, log_message, get_image_handle, COST_MODEL, lazy_import
+
+DeepFace = lazy_import('deepface.DeepFace')
 
 class SpoofingRule(Rule):
+    cost = COST_MODEL
+
     def initialize(self, config: Dict[str, Any]) -> None:
         self.detector_backend = config.get('detector_backend', 'opencv')
         self.negate = config.get('negate', False)
@@ -13,7 +16,7 @@ class SpoofingRule(Rule):
     def apply(self, filepath: str, metadata: Dict[str, Any]) -> bool:
         try:
             result = DeepFace.verify(
-                img1_path=filepath,
+                img1_path=get_image_handle(metadata, filepath).bgr,
                 model_name=self.model_name,
                 detector_backend=self.detector_backend,
                 prog_bar=False,
@@ -31,4 +34,4 @@ class SpoofingRule(Rule):
             return final_result
         except Exception as e:
             log_message(f"Error in spoofing detection for {filepath}: {str(e)}")
-            return False
+            raise
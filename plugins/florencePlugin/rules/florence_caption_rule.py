@@ -1,35 +1,60 @@
-import os
-from transformers import AutoModelForCausalLM, AutoProcessor
-from PIL import Image
-from image_processor import Rule, log_message
-import torch
+from image_processor import Rule, RuleResult, log_message, get_image_handle, COST_MODEL, model_registry, model_key, lazy_import
+
+# Imported on first use, so loading the plugin stays cheap
+torch = lazy_import('torch')
+transformers = lazy_import('transformers')
 
 class FlorenceCaptionRule(Rule):
+    cost = COST_MODEL
+
     def initialize(self, config):
         self.model_id = config.get('model_id', "thwri/CogFlorence-2.1-Large")
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.model = AutoModelForCausalLM.from_pretrained(self.model_id, trust_remote_code=True).to(self.device).eval()
-        self.processor = AutoProcessor.from_pretrained(self.model_id, trust_remote_code=True)
+        # The device is picked when the model loads; every rule on this model resolves it the same way
+        self.model_lease = model_registry.acquire(model_key('transformers', self.model_id), self._load_model)
         self.prompt = config.get('prompt', "<MORE_DETAILED_CAPTION>")
+        self.max_image_size = config.get('max_image_size', None)  # Downscale before preprocessing, e.g. 1024
         log_message(f"Initialized FlorenceCaptionRule with model {self.model_id}")
 
+    def _load_model(self):
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        model = transformers.AutoModelForCausalLM.from_pretrained(self.model_id, trust_remote_code=True).to(device).eval()
+        processor = transformers.AutoProcessor.from_pretrained(self.model_id, trust_remote_code=True)
+        return model, processor
+
+    def warmup(self):
+        self.model_lease.get()
+
+    def close(self):
+        self.model_lease.release()
+
     def apply(self, filepath, metadata):
         try:
-            image = Image.open(filepath)
-            if image.mode != "RGB":
-                image = image.convert("RGB")
-            inputs = self.processor(text=self.prompt, images=image, return_tensors="pt").to(self.device)
-            generated_ids = self.model.generate(
-                input_ids=inputs["input_ids"],
-                pixel_values=inputs["pixel_values"],
-                max_new_tokens=1024,
-                num_beams=3,
-                do_sample=True
-            )
-            generated_text = self.processor.batch_decode(generated_ids, skip_special_tokens=True)[0]
-            parsed_answer = self.processor.post_process_generation(generated_text, task=self.prompt, image_size=(image.width, image.height))
-            log_message(f"Generated caption for {filepath}: {parsed_answer}")
-            return True  # You can customize this based on further logic
+            return self.apply_batch([filepath], [metadata])[0]
         except Exception as e:
             log_message(f"Error applying FlorenceCaptionRule to {filepath}: {str(e)}")
             return False
+
+    def apply_batch(self, filepaths, metadatas):
+        model, processor = self.model_lease.get()
+        images = []
+        for filepath, metadata in zip(filepaths, metadatas):
+            handle = get_image_handle(metadata, filepath)
+            images.append(handle.downscaled(self.max_image_size) if self.max_image_size else handle.rgb_image)
+        # The processor resizes every image to the same input size, so the batch stacks into one tensor
+        inputs = processor(text=[self.prompt] * len(images), images=images, return_tensors="pt", padding=True).to(model.device)
+        generated_ids = model.generate(
+            input_ids=inputs["input_ids"],
+            pixel_values=inputs["pixel_values"],
+            max_new_tokens=1024,
+            num_beams=3,
+            do_sample=True
+        )
+        generated_texts = processor.batch_decode(generated_ids, skip_special_tokens=True)
+        results = []
+        for filepath, image, generated_text in zip(filepaths, images, generated_texts):
+            parsed_answer = processor.post_process_generation(generated_text, task=self.prompt, image_size=(image.width, image.height))
+            log_message(f"Generated caption for {filepath}: {parsed_answer}")
+            # post_process_generation returns {task: caption}
+            caption = parsed_answer.get(self.prompt) if isinstance(parsed_answer, dict) else parsed_answer
+            results.append(RuleResult(True, caption=caption))
+        return results
@@ -1,6 +1,5 @@
-from PIL import Image
 import os
-from image_processor import Action  # Ensure Action is imported
+from image_processor import Action, get_image_handle  # Ensure Action is imported
 
 class Convert(Action):  # Inherit from Action
     def initialize(self, params):
@@ -12,7 +11,6 @@ class Convert(Action):  # Inherit from Action
     def execute(self, filepath, metadata):
         base_name = os.path.basename(filepath)
         output_path = os.path.join(self.output_dir, f"{os.path.splitext(base_name)[0]}.{self.output_format.lower()}")
-        with Image.open(filepath) as img:
-            img.convert("RGB").save(output_path, self.output_format)
+        get_image_handle(metadata, filepath).rgb_image.save(output_path, self.output_format)
         print(f"Converted {filepath} to {output_path} in format {self.output_format}")
         return output_path
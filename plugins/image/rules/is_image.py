@@ -1,16 +1,16 @@
-from PIL import Image
-from image_processor import Rule  # Ensure Rule is imported
+from image_processor import Rule, get_image_handle, COST_DECODE  # Ensure Rule is imported
 
 class IsImage(Rule):  # Inherit from Rule
+    cost = COST_DECODE
+
     def initialize(self, params):
         self.allowed_formats = params.get("allowed_formats", [".jpg", ".jpeg", ".png"])
 
     def apply(self, filepath, metadata):
-        try:
-            with Image.open(filepath) as img:
-                img.verify()  # Verify that it is an image
+        # Decoding through the shared handle validates the file and leaves the pixels for later rules
+        if get_image_handle(metadata, filepath).is_valid():
             print(f"{filepath} is a valid image")
             return filepath.lower().endswith(tuple(self.allowed_formats))
-        except (IOError, SyntaxError):
+        else:
             print(f"{filepath} is not a valid image")
             return False
@@ -33,3 +33,14 @@ class Copy(Action):
                     raise RuntimeError(f"Failed to copy {filepath} to {target_path}")
 
         return copied_files
+
+    def execute_batch(self, filepaths, metadatas):
+        # Copying needs no per-file metadata, so the engine can hand over a whole group at once.
+        # Each file succeeds or fails on its own: a failure must not hide the files already done.
+        results = []
+        for filepath in filepaths:
+            try:
+                results.extend(self.execute([filepath], {}))
+            except Exception as e:
+                results.append(e)
+        return results
@@ -10,13 +10,14 @@ class Move(Action):
     def execute(self, filepaths, metadata):
         # Since the method expects a list of file paths, we'll iterate through the list
         moved_paths = []
+
+        # Ensure the target directory exists, once for the whole group
+        if not os.path.exists(self.target_dir):
+            os.makedirs(self.target_dir)
+
         for filepath in filepaths:
             print("DEBUG: Move action")
-            
-            # Ensure the target directory exists
-            if not os.path.exists(self.target_dir):
-                os.makedirs(self.target_dir)  # Correct method name
-            
+
             target_path = os.path.join(self.target_dir, os.path.basename(filepath))
             print(f"Moving file: {filepath} to {target_path}")
     
@@ -36,3 +37,14 @@ class Move(Action):
                     raise e  # Raise the exception to handle it appropriately in the process flow
         
         return moved_paths
+
+    def execute_batch(self, filepaths, metadatas):
+        # Moving needs no per-file metadata, so the engine can hand over a whole group at once.
+        # Each file succeeds or fails on its own: a failure must not hide the files already done.
+        results = []
+        for filepath in filepaths:
+            try:
+                results.extend(self.execute([filepath], {}))
+            except Exception as e:
+                results.append(e)
+        return results
@@ -1,7 +1,9 @@
 import os
-from image_processor import Rule  # Ensure Rule is imported
+from image_processor import Rule, COST_METADATA  # Ensure Rule is imported
 
 class FileType(Rule):  # Inherit from Rule
+    cost = COST_METADATA
+
     def initialize(self, params):
         self.allowed_types = params.get("allowed_types", [".txt", ".pdf", ".docx", ".xlsx"])
 
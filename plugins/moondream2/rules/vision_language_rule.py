@@ -1,34 +1,62 @@
-import os
-from transformers import AutoModelForCausalLM, AutoTokenizer
-from PIL import Image
-from image_processor import Rule, log_message
+from image_processor import Rule, RuleResult, log_message, get_image_handle, COST_MODEL, model_registry, model_key, lazy_import
+
+# Imported on first use, so loading the plugin stays cheap
+transformers = lazy_import('transformers')
 
 class VisionLanguageRule(Rule):
+    cost = COST_MODEL
+
     def initialize(self, config):
         self.model_id = config.get('model_id', "vikhyatk/moondream2")
         self.revision = config.get('revision', "2024-05-20")
         self.question = config.get('question', "Describe this image.")
         self.expected_answer = config.get('expected_answer', None)
-        self.tokenizer = AutoTokenizer.from_pretrained(self.model_id, revision=self.revision)
-        self.model = AutoModelForCausalLM.from_pretrained(self.model_id, trust_remote_code=True, revision=self.revision)
+        self.max_image_size = config.get('max_image_size', None)  # Downscale before encoding, e.g. 756
+        # Rules asking the same question of the same model share one copy of the weights
+        self.model_lease = model_registry.acquire(model_key('transformers', self.model_id, self.revision), self._load_model)
         log_message(f"Initialized VisionLanguageRule with model {self.model_id} and revision {self.revision}")
 
+    def _load_model(self):
+        tokenizer = transformers.AutoTokenizer.from_pretrained(self.model_id, revision=self.revision)
+        model = transformers.AutoModelForCausalLM.from_pretrained(self.model_id, trust_remote_code=True, revision=self.revision)
+        return model, tokenizer
+
+    def warmup(self):
+        self.model_lease.get()
+
+    def close(self):
+        self.model_lease.release()
+
     def apply(self, filepath, metadata):
         try:
-            image = Image.open(filepath)
-            enc_image = self.model.encode_image(image)
-            answer = self.model.answer_question(enc_image, self.question, self.tokenizer)
-            log_message(f"Question: {self.question}")
-            log_message(f"Model answer: {answer}")
-
-            if self.expected_answer:
-                result = self.expected_answer.lower() in answer.lower()
-                log_message(f"Expected answer found: {result}")
-                return result
-            else:
-                log_message(f"No expected answer provided, returning True by default")
-                return True
+            model, tokenizer = self.model_lease.get()
+            enc_image = model.encode_image(self._image(filepath, metadata))
+            answer = model.answer_question(enc_image, self.question, tokenizer)
+            return self._check_answer(answer)
 
         except Exception as e:
             log_message(f"Error applying VisionLanguageRule to {filepath}: {str(e)}")
             return False
+
+    def apply_batch(self, filepaths, metadatas):
+        # One padded generation pass for the whole micro-batch
+        model, tokenizer = self.model_lease.get()
+        images = [self._image(filepath, metadata) for filepath, metadata in zip(filepaths, metadatas)]
+        answers = model.batch_answer(images=images, prompts=[self.question] * len(images), tokenizer=tokenizer)
+        return [self._check_answer(answer) for answer in answers]
+
+    def _image(self, filepath, metadata):
+        handle = get_image_handle(metadata, filepath)
+        return handle.downscaled(self.max_image_size) if self.max_image_size else handle.pil
+
+    def _check_answer(self, answer):
+        log_message(f"Question: {self.question}")
+        log_message(f"Model answer: {answer}")
+
+        if self.expected_answer:
+            result = self.expected_answer.lower() in answer.lower()
+            log_message(f"Expected answer found: {result}")
+            return RuleResult(result, answer=answer)
+        else:
+            log_message(f"No expected answer provided, returning True by default")
+            return RuleResult(True, answer=answer)
@@ -1,10 +1,18 @@
-import cv2
+import io
 import base64
+import threading
 import requests
-from typing import Dict, Any
-from image_processor import Rule, log_message
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, Any, List
+from image_processor import Rule, log_message, get_image_handle, COST_MODEL
+
+JPEG_MAGIC = b'\xff\xd8\xff'
 
 class AIFaceValidation(Rule):
+    cost = COST_MODEL
+
     def initialize(self, config: Dict[str, Any]) -> None:
         self.api_url = config['api_url']
         self.model = config.get('model', 'default')
@@ -14,16 +22,73 @@ class AIFaceValidation(Rule):
         self.frequency_penalty = float(config.get('frequency_penalty', 0))
         self.presence_penalty = float(config.get('presence_penalty', 0))
         self.prompt = config.get('prompt', "Validate if this image contains a human face. Respond with only 'yes' or 'no' but then explain.")
+        self.max_in_flight = max(1, int(config.get('max_in_flight', 4)))
+        self.timeout = float(config.get('timeout', 120))
+        self.retries = int(config.get('retries', 3))
+        self.backoff = float(config.get('backoff', 0.5))
+        # JPEGs within these limits are sent as they are; anything else is re-encoded
+        self.max_image_size = config.get('max_image_size', None)
+        self.max_upload_mb = float(config.get('max_upload_mb', 10))
+        self.jpeg_quality = int(config.get('jpeg_quality', 90))
+        self._session = None
+        self._executor = None
+        self._lock = threading.Lock()
         log_message(f"Initialized AIFaceValidation with model: {self.model}")
         log_message(f"Using prompt: {self.prompt}")
 
+    @property
+    def session(self) -> requests.Session:
+        # One keep-alive connection pool shared by every request, with retry and backoff
+        with self._lock:
+            if self._session is None:
+                retry = Retry(total=self.retries, backoff_factor=self.backoff,
+                              status_forcelist=(429, 500, 502, 503, 504), allowed_methods=None)
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_in_flight, max_retries=retry)
+                self._session = requests.Session()
+                self._session.mount('http://', adapter)
+                self._session.mount('https://', adapter)
+            return self._session
+
+    def close(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
     def apply(self, filepath: str, metadata: Dict[str, Any]) -> bool:
-        image = cv2.imread(filepath)
-        _, buffer = cv2.imencode('.jpg', image)
-        image_base64 = base64.b64encode(buffer).decode('utf-8')
+        validation_result, response = self.validate_image(self.encode_image(filepath, metadata))
+        return self._result(filepath, validation_result, response)
+
+    def apply_batch(self, filepaths: List[str], metadatas: List[Dict[str, Any]]) -> List[Any]:
+        # Up to max_in_flight requests run at once; a failed request only fails its own file
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="AIFaceValidation")
+            executor = self._executor
+        futures = [executor.submit(self.apply, filepath, metadata) for filepath, metadata in zip(filepaths, metadatas)]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
 
-        validation_result, response = self.validate_image(image_base64)
+    def encode_image(self, filepath: str, metadata: Dict[str, Any]) -> str:
+        handle = get_image_handle(metadata, filepath)
+        data = handle.data
+        if (data.startswith(JPEG_MAGIC) and len(data) <= self.max_upload_mb * 1024 * 1024
+                and (not self.max_image_size or max(handle.size) <= self.max_image_size)):
+            return base64.b64encode(data).decode('utf-8')
+        image = handle.downscaled(self.max_image_size) if self.max_image_size else handle.rgb_image
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=self.jpeg_quality)
+        return base64.b64encode(buffer.getvalue()).decode('utf-8')
 
+    def _result(self, filepath: str, validation_result, response) -> bool:
         if validation_result is None:  # This indicates an error occurred
             error_message = f"AI Face Validation failed: {response}"
             log_message(error_message)
@@ -50,7 +115,7 @@ class AIFaceValidation(Rule):
         }
 
         try:
-            response = requests.post(self.api_url, json=payload)
+            response = self.session.post(self.api_url, json=payload, timeout=self.timeout)
             if response.status_code == 200:
                 ai_response = response.json().get('response', 'No response generated')
                 # Check if the response starts with 'yes', ignoring case and leading/trailing whitespace
@@ -63,4 +128,4 @@ class AIFaceValidation(Rule):
         except Exception as e:
             error_message = f"Exception in AI request: {str(e)}"
             log_message(error_message)
-            return None, error_message
\ No newline at end of file
+            return None, error_message
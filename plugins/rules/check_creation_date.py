@@ -1,16 +1,32 @@
 import os
 from datetime import datetime, timedelta
 from typing import Dict, Any
-from image_processor import Rule, log_message
+from image_processor import Rule, log_message, get_image_handle, COST_METADATA
+
+EXIF_DATE_FORMAT = '%Y:%m:%d %H:%M:%S'
 
 class CheckCreationDate(Rule):
+    cost = COST_METADATA
+
     def initialize(self, config: Dict[str, Any]) -> None:
         self.max_age_days = config['max_age_days']
+        # Prefer the EXIF capture date over the file's ctime where the image has one
+        self.use_exif = config.get('use_exif', False)
         log_message(f"Initialized CheckCreationDate with max age: {self.max_age_days} days")
 
     def apply(self, filepath: str, metadata: Dict[str, Any]) -> bool:
-        creation_time = datetime.fromtimestamp(os.path.getctime(filepath))
+        creation_time = self._exif_time(filepath, metadata) if self.use_exif else None
+        if creation_time is None:
+            creation_time = datetime.fromtimestamp(metadata['ctime'] if 'ctime' in metadata else os.path.getctime(filepath))
         age = datetime.now() - creation_time
         result = age <= timedelta(days=self.max_age_days)
         log_message(f"CheckCreationDate: {filepath} (Age: {age.days} days) - {'Passed' if result else 'Failed'}")
-        return result
\ No newline at end of file
+        return result
+
+    def _exif_time(self, filepath: str, metadata: Dict[str, Any]):
+        # The engine's header probe has usually filled this in already
+        taken_at = metadata['taken_at'] if 'taken_at' in metadata else get_image_handle(metadata, filepath).header['taken_at']
+        try:
+            return datetime.strptime(taken_at, EXIF_DATE_FORMAT) if taken_at else None
+        except ValueError:
+            return None
@@ -1,7 +1,9 @@
 from typing import Dict, Any
-from image_processor import Rule, log_message
+from image_processor import Rule, log_message, COST_METADATA
 
 class CheckFileSize(Rule):
+    cost = COST_METADATA
+
     def initialize(self, config: Dict[str, Any]) -> None:
         self.max_size = config['max_size']
         log_message(f"Initialized CheckFileSize with max size: {self.max_size} bytes")
@@ -1,8 +1,10 @@
 import os
 from typing import Dict, Any
-from image_processor import Rule, log_message
+from image_processor import Rule, log_message, COST_METADATA
 
 class FilterValidImages(Rule):
+    cost = COST_METADATA
+
     def initialize(self, config: Dict[str, Any]) -> None:
         self.allowed_formats = config['allowed_formats']
         log_message(f"Initialized FilterValidImages with allowed formats: {self.allowed_formats}")
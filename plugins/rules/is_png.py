@@ -1,8 +1,10 @@
 import os
 from typing import Dict, Any
-from image_processor import Rule, log_message
+from image_processor import Rule, log_message, COST_METADATA
 
 class IsPNG(Rule):
+    cost = COST_METADATA
+
     def initialize(self, config: Dict[str, Any]) -> None:
         log_message("Initialized IsPNG rule")
 
@@ -1,8 +1,9 @@
 from typing import Dict, Any
-from image_processor import Rule, log_message
-from PIL import Image
+from image_processor import Rule, log_message, get_image_handle, COST_HEADER
 
 class IsSmallImage(Rule):
+    cost = COST_HEADER
+
     def initialize(self, config: Dict[str, Any]) -> None:
         self.min_width = config.get('min_width', 100)
         self.min_height = config.get('min_height', 100)
@@ -10,8 +11,7 @@ class IsSmallImage(Rule):
 
     def apply(self, filepath: str, metadata: Dict[str, Any]) -> bool:
         try:
-            with Image.open(filepath) as img:
-                width, height = img.size
+            width, height = get_image_handle(metadata, filepath).size
             is_small = width < self.min_width or height < self.min_height
             log_message(f"IsSmallImage for {filepath}: {'Small' if is_small else 'Not small'}")
             return is_small
@@ -1,8 +1,10 @@
 import os
-import torch
-from diffusers import AutoPipelineForText2Image
 from typing import Dict, Any
-from image_processor import Action, log_message
+from image_processor import Action, log_message, model_registry, model_key, lazy_import
+
+# Imported on first use, so loading the plugin stays cheap
+torch = lazy_import('torch')
+diffusers = lazy_import('diffusers')
 
 class SDXLImageGenerationAction(Action):
     def initialize(self, config: Dict[str, Any]) -> None:
@@ -17,28 +19,39 @@ class SDXLImageGenerationAction(Action):
         # Create the output directory if it doesn't exist
         os.makedirs(self.output_dir, exist_ok=True)
 
+        # The SDXL model is loaded on first use and shared with any other action using the same weights
+        self.pipe_lease = model_registry.acquire(model_key('diffusers-auto', self.model_id, dtype='float16'), self._load_pipeline)
+
+        log_message(f"Initialized SDXLImageGenerationAction with model: {self.model_id}")
+        log_message(f"Prompt: {self.prompt}")
+        log_message(f"Output directory: {self.output_dir}")
+
+    def _load_pipeline(self):
         # Determine the device (CUDA if available, otherwise CPU)
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        log_message(f"Using device: {self.device}")
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        log_message(f"Using device: {device}")
 
-        # Load the SDXL model
-        self.pipe = AutoPipelineForText2Image.from_pretrained(
+        pipe = diffusers.AutoPipelineForText2Image.from_pretrained(
             self.model_id,
             torch_dtype=torch.float16,
             variant="fp16"
         )
-        self.pipe.to(self.device)
+        pipe.to(device)
+        return pipe
 
-        log_message(f"Initialized SDXLImageGenerationAction with model: {self.model_id}")
-        log_message(f"Prompt: {self.prompt}")
-        log_message(f"Output directory: {self.output_dir}")
+    def warmup(self):
+        self.pipe_lease.get()
+
+    def close(self):
+        self.pipe_lease.release()
 
     def execute(self, metadata: Dict[str, Any] = None) -> str:
         try:
+            pipe = self.pipe_lease.get()
             log_message("Starting image generation...")
 
             # Generate the image
-            result = self.pipe(
+            result = pipe(
                 prompt=self.prompt,
                 num_inference_steps=self.num_inference_steps,
                 guidance_scale=self.guidance_scale,
@@ -1,8 +1,10 @@
 import os
-import torch
-from diffusers import StableDiffusionPipeline
 from typing import Dict, Any, List
-from image_processor import Action, log_message
+from image_processor import Action, log_message, model_registry, model_key, lazy_import
+
+# Imported on first use, so loading the plugin stays cheap
+torch = lazy_import('torch')
+diffusers = lazy_import('diffusers')
 
 class StableDiffusionImageGenerationAction(Action):
     def initialize(self, config: Dict[str, Any]) -> None:
@@ -22,34 +24,47 @@ class StableDiffusionImageGenerationAction(Action):
         # Create the output directory if it doesn't exist
         os.makedirs(self.output_dir, exist_ok=True)
 
+        # The model is loaded on first use with the dtype and device picked then,
+        # and shared with any other action using the same weights
+        self.pipe_lease = model_registry.acquire(model_key('diffusers', self.model_id), self._load_pipeline)
+
+        log_message(f"Initialized StableDiffusionImageGenerationAction with model: {self.model_id}")
+        log_message(f"Output directory: {self.output_dir}")
+        log_message(f"Prompt: {self.prompt}")
+        log_message(f"Negative Prompt: {self.negative_prompt}")
+        log_message(f"Batch size: {self.batch_size}")
+
+    def _load_pipeline(self):
         # Determine the device (CUDA if available, otherwise CPU)
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        log_message(f"Using device: {self.device}")
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        log_message(f"Using device: {device}")
 
         # Load the model with appropriate dtype
-        self.pipe = StableDiffusionPipeline.from_pretrained(
+        pipe = diffusers.StableDiffusionPipeline.from_pretrained(
             self.model_id,
             torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
         )
-        self.pipe = self.pipe.to(self.device)
+        pipe = pipe.to(device)
 
         # Enable memory optimizations if configured
         if self.use_attention_slicing:
-            self.pipe.enable_attention_slicing()
+            pipe.enable_attention_slicing()
             log_message("Enabled attention slicing for memory optimization.")
 
         if self.use_vae_slicing:
-            self.pipe.enable_vae_slicing()
+            pipe.enable_vae_slicing()
             log_message("Enabled VAE slicing for memory optimization.")
+        return pipe
 
-        log_message(f"Initialized StableDiffusionImageGenerationAction with model: {self.model_id}")
-        log_message(f"Output directory: {self.output_dir}")
-        log_message(f"Prompt: {self.prompt}")
-        log_message(f"Negative Prompt: {self.negative_prompt}")
-        log_message(f"Batch size: {self.batch_size}")
+    def warmup(self):
+        self.pipe_lease.get()
+
+    def close(self):
+        self.pipe_lease.release()
 
     def execute(self, metadata: Dict[str, Any] = None) -> List[str]:
         try:
+            pipe = self.pipe_lease.get()
             generated_image_paths = []
             generator = torch.manual_seed(self.seed)
 
@@ -57,7 +72,7 @@ class StableDiffusionImageGenerationAction(Action):
 
             for i in range(self.batch_size):
                 # Generate the image
-                result = self.pipe(
+                result = pipe(
                     prompt=self.prompt,
                     negative_prompt=self.negative_prompt if self.negative_prompt else None,
                     height=self.height,
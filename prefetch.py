@@ -0,0 +1,130 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Tuple, Union
+import numpy as np
+from PIL import Image
+from image_handle import ImageHandle
+
+DEFAULT_WINDOW = 4
+DEFAULT_THREADS = 4
+DEFAULT_MAX_MEMORY_MB = 512
+DEFAULT_VIEWS = ('rgb_image',)
+
+_DONE = object()
+
+def decoded_size(handle: ImageHandle) -> int:
+    # Bytes of pixels the handle currently holds
+    total = 0
+    with handle._lock:
+        values = list(handle._cache.values())
+    seen = set()
+    for value in values:
+        if id(value) in seen:
+            continue
+        seen.add(id(value))
+        if isinstance(value, Image.Image):
+            total += value.width * value.height * len(value.getbands())
+        elif isinstance(value, np.ndarray) and value.base is None:
+            total += value.nbytes
+    return total
+
+# Reads and decodes the next few batches on a thread pool while the current one is in the rule
+# loop. At most `window` batches are queued, and no new batch is started while the prefetched
+# pixels waiting to be used exceed max_memory_mb.
+class Prefetcher:
+    def __init__(self, batches: Iterator[List[str]], make_metadata: Callable[[str], Dict[str, Any]],
+                 window: int = DEFAULT_WINDOW, threads: int = DEFAULT_THREADS,
+                 max_memory_mb: float = DEFAULT_MAX_MEMORY_MB, views: Tuple[str, ...] = DEFAULT_VIEWS,
+                 downscale_sizes: Tuple[int, ...] = ()):
+        self.batches = batches
+        self.make_metadata = make_metadata
+        self.window = max(1, window)
+        self.max_memory = int(max_memory_mb * 1024 * 1024)
+        self.views = tuple(views)
+        self.downscale_sizes = tuple(downscale_sizes)
+        self.queued_bytes = 0
+        self._pool = ThreadPoolExecutor(max_workers=max(1, threads), thread_name_prefix="Prefetch")
+        self._ready = queue.Queue(maxsize=self.window)
+        self._memory = threading.Condition()
+        self._stop = threading.Event()
+        self._producer = threading.Thread(target=self._produce, name="PrefetchProducer", daemon=True)
+
+    def __iter__(self) -> Iterator[Tuple[List[str], List[Union[Dict[str, Any], Exception]]]]:
+        self._producer.start()
+        try:
+            while True:
+                item = self._ready.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                batch, metadatas, futures = item
+                batch_bytes = sum(future.result() for future in futures)
+                with self._memory:
+                    self.queued_bytes -= batch_bytes
+                    self._memory.notify_all()
+                yield batch, metadatas
+        finally:
+            self.close()
+
+    def close(self):
+        self._stop.set()
+        with self._memory:
+            self._memory.notify_all()
+        # Unblock a producer waiting on a full queue
+        while True:
+            try:
+                self._ready.get_nowait()
+            except queue.Empty:
+                break
+        self._pool.shutdown(wait=False)
+
+    def _produce(self):
+        try:
+            for batch in self.batches:
+                with self._memory:
+                    while self.queued_bytes >= self.max_memory and not self._stop.is_set():
+                        self._memory.wait()
+                if self._stop.is_set():
+                    return
+                metadatas = []
+                futures = []
+                for filepath in batch:
+                    try:
+                        metadata = self.make_metadata(filepath)
+                    except Exception as e:
+                        metadatas.append(e)
+                        continue
+                    metadatas.append(metadata)
+                    futures.append(self._pool.submit(self._warm, metadata['image']))
+                if not self._put((batch, metadatas, futures)):
+                    return
+            self._put(_DONE)
+        except Exception as e:
+            self._put(e)
+
+    def _put(self, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._ready.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _warm(self, handle: ImageHandle) -> int:
+        if self._stop.is_set():
+            return 0
+        try:
+            for view in self.views:
+                getattr(handle, view)
+            for size in self.downscale_sizes:
+                handle.downscaled(size)
+        except Exception:
+            # Leave the error for the plugin that needs the pixels to report
+            return 0
+        size = decoded_size(handle)
+        with self._memory:
+            self.queued_bytes += size
+        return size
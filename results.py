@@ -0,0 +1,145 @@
+import os
+import csv
+import json
+import time
+import itertools
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from lazy_import import lazy_import
+
+# Only needed for the parquet format
+pa = lazy_import('pyarrow')
+pq = lazy_import('pyarrow.parquet')
+
+DEFAULT_RESULTS_DIR = './results'
+DEFAULT_FORMAT = 'parquet'
+DEFAULT_BATCH_ROWS = 1000
+
+# Numbers the part files of this process, so writers opened within the same second don't collide
+_part_numbers = itertools.count()
+
+# A rule outcome that also carries values worth keeping, e.g. the answer a VLM gave. It is
+# truthy exactly when the rule passed, so conditions treat it like a plain bool.
+class RuleResult:
+    __slots__ = ('passed', 'values')
+
+    def __init__(self, passed: bool, **values):
+        self.passed = bool(passed)
+        self.values = values
+
+    def __bool__(self) -> bool:
+        return self.passed
+
+    def __repr__(self) -> str:
+        return f"RuleResult({self.passed}, {self.values})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'__rule_result__': True, 'passed': self.passed, 'values': self.values}
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> Any:
+        # json object_hook: turns encoded RuleResults back, leaves other dicts alone
+        if data.get('__rule_result__'):
+            return RuleResult(data['passed'], **data['values'])
+        return data
+
+def encode_value(value: Any) -> Any:
+    # json default for rule results
+    if isinstance(value, RuleResult):
+        return value.to_dict()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def rule_value(value: Any) -> Optional[str]:
+    # What a rule returned beyond pass/fail, as JSON; None for plain bools
+    if isinstance(value, RuleResult):
+        return json.dumps(value.values, default=str) if value.values else None
+    if value is None or isinstance(value, bool):
+        return None
+    return json.dumps(value, default=str)
+
+# Streams one row per processed file to a Parquet or CSV part file. The schema is fixed when the
+# writer opens: path, metadata fields, outcome and actions, then a pass column and a value column
+# for every rule of every process. Rows are buffered and written batch_rows at a time (one Parquet
+# row group each). Worker processes write their own part files, and the directory is read back as
+# one dataset.
+class ResultsWriter:
+    BASE_COLUMNS = [('path', 'string'), ('final_path', 'string'), ('filename', 'string'), ('size', 'int64'),
+                    ('mtime', 'float64'), ('format', 'string'), ('width', 'int64'), ('height', 'int64'),
+                    ('mode', 'string'), ('frames', 'int64'), ('orientation', 'int64'), ('taken_at', 'string'),
+                    ('error', 'string'), ('actions', 'string'), ('processed_at', 'float64')]
+    METADATA_COLUMNS = ('filename', 'size', 'mtime', 'format', 'width', 'height', 'mode', 'frames', 'orientation', 'taken_at')
+
+    def __init__(self, directory: str, rule_columns: List[Tuple[str, str]], fmt: str = DEFAULT_FORMAT,
+                 batch_rows: int = DEFAULT_BATCH_ROWS):
+        if fmt not in ('parquet', 'csv'):
+            raise ValueError(f"Unknown results format '{fmt}', expected 'parquet' or 'csv'")
+        self.format = fmt
+        self.batch_rows = max(1, batch_rows)
+        # (process, rule) pairs, one pass column and one value column each
+        self.rule_columns = rule_columns
+        self.columns = [name for name, _ in self.BASE_COLUMNS]
+        for process_name, rule_name in rule_columns:
+            self.columns += [f"{process_name}.{rule_name}", f"{process_name}.{rule_name}.value"]
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"part-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_part_numbers)}.{fmt}")
+        self.rows_written = 0
+        self._rows: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._file = None
+        self._writer = None
+
+    def write(self, filepath: str, final_path: Optional[str], metadata: Optional[Dict[str, Any]],
+              error: Optional[Exception], rule_results: Dict[str, Dict[str, Any]], actions: List[str]):
+        row = {
+            'path': filepath,
+            'final_path': final_path,
+            **{column: (metadata or {}).get(column) for column in self.METADATA_COLUMNS},
+            'filename': (metadata or {}).get('filename', os.path.basename(filepath)),
+            'error': str(error) if error is not None else None,
+            'actions': ','.join(actions),
+            'processed_at': time.time(),
+        }
+        for process_name, rule_name in self.rule_columns:
+            # Rules that lazy evaluation skipped stay empty
+            if rule_name in rule_results.get(process_name, {}):
+                value = rule_results[process_name][rule_name]
+                row[f"{process_name}.{rule_name}"] = bool(value)
+                row[f"{process_name}.{rule_name}.value"] = rule_value(value)
+        with self._lock:
+            self._rows.append(row)
+            if len(self._rows) >= self.batch_rows:
+                self._flush()
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            if self.format == 'parquet' and self._writer is not None:
+                self._writer.close()
+            if self._file is not None:
+                self._file.close()
+
+    def _flush(self):
+        if not self._rows:
+            return
+        rows, self._rows = self._rows, []
+        if self.format == 'csv':
+            if self._file is None:
+                self._file = open(self.path, 'w', newline='', encoding='utf-8')
+                self._writer = csv.DictWriter(self._file, fieldnames=self.columns)
+                self._writer.writeheader()
+            self._writer.writerows(rows)
+            self._file.flush()
+        else:
+            table = pa.Table.from_pylist(rows, schema=self._schema())
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema, compression='zstd')
+            self._writer.write_table(table)
+        self.rows_written += len(rows)
+
+    def _schema(self):
+        types = {'string': pa.string(), 'int64': pa.int64(), 'float64': pa.float64()}
+        fields = [pa.field(name, types[kind]) for name, kind in self.BASE_COLUMNS]
+        for process_name, rule_name in self.rule_columns:
+            fields += [pa.field(f"{process_name}.{rule_name}", pa.bool_()),
+                       pa.field(f"{process_name}.{rule_name}.value", pa.string())]
+        return pa.schema(fields)
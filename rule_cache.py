@@ -0,0 +1,125 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, Tuple
+from results import RuleResult, encode_value
+
+DEFAULT_CACHE_PATH = './rule_cache.sqlite'
+DEFAULT_MAX_SIZE_MB = 512
+
+# How many writes between checks of the size budget
+EVICT_EVERY = 200
+# Hits whose last_used stamps are held in memory before they are written in one transaction
+TOUCH_BATCH = 1000
+
+def params_hash(params: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+# Persistent rule results keyed by (file content hash, plugin, params hash), so re-running a
+# process over an unchanged dataset skips the expensive model calls. Least recently used
+# entries are evicted once the store grows past max_size_mb.
+class RuleCache:
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_size_mb: float = DEFAULT_MAX_SIZE_MB):
+        self.path = path
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # Worker processes each open their own connection; WAL lets them read while one writes
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._writes = 0
+        # Hits are only stamped in memory: a cached run would otherwise commit once per rule per file
+        self._touched: Dict[str, float] = {}
+
+    @staticmethod
+    def make_key(content_hash: str, plugin: str, params_digest: str) -> str:
+        return f"{content_hash}:{plugin}:{params_digest}"
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            self._touched[key] = time.time()
+            if len(self._touched) >= TOUCH_BATCH:
+                self._write_touched()
+                self._conn.commit()
+            return True, json.loads(row[0], object_hook=RuleResult.from_dict)
+
+    def put(self, key: str, value: Any):
+        try:
+            encoded = json.dumps(value, default=encode_value)
+        except (TypeError, ValueError):
+            return  # Only JSON-serializable results are cached
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, encoded, len(key) + len(encoded), time.time()),
+            )
+            self._wrote()
+
+    def clear(self):
+        with self._lock:
+            self._touched.clear()
+            self._conn.execute("DELETE FROM results")
+            self._conn.commit()
+            self._conn.execute("VACUUM")
+
+    def flush(self):
+        with self._lock:
+            self._evict()
+            self._conn.commit()
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+    def size(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def _wrote(self):
+        # Commit right away: worker processes share the database, and an open write transaction
+        # would block every other writer. WAL with synchronous=NORMAL keeps commits cheap.
+        self._writes += 1
+        if self._writes % EVICT_EVERY == 0:
+            self._evict()
+        self._conn.commit()
+
+    def _write_touched(self):
+        if self._touched:
+            self._conn.executemany("UPDATE results SET last_used = ? WHERE key = ?",
+                                   [(stamp, key) for key, stamp in self._touched.items()])
+            self._touched.clear()
+
+    def _evict(self):
+        # Evict by up-to-date stamps, so entries that were just hit are kept
+        self._write_touched()
+        excess = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0] - self.max_size
+        if excess <= 0:
+            return
+        # Evict down to 90% of the budget so we don't evict again on the very next commit
+        excess += self.max_size // 10
+        freed = 0
+        doomed = []
+        for key, size in self._conn.execute("SELECT key, size FROM results ORDER BY last_used"):
+            doomed.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM results WHERE key = ?", doomed)
@@ -0,0 +1,74 @@
+import threading
+from typing import Dict, Any, List
+
+# Assumed mean latency in seconds per declared cost, used until a rule has been measured
+PRIOR_LATENCY = {0: 1e-5, 1: 1e-4, 2: 1e-2, 3: 1.0}
+
+class RuleStats:
+    def __init__(self, plugin: str, calls: int = 0, total_time: float = 0.0, passes: int = 0):
+        self.plugin = plugin
+        self.calls = calls
+        self.total_time = total_time
+        self.passes = passes
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'plugin': self.plugin, 'calls': self.calls, 'total_time': self.total_time, 'passes': self.passes}
+
+# Orders short-circuit rule evaluation by measured latency and pass rate. Estimates start from
+# the declared cost tier and a 50% pass rate, and converge on the measured values as files go by.
+class RuleScheduler:
+    def __init__(self, rule_costs: Dict[str, int], rule_plugins: Dict[str, str]):
+        self.rule_costs = rule_costs
+        self.stats = {rule_name: RuleStats(rule_plugins[rule_name]) for rule_name in rule_costs}
+        # Counts not yet reported to the parent process when running in a worker
+        self.pending = {rule_name: RuleStats(rule_plugins[rule_name]) for rule_name in rule_costs}
+        self._lock = threading.Lock()
+
+    def record(self, rule_name: str, elapsed: float, passed: bool):
+        with self._lock:
+            for stats in (self.stats[rule_name], self.pending[rule_name]):
+                stats.calls += 1
+                stats.total_time += elapsed
+                stats.passes += 1 if passed else 0
+
+    def mean_latency(self, rule_name: str) -> float:
+        stats = self.stats[rule_name]
+        prior = PRIOR_LATENCY.get(self.rule_costs[rule_name], PRIOR_LATENCY[2])
+        return (stats.total_time + prior) / (stats.calls + 1)
+
+    def pass_rate(self, rule_name: str) -> float:
+        stats = self.stats[rule_name]
+        return (stats.passes + 1) / (stats.calls + 2)
+
+    def conjunction_order(self, rule_names: List[str]) -> List[str]:
+        # Evaluating by ascending cost / P(fail) minimizes the expected cost of an AND chain
+        return sorted(rule_names, key=lambda rule_name: self.mean_latency(rule_name) / (1 - self.pass_rate(rule_name)))
+
+    def disjunction_order(self, rule_names: List[str]) -> List[str]:
+        # ...and ascending cost / P(pass) minimizes it for an OR chain
+        return sorted(rule_names, key=lambda rule_name: self.mean_latency(rule_name) / self.pass_rate(rule_name))
+
+    def load(self, saved: Dict[str, Dict[str, Any]]):
+        for rule_name, values in saved.items():
+            # Statistics of a rule that now points at a different plugin are meaningless
+            if rule_name in self.stats and values.get('plugin') == self.stats[rule_name].plugin:
+                self.stats[rule_name] = RuleStats(values['plugin'], values['calls'], values['total_time'], values['passes'])
+
+    def merge(self, delta: Dict[str, Dict[str, Any]]):
+        with self._lock:
+            for rule_name, values in delta.items():
+                stats = self.stats[rule_name]
+                stats.calls += values['calls']
+                stats.total_time += values['total_time']
+                stats.passes += values['passes']
+
+    def take_pending(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            delta = {rule_name: stats.to_dict() for rule_name, stats in self.pending.items() if stats.calls}
+            for stats in self.pending.values():
+                stats.calls, stats.total_time, stats.passes = 0, 0.0, 0
+        return delta
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {rule_name: stats.to_dict() for rule_name, stats in self.stats.items()}
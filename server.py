@@ -0,0 +1,316 @@
+import io
+import os
+import hmac
+import json
+import time
+import queue
+import base64
+import shutil
+import tempfile
+import threading
+import socketserver
+from PIL import Image
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from discovery import FORMAT_EXTENSIONS, IMAGE_EXTENSIONS
+from event_log import log_message, DEBUG, WARNING
+from results import RuleResult
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_MAX_BATCH = 16
+DEFAULT_MAX_WAIT_MS = 10
+DEFAULT_MAX_BODY_MB = 64
+LOOPBACK_HOSTS = ('127.0.0.1', 'localhost', '::1')
+# Raw upload content types and the format their extension comes from; anything else is refused
+MIME_FORMATS = {
+    'image/jpeg': 'jpeg', 'image/jpg': 'jpeg', 'image/png': 'png', 'image/gif': 'gif',
+    'image/bmp': 'bmp', 'image/x-ms-bmp': 'bmp', 'image/webp': 'webp', 'image/tiff': 'tiff',
+}
+
+def _media_type(content_type: str) -> str:
+    return content_type.split(';', 1)[0].strip().lower()
+
+def _hostname(host: str) -> str:
+    # Host header without its port, IPv6 brackets included
+    if host.startswith('['):
+        return host[1:].split(']', 1)[0]
+    return host.rsplit(':', 1)[0] if host.count(':') == 1 else host
+
+def _guess_extension(data: bytes) -> str:
+    # Plugins go by the file extension, so unnamed uploads get the one their content implies
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            return '.' + (image.format or 'img').lower()
+    except Exception:
+        return '.img'
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, RuleResult):
+        return {'passed': value.passed, **value.values}
+    return str(value)
+
+# Requests for one process are queued and handed to its rules as one micro-batch. The first
+# request of a batch waits at most max_wait for company, so concurrent callers share a model
+# call while a lone caller pays only the window. One thread per process runs the plugins, so
+# they never see concurrent calls.
+class Coalescer:
+    def __init__(self, processor, process_name: str, max_batch: int = DEFAULT_MAX_BATCH,
+                 max_wait: float = DEFAULT_MAX_WAIT_MS / 1000):
+        self.processor = processor
+        self.process = processor.processes[process_name]
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self.requests = 0
+        self.batches = 0
+        self._queue: 'queue.Queue[Tuple[str, bool, Future]]' = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"Coalescer-{process_name}", daemon=True)
+        self._thread.start()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, filepath: str, run_actions: bool = True) -> Future:
+        future = Future()
+        self._queue.put((filepath, run_actions, future))
+        return future
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                batch = [self._queue.get(timeout=0.2)]
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self.requests += len(batch)
+            self.batches += 1
+            try:
+                self._execute(batch)
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _execute(self, batch: List[Tuple[str, bool, Future]]):
+        items = []
+        for filepath, run_actions, future in batch:
+            try:
+                items.append((filepath, run_actions, future, self.processor._get_metadata(filepath)))
+            except Exception as e:
+                future.set_exception(e)
+        if not items:
+            return
+        log_message("Serving a batch of %d files for process '%s'", len(items), self.process.name, level=DEBUG)
+        metadatas = [metadata for _, _, _, metadata in items]
+        try:
+            rule_results = self.process.apply_batch([filepath for filepath, _, _, _ in items], metadatas)
+            selected = [i for i, (_, run_actions, _, _) in enumerate(items) if run_actions and any(rule_results[i].values())]
+            outcomes = dict(zip(selected, self.process.execute_batch([items[i][0] for i in selected],
+                                                                     [metadatas[i] for i in selected],
+                                                                     [rule_results[i] for i in selected])))
+        finally:
+            for metadata in metadatas:
+                metadata['image'].close()
+        failed = 0
+        for i, (filepath, _, future, _) in enumerate(items):
+            final_path, error = outcomes.get(i, (filepath, None))
+            failed += error is not None
+            future.set_result({'path': filepath, 'rules': rule_results[i], 'actions_run': i in outcomes,
+                               'final_path': final_path if error is None else None,
+                               'error': str(error) if error is not None else None})
+        self.processor.metrics.count_files(len(items) - failed, failed)
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    server_version = 'SIDM'
+
+    def do_GET(self):
+        refusal = self.server.job_server.refuse(self.headers, check_token=False)
+        if refusal is not None:
+            return self._send(*refusal)
+        if self.path.rstrip('/') not in ('', '/health'):
+            return self._send(404, {'error': f"Unknown path {self.path}"})
+        self._send(200, self.server.job_server.status())
+
+    def do_POST(self):
+        # POST /process/<name>[?actions=false]
+        path, _, query = self.path.partition('?')
+        parts = [part for part in path.split('/') if part]
+        if len(parts) != 2 or parts[0] != 'process':
+            return self._send(404, {'error': f"Unknown path {self.path}"})
+        job_server = self.server.job_server
+        refusal = job_server.refuse(self.headers)
+        if refusal is not None:
+            return self._send(*refusal)
+        media_type = _media_type(self.headers.get('Content-Type', ''))
+        # Anything a web page could send cross-origin without a preflight is refused
+        if media_type != 'application/json' and not media_type.startswith('image/'):
+            return self._send(415, {'error': "Expected an application/json or image/* body"})
+        if parts[1] not in job_server.coalescers:
+            return self._send(404, {'error': f"Process '{parts[1]}' is not served"})
+        run_actions = 'actions=false' not in query.split('&')
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            if length > job_server.max_body:
+                return self._send(413, {'error': f"Request body larger than {job_server.max_body} bytes"})
+            body = self.rfile.read(length)
+            paths, uploads = job_server.request_files(self.headers.get('Content-Type', ''), body)
+        except (ValueError, KeyError, TypeError) as e:
+            return self._send(400, {'error': f"Bad request: {str(e)}"})
+        results = []
+        try:
+            futures = [job_server.coalescers[parts[1]].submit(filepath, run_actions) for filepath in paths]
+            for filepath, future in zip(paths, futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    results.append({'path': filepath, 'rules': {}, 'actions_run': False, 'final_path': None, 'error': str(e)})
+        finally:
+            job_server.discard_uploads(uploads)
+        self._send(200, {'process': parts[1], 'results': results})
+
+    def _send(self, status: int, payload: Dict[str, Any]):
+        body = json.dumps(payload, default=_json_default).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args):
+        log_message("Server: " + format, *args, level=DEBUG)
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        # BaseHTTPRequestHandler expects a (host, port) client address
+        request, _ = super().get_request()
+        return request, ('unix', 0)
+
+# Hosts already-loaded processes behind localhost HTTP or a Unix socket. Clients send file paths
+# as JSON ({"paths": [...]}) or images inline ({"images": [base64, ...]} or a raw image/* body),
+# and get each file's rule results and action output back. Requests from a browser Origin not in
+# allowed_origins are refused, and with a token every POST needs "Authorization: Bearer <token>".
+class JobServer:
+    def __init__(self, processor, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 socket_path: Optional[str] = None, max_batch: int = DEFAULT_MAX_BATCH,
+                 max_wait_ms: float = DEFAULT_MAX_WAIT_MS, max_body_mb: float = DEFAULT_MAX_BODY_MB,
+                 token: Optional[str] = None, allowed_origins: Optional[List[str]] = None):
+        self.processor = processor
+        self.socket_path = socket_path
+        self.token = token or None
+        self.allowed_origins = set(allowed_origins or [])
+        # The Host check defeats DNS rebinding; a server bound elsewhere is reached by any name
+        self.allowed_hosts = set(LOOPBACK_HOSTS) if not socket_path and host in LOOPBACK_HOSTS else None
+        if not socket_path and host not in LOOPBACK_HOSTS and self.token is None:
+            log_message(f"Server listens on {host} without a token: anyone who can reach it can run its actions", level=WARNING)
+        self.max_body = int(max_body_mb * 1024 * 1024)
+        self.upload_dir = tempfile.mkdtemp(prefix='sidm-uploads-')
+        self.coalescers = {process_name: Coalescer(processor, process_name, max_batch, max_wait_ms / 1000)
+                           for process_name in processor.processes}
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+            self.httpd = _UnixHTTPServer(socket_path, _RequestHandler)
+            os.chmod(socket_path, 0o600)
+            self.address = socket_path
+        else:
+            self.httpd = ThreadingHTTPServer((host, port), _RequestHandler)
+            self.httpd.daemon_threads = True
+            self.address = f"http://{host}:{self.httpd.server_address[1]}"
+        self.httpd.job_server = self
+        self._upload_count = 0
+        self._lock = threading.Lock()
+
+    def serve_forever(self):
+        log_message(f"Serving processes {', '.join(self.coalescers)} on {self.address}")
+        self.httpd.serve_forever()
+
+    def shutdown(self):
+        # Called from another thread (or a signal handler) to make serve_forever return
+        threading.Thread(target=self.httpd.shutdown, daemon=True).start()
+
+    def close(self):
+        self.httpd.server_close()
+        for coalescer in self.coalescers.values():
+            coalescer.close()
+        if self.socket_path and os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        shutil.rmtree(self.upload_dir, ignore_errors=True)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'processes': {process_name: {'requests': coalescer.requests, 'batches': coalescer.batches,
+                                         'queue_depth': coalescer.queue_depth}
+                          for process_name, coalescer in self.coalescers.items()},
+            'files_done': self.processor.metrics.files_done,
+            'files_failed': self.processor.metrics.files_failed,
+        }
+
+    def refuse(self, headers, check_token: bool = True) -> Optional[Tuple[int, Dict[str, Any]]]:
+        # (status, payload) to answer instead of handling the request, or None to handle it
+        origin = headers.get('Origin')
+        if origin is not None and origin not in self.allowed_origins:
+            return 403, {'error': f"Origin {origin} is not allowed"}
+        if self.allowed_hosts is not None and _hostname(headers.get('Host', '')) not in self.allowed_hosts:
+            return 403, {'error': "Unexpected Host header"}
+        if check_token and self.token is not None:
+            scheme, _, credentials = headers.get('Authorization', '').partition(' ')
+            if scheme.lower() != 'bearer' or not hmac.compare_digest(credentials.strip().encode(), self.token.encode()):
+                return 401, {'error': "Missing or wrong token"}
+        return None
+
+    def request_files(self, content_type: str, body: bytes) -> Tuple[List[str], List[str]]:
+        # (paths to process, uploaded temp files among them)
+        media_type = _media_type(content_type)
+        if media_type.startswith('image/'):
+            if media_type not in MIME_FORMATS:
+                raise ValueError(f"unsupported image type '{media_type}'")
+            upload = self._store_upload(body, FORMAT_EXTENSIONS[MIME_FORMATS[media_type]][0])
+            return [upload], [upload]
+        if media_type != 'application/json':
+            raise ValueError("expected an application/json or image/* body")
+        request = json.loads(body or b'{}')
+        paths = [os.path.abspath(str(path)) for path in request.get('paths', [])]
+        uploads = []
+        for image in request.get('images', []):
+            if isinstance(image, dict):
+                data, name = image['data'], image.get('filename', '')
+            else:
+                data, name = image, ''
+            data = base64.b64decode(data)
+            extension = os.path.splitext(os.path.basename(str(name)))[1].lower()
+            uploads.append(self._store_upload(data, extension if extension in IMAGE_EXTENSIONS else _guess_extension(data)))
+        if not paths and not uploads:
+            raise ValueError("expected 'paths' or 'images'")
+        return paths + uploads, uploads
+
+    def discard_uploads(self, uploads: List[str]):
+        # Whatever actions wrote elsewhere stays; the uploaded copy itself is only kept per request
+        for upload in uploads:
+            if os.path.exists(upload):
+                os.remove(upload)
+
+    def _store_upload(self, data: bytes, extension: str) -> str:
+        with self._lock:
+            self._upload_count += 1
+            count = self._upload_count
+        path = os.path.join(self.upload_dir, f"upload-{count}{extension}")
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
@@ -0,0 +1,116 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_MANIFEST_DIR = './manifests'
+
+def parse_shard(spec: Any) -> Optional[Tuple[int, int]]:
+    # "i/N" or {index: i, count: N}; shards are numbered from 0
+    if not spec:
+        return None
+    if isinstance(spec, dict):
+        index, count = int(spec['index']), int(spec['count'])
+    else:
+        index, count = (int(part) for part in str(spec).split('/'))
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard {spec!r}: expected i/N with 0 <= i < N")
+    return index, count
+
+def relative_key(filepath: str, source_dir: str) -> str:
+    # Forward slashes, so nodes with different mount points or OSes agree on the key
+    return os.path.relpath(filepath, source_dir).replace(os.sep, '/')
+
+def shard_of(key: str, count: int) -> int:
+    # A stable hash rather than hash(): str hashes are salted per interpreter
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big') % count
+
+def manifest_path(manifest_dir: str, process_names: List[str], shard: Tuple[int, int]) -> str:
+    return os.path.join(manifest_dir, f"{'+'.join(sorted(process_names))}.shard-{shard[0]}-of-{shard[1]}.jsonl")
+
+# One JSONL manifest per shard: a header, one line per processed file and a footer with the
+# totals and the state of stateful actions, so the shards of a run can be merged into one result
+class ManifestWriter:
+    def __init__(self, path: str, source_dir: str, shard: Tuple[int, int], process_names: List[str], fingerprint: str):
+        self.path = path
+        self.source_dir = source_dir
+        self.files_done = 0
+        self.files_failed = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # A rerun of the shard replaces its manifest
+        self._file = open(path, 'w', encoding='utf-8')
+        self._write({'type': 'header', 'shard': shard[0], 'count': shard[1], 'processes': sorted(process_names),
+                     'source_dir': os.path.abspath(source_dir), 'fingerprint': fingerprint, 'started': time.time()})
+
+    def record(self, filepath: str, outcome: str, final_path: Optional[str] = None, error: Optional[str] = None):
+        with self._lock:
+            if error is None:
+                self.files_done += 1
+            else:
+                self.files_failed += 1
+            self._write({'type': 'file', 'path': relative_key(filepath, self.source_dir), 'outcome': outcome,
+                         'final_path': final_path, 'error': error})
+
+    def close(self, complete: bool, states: Dict[str, Dict[str, Any]]):
+        with self._lock:
+            self._write({'type': 'footer', 'complete': complete, 'finished': time.time(),
+                         'files_done': self.files_done, 'files_failed': self.files_failed, 'states': states})
+            self._file.close()
+
+    def _write(self, entry: Dict[str, Any]):
+        self._file.write(json.dumps(entry, default=str) + '\n')
+
+def read_manifest(path: str) -> Dict[str, Any]:
+    manifest = {'path': path, 'header': None, 'files': [], 'footer': None}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if entry['type'] == 'file':
+                manifest['files'].append(entry)
+            else:
+                manifest[entry['type']] = entry
+    if manifest['header'] is None:
+        raise ValueError(f"{path} is not a shard manifest")
+    return manifest
+
+def merge_manifests(paths: List[str]) -> Dict[str, Any]:
+    manifests = sorted((read_manifest(path) for path in paths), key=lambda manifest: manifest['header']['shard'])
+    first = manifests[0]['header']
+    for manifest in manifests[1:]:
+        header = manifest['header']
+        for field in ('count', 'processes', 'fingerprint'):
+            if header[field] != first[field]:
+                raise ValueError(f"{manifest['path']} has {field} {header[field]!r}, expected {first[field]!r}")
+    shards = [manifest['header']['shard'] for manifest in manifests]
+    duplicated = sorted({shard for shard in shards if shards.count(shard) > 1})
+    if duplicated:
+        raise ValueError(f"Shards {duplicated} appear in more than one manifest")
+    missing = sorted(set(range(first['count'])) - set(shards))
+    incomplete = [manifest['header']['shard'] for manifest in manifests
+                  if manifest['footer'] is None or not manifest['footer']['complete']]
+
+    # Stateful action results, grouped by process and action across shards
+    states: Dict[str, Dict[str, List[Any]]] = {}
+    for manifest in manifests:
+        for process_name, actions in ((manifest['footer'] or {}).get('states') or {}).items():
+            for action_name, state in actions.items():
+                states.setdefault(process_name, {}).setdefault(action_name, []).append(state)
+
+    files = sorted((entry for manifest in manifests for entry in manifest['files']), key=lambda entry: entry['path'])
+    return {
+        'processes': first['processes'],
+        'count': first['count'],
+        'shards': shards,
+        'missing_shards': missing,
+        'incomplete_shards': incomplete,
+        'complete': not missing and not incomplete,
+        'files_done': sum(1 for entry in files if entry['error'] is None),
+        'files_failed': sum(1 for entry in files if entry['error'] is not None),
+        'files': files,
+        'states': states,
+    }
@@ -0,0 +1,44 @@
+import io
+from PIL import Image
+from discovery import sniff_format
+
+def _encoded(fmt, size=(32, 32)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, format=fmt)
+    return buffer.getvalue()
+
+def _file(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+def test_complete_images(tmp_path):
+    for fmt, name in [('JPEG', 'jpeg'), ('PNG', 'png'), ('GIF', 'gif'), ('BMP', 'bmp'), ('WEBP', 'webp'), ('TIFF', 'tiff')]:
+        assert sniff_format(_file(tmp_path, f'image.{name}', _encoded(fmt)), check_trailer=True) == (name, None)
+
+def test_empty_and_missing(tmp_path):
+    assert sniff_format(_file(tmp_path, 'empty.jpg', b'')) == (None, 'empty')
+    assert sniff_format(str(tmp_path / 'missing.jpg')) == (None, 'unreadable')
+
+def test_mislabeled(tmp_path):
+    assert sniff_format(_file(tmp_path, 'photo.jpg', _encoded('WEBP'))) == ('webp', None)
+    assert sniff_format(_file(tmp_path, 'notes.png', b'just some text\n')) == (None, 'unknown_format')
+    # "BM" starts plenty of text files; only a known BMP header size makes it a bitmap
+    assert sniff_format(_file(tmp_path, 'bm.bmp', b'BMW owners club\n' + b' ' * 64)) == (None, 'unknown_format')
+    assert sniff_format(_file(tmp_path, 'riff.webp', b'RIFX\x10\x00\x00\x00WEBPVP8 ' + b'\0' * 32)) == (None, 'unknown_format')
+
+def test_truncated(tmp_path):
+    png = _encoded('PNG')
+    assert sniff_format(_file(tmp_path, 'sig.png', png[:4])) == (None, 'truncated')
+    assert sniff_format(_file(tmp_path, 'header.png', png[:20])) == (None, 'truncated')
+    assert sniff_format(_file(tmp_path, 'short.bmp', _encoded('BMP')[:-100])) == (None, 'truncated')
+    assert sniff_format(_file(tmp_path, 'short.webp', _encoded('WEBP')[:-4])) == (None, 'truncated')
+    # A missing end marker only counts with check_trailer
+    body = _file(tmp_path, 'cut.jpg', _encoded('JPEG', (256, 256))[:-200])
+    assert sniff_format(body) == ('jpeg', None)
+    assert sniff_format(body, check_trailer=True) == (None, 'truncated')
+
+def test_data_after_the_end_marker(tmp_path):
+    # Motion photos append a video after the JPEG's end marker
+    path = _file(tmp_path, 'motion.jpg', _encoded('JPEG') + b'\0' * 10000)
+    assert sniff_format(path) == ('jpeg', None)
@@ -0,0 +1,13 @@
+import logging
+import pytest
+from event_log import parse_level
+
+def test_parse_level():
+    assert parse_level('info') == logging.INFO
+    assert parse_level('WARNING') == logging.WARNING
+    assert parse_level(logging.DEBUG) == logging.DEBUG
+
+@pytest.mark.parametrize('level', ['verbose', 'Level 5', 15, True, None])
+def test_unknown_level_is_refused(level):
+    with pytest.raises(ValueError, match='log_level'):
+        parse_level(level)
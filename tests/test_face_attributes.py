@@ -0,0 +1,70 @@
+import os
+import numpy as np
+import pytest
+import face_attributes
+from image_handle import ImageHandle
+from image_processor import PluginLoader, Rule
+
+PLUGINS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'plugins')
+
+class _Handle(ImageHandle):
+    # Pixels without a file; the fake DeepFace reads the face it should report from them
+    def __init__(self, filepath, gender):
+        super().__init__(filepath)
+        self._cache['bgr'] = np.full((4, 4, 3), gender, dtype=np.uint8)
+
+class _DeepFace:
+    GENDERS = {0: None, 1: 'Woman', 2: 'Man', 3: 'broken'}
+
+    def __init__(self, batched=True):
+        self.batched = batched
+        self.calls = 0
+
+    def analyze(self, img_path, actions, detector_backend, enforce_detection):
+        self.calls += 1
+        if isinstance(img_path, list):
+            if not self.batched:
+                raise TypeError("img_path must be a path or an array")
+            return [self._faces(image) for image in img_path]
+        return self._faces(img_path)
+
+    def _faces(self, image):
+        gender = self.GENDERS[int(image[0, 0, 0])]
+        if gender == 'broken':
+            raise RuntimeError("model failed to load")
+        return [{'dominant_gender': gender}] if gender else []
+
+def _rule(monkeypatch, deepface, plugin_file):
+    monkeypatch.setattr(face_attributes, 'DeepFace', deepface)
+    rule = PluginLoader.load_plugin(os.path.join(PLUGINS, plugin_file), Rule)
+    rule.initialize({'gender': 'Woman'})
+    return rule
+
+@pytest.mark.parametrize('plugin_file', ['rules/gender_rule.py', 'deepfakePlugin/rules/gender_rule.py'])
+def test_loader_picks_the_rule_not_the_mixin(plugin_file):
+    assert type(PluginLoader.load_plugin(os.path.join(PLUGINS, plugin_file), Rule)).__name__ == 'GenderRule'
+
+def test_batch_is_one_call(monkeypatch):
+    deepface = _DeepFace()
+    rule = _rule(monkeypatch, deepface, 'rules/gender_rule.py')
+    paths = ['a.jpg', 'b.jpg', 'c.jpg']
+    metadatas = [{'image': _Handle(path, gender)} for path, gender in zip(paths, (1, 2, 0))]
+    assert [bool(result) for result in rule.apply_batch(paths, metadatas)] == [True, False, False]
+    assert deepface.calls == 1
+
+def test_fallback_fails_only_the_broken_file(monkeypatch):
+    deepface = _DeepFace(batched=False)
+    rule = _rule(monkeypatch, deepface, 'rules/gender_rule.py')
+    paths = ['a.jpg', 'b.jpg']
+    metadatas = [{'image': _Handle(path, gender)} for path, gender in zip(paths, (1, 3))]
+    results = rule.apply_batch(paths, metadatas)
+    assert bool(results[0]) is True
+    assert isinstance(results[1], RuntimeError)
+    with pytest.raises(RuntimeError):
+        rule.apply('b.jpg', metadatas[1])
+
+@pytest.mark.parametrize('plugin_file', ['rules/gender_rule.py', 'deepfakePlugin/rules/gender_rule.py'])
+def test_both_copies_report_the_detected_value(monkeypatch, plugin_file):
+    rule = _rule(monkeypatch, _DeepFace(), plugin_file)
+    result = rule.apply('b.jpg', {'image': _Handle('b.jpg', 2)})
+    assert not result and result.values == {'gender': 'man'}
@@ -0,0 +1,38 @@
+import random
+import pytest
+from hamming_index import HammingIndex
+
+def _brute_force(entries, query, radius):
+    # The linear scan the index replaces: earliest added hash within radius
+    for hash, value in entries:
+        distance = bin(hash ^ query).count('1')
+        if distance <= radius:
+            return distance, value
+    return None
+
+def _flip(rng, hash, bits, count):
+    for bit in rng.sample(range(bits), count):
+        hash ^= 1 << bit
+    return hash
+
+@pytest.mark.parametrize('bits,radius', [(64, 0), (64, 5), (64, 10), (256, 12), (16, 3)])
+def test_find_matches_brute_force(bits, radius):
+    rng = random.Random(bits * 100 + radius)
+    index = HammingIndex(bits, radius, capacity=500)
+    entries = []
+    for i in range(500):
+        if entries and rng.random() < 0.3:
+            # Near duplicates of earlier hashes, some just inside and some just outside the radius
+            hash = _flip(rng, rng.choice(entries)[0], bits, rng.randint(0, radius + 2))
+        else:
+            hash = rng.getrandbits(bits)
+        entries.append((hash, i))
+        index.add(hash, i)
+    assert len(index) == 500
+    for hash, _ in entries[::7]:
+        query = _flip(rng, hash, bits, rng.randint(0, radius + 2))
+        assert index.find(query) == _brute_force(entries, query, radius)
+    assert list(index.items()) == entries
+
+def test_empty_index():
+    assert HammingIndex(64, 5).find(0) is None
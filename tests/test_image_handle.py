@@ -0,0 +1,36 @@
+from PIL import Image, ImageFile
+from image_handle import EXIF_ORIENTATION, ImageHandle, probe_header
+
+def _png(path, exif=None):
+    image = Image.new('RGB', (640, 480), 'red')
+    if exif is not None:
+        image.save(path, exif=exif.tobytes())
+    else:
+        image.save(path)
+    return str(path)
+
+def test_probe_header_does_not_decode_png(tmp_path, monkeypatch):
+    path = _png(tmp_path / 'plain.png')
+    loaded = []
+    load = ImageFile.ImageFile.load
+    def spy(self):
+        loaded.append(self.format)
+        return load(self)
+    monkeypatch.setattr(ImageFile.ImageFile, 'load', spy)
+    header = probe_header(path)
+    assert loaded == []
+    assert (header['format'], header['width'], header['height']) == ('PNG', 640, 480)
+    assert header['frames'] is None
+
+def test_probe_header_reads_png_exif_before_pixels(tmp_path):
+    exif = Image.Exif()
+    exif[EXIF_ORIENTATION] = 6
+    assert probe_header(_png(tmp_path / 'rotated.png', exif))['orientation'] == 6
+
+def test_frames_only_counted_on_request(tmp_path):
+    path = str(tmp_path / 'anim.gif')
+    frames = [Image.new('RGB', (16, 16), color) for color in ('red', 'green', 'blue')]
+    frames[0].save(path, save_all=True, append_images=frames[1:])
+    assert probe_header(path)['frames'] is None
+    assert probe_header(path, frames=True)['frames'] == 3
+    assert ImageHandle(path).frames == 3
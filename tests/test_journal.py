@@ -0,0 +1,69 @@
+import os
+from journal import Journal, OUTCOME_DONE, OUTCOME_ERROR
+
+def _files(tmp_path, *names):
+    source = tmp_path / 'src'
+    source.mkdir(exist_ok=True)
+    paths = []
+    for name in names:
+        (source / name).write_bytes(name.encode())
+        paths.append(str(source / name))
+    return str(source), paths
+
+def test_unchanged_done_files_are_skipped(tmp_path):
+    source, (done, failed, changed) = _files(tmp_path, 'done.jpg', 'failed.jpg', 'changed.jpg')
+    journal = Journal(str(tmp_path / 'journal.sqlite'), 'fp')
+    journal.start_run(source)
+    journal.record(done, OUTCOME_DONE, done)
+    journal.record(failed, OUTCOME_ERROR)
+    journal.record(changed, OUTCOME_DONE, changed)
+    journal.finish_run()
+    journal.close()
+    with open(changed, 'ab') as f:
+        f.write(b'more')
+
+    journal = Journal(str(tmp_path / 'journal.sqlite'), 'fp')
+    journal.start_run(source)
+    assert [journal.should_skip(path) for path in (done, failed, changed)] == [True, False, False]
+    assert journal.skipped == 1
+    journal.close()
+
+    # Another process configuration processes everything again
+    journal = Journal(str(tmp_path / 'journal.sqlite'), 'other')
+    journal.start_run(source)
+    assert not journal.should_skip(done)
+    journal.close()
+
+def test_resume_continues_the_unfinished_run(tmp_path):
+    source, (done, failed, pending) = _files(tmp_path, 'done.jpg', 'failed.jpg', 'pending.jpg')
+    journal = Journal(str(tmp_path / 'journal.sqlite'), 'fp', batch_size=1)
+    run_id = journal.start_run(source)
+    journal.record(done, OUTCOME_DONE, done)
+    journal.record(failed, OUTCOME_ERROR)
+    # Interrupted: finish_run is never called
+    journal.close()
+
+    journal = Journal(str(tmp_path / 'journal.sqlite'), 'fp')
+    assert journal.start_run(source, resume=True) == run_id and journal.resumed
+    # A resumed run picks up where it stopped, without retrying what already failed in it
+    assert [journal.should_skip(path) for path in (done, failed, pending)] == [True, True, False]
+    journal.record(pending, OUTCOME_DONE, pending)
+    journal.finish_run()
+    journal.close()
+
+    # Once finished, there is nothing left to resume, and a fresh run retries the failure
+    journal = Journal(str(tmp_path / 'journal.sqlite'), 'fp')
+    assert journal.start_run(source, resume=True) != run_id and not journal.resumed
+    assert [journal.should_skip(path) for path in (done, failed, pending)] == [True, False, True]
+    journal.close()
+
+def test_buffered_outcomes_survive_close(tmp_path):
+    source, (path,) = _files(tmp_path, 'a.jpg')
+    journal = Journal(str(tmp_path / 'journal.sqlite'), 'fp', batch_size=100)
+    journal.start_run(source)
+    journal.record(path, OUTCOME_DONE, path)
+    journal.close()
+    journal = Journal(str(tmp_path / 'journal.sqlite'), 'fp')
+    journal.start_run(source)
+    assert journal.should_skip(os.path.relpath(path))
+    journal.close()
@@ -0,0 +1,11 @@
+from metrics import Metrics
+
+def test_prometheus_label_values_are_escaped(tmp_path):
+    metrics = Metrics()
+    metrics.observe(('proc "a"', 'rule', 'back\\slash', 'multi\nline'), 0.01, passes=1)
+    path = str(tmp_path / 'metrics.prom')
+    metrics.write_prometheus(path)
+    with open(path) as f:
+        lines = [line for line in f.read().splitlines() if line.startswith('sidm_plugin_calls_total')]
+    assert lines == ['sidm_plugin_calls_total{process="proc \\"a\\"",kind="rule",name="back\\\\slash",'
+                     'plugin="multi\\nline"} 1']
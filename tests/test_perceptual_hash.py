@@ -0,0 +1,44 @@
+import pytest
+from PIL import Image, ImageDraw, ImageFilter
+from perceptual_hash import PerceptualHasher
+
+imagehash = pytest.importorskip('imagehash')
+
+REFERENCE = {'phash': imagehash.phash, 'dhash': imagehash.dhash, 'ahash': imagehash.average_hash}
+
+def _images(directory):
+    paths = []
+    for i, (size, mode) in enumerate([((64, 64), 'RGB'), ((333, 200), 'RGB'), ((120, 480), 'L'), ((97, 97), 'RGBA')]):
+        image = Image.new(mode, size)
+        draw = ImageDraw.Draw(image)
+        for j in range(12):
+            box = [(j * 17 + i * 5) % size[0], (j * 29) % size[1], size[0] - j * 3, size[1] - j * 2]
+            draw.ellipse([min(box[0], box[2]), min(box[1], box[3]), max(box[0], box[2]), max(box[1], box[3])],
+                         fill=(j * 40 + i * 30) % 256 if mode == 'L' else ((j * 40) % 256, (i * 60) % 256, (j * i * 13) % 256))
+        image = image.filter(ImageFilter.GaussianBlur(1))
+        path = str(directory / f'image{i}.png')
+        image.save(path)
+        paths.append(path)
+    return paths
+
+@pytest.mark.parametrize('method', sorted(REFERENCE))
+@pytest.mark.parametrize('hash_size', [8, 16])
+def test_bits_match_imagehash(tmp_path, method, hash_size):
+    paths = _images(tmp_path)
+    hasher = PerceptualHasher(method, hash_size=hash_size)
+    try:
+        hashes = hasher.hash_images(paths)
+    finally:
+        hasher.close()
+    for path, value in zip(paths, hashes):
+        with Image.open(path) as image:
+            assert value == int(str(REFERENCE[method](image, hash_size=hash_size)), 16)
+
+def test_unreadable_file_fails_alone(tmp_path):
+    paths = _images(tmp_path)[:1] + [str(tmp_path / 'missing.png')]
+    hasher = PerceptualHasher('phash')
+    try:
+        hashes = hasher.hash_images(paths)
+    finally:
+        hasher.close()
+    assert isinstance(hashes[0], int) and isinstance(hashes[1], OSError)
@@ -0,0 +1,61 @@
+import os
+import shutil
+from PIL import Image
+from image_handle import ImageHandle, get_image_handle
+from image_processor import Action, Process
+
+class _Move(Action):
+    def initialize(self, config):
+        self.target = config['target']
+
+    def execute(self, filepaths, metadata):
+        return [shutil.move(filepath, os.path.join(self.target, os.path.basename(filepath))) for filepath in filepaths]
+
+class _Rewrite(Action):
+    def initialize(self, config):
+        pass
+
+    def execute(self, filepaths, metadata):
+        new_path = os.path.splitext(filepaths[0])[0] + '.png'
+        Image.new('RGB', (4, 4), 'blue').save(new_path)
+        return [new_path]
+
+class _Look(Action):
+    def initialize(self, config):
+        self.seen = []
+
+    def execute(self, filepaths, metadata):
+        self.seen.append(get_image_handle(metadata, filepaths[0]))
+        return filepaths
+
+def _process(*plugins):
+    return Process('p', [], [{'instance': plugin, 'config': {'name': f'a{i}', 'plugin': f'test/a{i}'}}
+                           for i, plugin in enumerate(plugins)])
+
+def test_moved_file_keeps_its_shared_handle(tmp_path):
+    source = tmp_path / 'in.jpg'
+    Image.new('RGB', (8, 8), 'red').save(source)
+    (tmp_path / 'out').mkdir()
+    move, look = _Move(), _Look()
+    move.initialize({'target': str(tmp_path / 'out')})
+    look.initialize({})
+    handle = ImageHandle(str(source))
+    pixels = handle.rgb
+    metadata = {'image': handle}
+    [(path, error)] = _process(move, look).execute_batch([str(source)], [metadata], [{}])
+    assert error is None and path == str(tmp_path / 'out' / 'in.jpg')
+    assert look.seen == [handle] and handle.filepath == path
+    assert handle.rgb is pixels
+
+def test_rewritten_file_gets_a_fresh_handle(tmp_path):
+    source = tmp_path / 'in.jpg'
+    Image.new('RGB', (8, 8), 'red').save(source)
+    rewrite, look = _Rewrite(), _Look()
+    look.initialize({})
+    handle = ImageHandle(str(source))
+    handle.rgb
+    metadata = {'image': handle}
+    [(path, error)] = _process(rewrite, look).execute_batch([str(source)], [metadata], [{}])
+    assert error is None and path.endswith('in.png')
+    assert look.seen == [metadata['image']] and metadata['image'] is not handle
+    assert metadata['image'].size == (4, 4)
@@ -0,0 +1,23 @@
+import csv
+import glob
+import os
+from results import ResultsWriter, RuleResult, rule_value
+
+def test_writers_in_the_same_second_keep_their_parts(tmp_path):
+    paths = []
+    for name in ('a.jpg', 'b.jpg'):
+        writer = ResultsWriter(str(tmp_path), [('p', 'r')], fmt='csv')
+        writer.write(name, name, {'filename': name}, None, {'p': {'r': True}}, [])
+        writer.close()
+        paths.append(writer.path)
+    assert len(set(paths)) == 2
+    rows = []
+    for part in sorted(glob.glob(os.path.join(str(tmp_path), 'part-*.csv'))):
+        with open(part, newline='') as f:
+            rows += [row['path'] for row in csv.DictReader(f)]
+    assert sorted(rows) == ['a.jpg', 'b.jpg']
+
+def test_rule_value():
+    assert rule_value(True) is None
+    assert rule_value(RuleResult(False)) is None
+    assert rule_value(RuleResult(True, gender='woman')) == '{"gender": "woman"}'
@@ -0,0 +1,32 @@
+import sqlite3
+from results import RuleResult
+from rule_cache import RuleCache
+
+def _last_used(path, key):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT last_used FROM results WHERE key = ?", (key,)).fetchone()[0]
+
+def test_round_trip(tmp_path):
+    cache = RuleCache(str(tmp_path / 'cache.sqlite'))
+    cache.put('a', RuleResult(True, emotion='happy'))
+    cache.put('b', False)
+    found, value = cache.get('a')
+    assert found and value.passed and value.values == {'emotion': 'happy'}
+    assert cache.get('b') == (True, False)
+    assert cache.get('c') == (False, None)
+    assert (cache.hits, cache.misses) == (2, 1)
+    cache.close()
+
+def test_hits_are_stamped_on_flush(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    cache = RuleCache(path)
+    cache.put('a', True)
+    stored = _last_used(path, 'a')
+    changes = cache._conn.total_changes
+    for _ in range(10):
+        cache.get('a')
+    assert cache._conn.total_changes == changes
+    assert _last_used(path, 'a') == stored
+    cache.flush()
+    assert _last_used(path, 'a') > stored
+    cache.close()
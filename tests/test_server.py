@@ -0,0 +1,61 @@
+import os
+import json
+import base64
+import http.client
+import threading
+import pytest
+from server import JobServer
+
+class _Processor:
+    processes = {}
+
+def _serve(**options):
+    server = JobServer(_Processor(), port=0, **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def _post(server, headers, body=b'{"paths": ["/tmp"]}'):
+    connection = http.client.HTTPConnection('127.0.0.1', server.httpd.server_address[1], timeout=5)
+    connection.request('POST', '/process/missing', body=body, headers=headers)
+    response = connection.getresponse()
+    response.read()
+    connection.close()
+    return response.status
+
+def test_cross_origin_and_simple_requests_are_refused():
+    server = _serve(allowed_origins=['http://dashboard.local'])
+    try:
+        json_type = {'Content-Type': 'application/json'}
+        assert _post(server, dict(json_type, Origin='http://evil.example')) == 403
+        assert _post(server, dict(json_type, Host='evil.example:8765')) == 403
+        assert _post(server, {'Content-Type': 'text/plain'}) == 415
+        # Past the checks, the unknown process is reported
+        assert _post(server, dict(json_type, Origin='http://dashboard.local')) == 404
+        assert _post(server, json_type) == 404
+    finally:
+        server.shutdown()
+        server.close()
+
+def test_token_is_required():
+    server = _serve(token='s3cret')
+    try:
+        json_type = {'Content-Type': 'application/json'}
+        assert _post(server, json_type) == 401
+        assert _post(server, dict(json_type, Authorization='Bearer wrong')) == 401
+        assert _post(server, dict(json_type, Authorization='Bearer s3cret')) == 404
+    finally:
+        server.shutdown()
+        server.close()
+
+def test_upload_extensions_are_whitelisted():
+    server = JobServer(_Processor(), port=0)
+    try:
+        with pytest.raises(ValueError):
+            server.request_files('image/x/../../foo', b'data')
+        paths, _ = server.request_files('image/png', b'data')
+        assert paths[0].endswith('.png') and os.path.dirname(paths[0]) == server.upload_dir
+        body = json.dumps({'images': [{'data': base64.b64encode(b'data').decode(), 'filename': 'a.j/../../b'}]})
+        paths, _ = server.request_files('application/json; charset=utf-8', body.encode())
+        assert os.path.dirname(paths[0]) == server.upload_dir and paths[0].endswith('.img')
+    finally:
+        server.close()
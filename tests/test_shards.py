@@ -0,0 +1,49 @@
+import pytest
+from shards import ManifestWriter, manifest_path, merge_manifests, parse_shard, relative_key, shard_of
+
+def _manifest(tmp_path, shard, files, complete=True, states=None, fingerprint='fp'):
+    path = manifest_path(str(tmp_path), ['dedup'], shard)
+    writer = ManifestWriter(path, str(tmp_path / 'src'), shard, ['dedup'], fingerprint)
+    for name, error in files:
+        writer.record(str(tmp_path / 'src' / name), 'error' if error else 'done', None, error)
+    writer.close(complete, states or {})
+    return path
+
+def test_parse_shard():
+    assert parse_shard('1/4') == (1, 4)
+    assert parse_shard({'index': 0, 'count': 2}) == (0, 2)
+    assert parse_shard(None) is None
+    with pytest.raises(ValueError):
+        parse_shard('4/4')
+
+def test_every_key_lands_in_exactly_one_shard():
+    keys = [f'dir{i % 7}/image{i}.jpg' for i in range(1000)]
+    counts = [0] * 4
+    for key in keys:
+        counts[shard_of(key, 4)] += 1
+    assert sum(counts) == 1000 and min(counts) > 200
+    assert relative_key('/data/a/b.jpg', '/data') == 'a/b.jpg'
+
+def test_merge_combines_files_and_states(tmp_path):
+    paths = [_manifest(tmp_path, (1, 2), [('b.jpg', None), ('c.jpg', 'boom')], states={'dedup': {'find': {'n': 1}}}),
+             _manifest(tmp_path, (0, 2), [('a.jpg', None)], states={'dedup': {'find': {'n': 2}}})]
+    merged = merge_manifests(paths)
+    assert merged['complete'] and merged['shards'] == [0, 1]
+    assert [entry['path'] for entry in merged['files']] == ['a.jpg', 'b.jpg', 'c.jpg']
+    assert (merged['files_done'], merged['files_failed']) == (2, 1)
+    # States are handed over in shard order
+    assert merged['states'] == {'dedup': {'find': [{'n': 2}, {'n': 1}]}}
+
+def test_merge_reports_missing_and_incomplete_shards(tmp_path):
+    merged = merge_manifests([_manifest(tmp_path, (0, 3), [('a.jpg', None)], complete=False)])
+    assert not merged['complete']
+    assert merged['missing_shards'] == [1, 2] and merged['incomplete_shards'] == [0]
+
+def test_merge_refuses_mismatched_manifests(tmp_path):
+    first = _manifest(tmp_path, (0, 2), [])
+    other = tmp_path / 'other'
+    other.mkdir()
+    with pytest.raises(ValueError, match='fingerprint'):
+        merge_manifests([first, _manifest(other, (1, 2), [], fingerprint='changed')])
+    with pytest.raises(ValueError, match='more than one'):
+        merge_manifests([first, _manifest(other, (0, 2), [])])
@@ -0,0 +1,55 @@
+import os
+import time
+from PIL import Image
+from watcher import FolderWatcher
+
+def _image(path, mtime=None):
+    Image.new('RGB', (8, 8), 'red').save(path)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return str(path)
+
+def _ready(watcher):
+    paths = []
+    while not watcher._ready.empty():
+        paths.append(watcher._ready.get())
+    return paths
+
+def test_old_mtime_still_waits_to_settle(tmp_path):
+    watcher = FolderWatcher(str(tmp_path), settle_seconds=0.3, use_inotify=False)
+    path = _image(tmp_path / 'copied.jpg', mtime=time.time() - 3600)
+    watcher._note(path)
+    watcher._release_settled()
+    assert _ready(watcher) == []
+    time.sleep(0.35)
+    watcher._release_settled()
+    assert _ready(watcher) == [path]
+
+def test_growing_file_restarts_the_wait(tmp_path):
+    watcher = FolderWatcher(str(tmp_path), settle_seconds=0.3, use_inotify=False)
+    path = _image(tmp_path / 'growing.jpg', mtime=time.time() - 3600)
+    watcher._note(path)
+    time.sleep(0.2)
+    with open(path, 'ab') as f:
+        f.write(b'\0' * 16)
+    os.utime(path, (time.time() - 3600, time.time() - 3600))
+    watcher._note(path)
+    time.sleep(0.2)
+    watcher._release_settled()
+    assert _ready(watcher) == []
+    time.sleep(0.15)
+    watcher._release_settled()
+    assert _ready(watcher) == [path]
+
+def test_forgets_deleted_files_and_outside_paths(tmp_path):
+    source = tmp_path / 'in'
+    source.mkdir()
+    watcher = FolderWatcher(str(source), settle_seconds=0, use_inotify=False)
+    kept, gone = _image(source / 'kept.jpg'), _image(source / 'gone.jpg')
+    outside = _image(tmp_path / 'outside.jpg')
+    watcher._rescan()
+    watcher.mark_processed([kept, gone, outside])
+    assert set(watcher._processed) == {kept, gone}
+    os.remove(gone)
+    watcher._rescan()
+    assert set(watcher._known) == set(watcher._processed) == {kept}
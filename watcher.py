@@ -0,0 +1,341 @@
+import os
+import sys
+import time
+import queue
+import select
+import struct
+import ctypes
+import ctypes.util
+import threading
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+from discovery import DEFAULT_FORMATS, REJECT_REASONS, check_formats, extensions_for, sniff_format
+from shards import relative_key, shard_of
+
+DEFAULT_SETTLE_SECONDS = 1.0
+DEFAULT_POLL_INTERVAL = 5.0
+DEFAULT_MAX_WAIT = 0.5
+
+# inotify(7) event bits
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct('iIII')
+
+Identity = Tuple[int, int]  # (size, mtime_ns)
+
+def _identity(path: str) -> Optional[Identity]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+class Inotify:
+    # Minimal ctypes binding, so watching needs no extra dependency; raises OSError where inotify
+    # is unavailable and the watcher falls back to polling
+    def __init__(self):
+        if not sys.platform.startswith('linux'):
+            raise OSError("inotify is only available on Linux")
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.paths: Dict[int, str] = {}
+
+    def add_watch(self, path: str):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")
+        self.paths[wd] = path
+
+    def read(self, timeout: float) -> List[Tuple[str, int]]:
+        # (path, mask) of the events that arrive within timeout seconds
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if mask & IN_IGNORED:
+                self.paths.pop(wd, None)
+                continue
+            directory = self.paths.get(wd)
+            if mask & IN_Q_OVERFLOW or directory is not None:
+                events.append((os.path.join(directory, name) if directory and name else directory or '', mask))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+# Turns a landing folder into a stream of micro-batches: new or changed images are picked up
+# through inotify (or by polling the tree), held until their size and mtime stop changing for
+# settle_seconds, and queued for processing. Exposes the same counters as DirectoryScanner.
+class FolderWatcher:
+    def __init__(self, source_dir: str, extensions: Optional[Tuple[str, ...]] = None,
+                 settle_seconds: float = DEFAULT_SETTLE_SECONDS, poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 use_inotify: bool = True, recursive: bool = True, existing: bool = True,
+                 shard: Optional[Tuple[int, int]] = None, formats: Sequence[str] = DEFAULT_FORMATS,
+                 sniff: bool = True, check_trailer: bool = False):
+        self.source_dir = source_dir
+        self._root = os.path.join(os.path.abspath(source_dir), '')
+        self.formats = check_formats(formats)
+        self.extensions = tuple(ext.lower() for ext in (extensions or extensions_for(self.formats)))
+        self.sniff = sniff
+        self.check_trailer = check_trailer
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.recursive = recursive
+        self.existing = existing
+        self.shard = shard
+        self.files_found = 0
+        self.images_found = 0
+        self.errors = 0
+        self.ignored = 0
+        self.other_shards = 0
+        self.rejected: Dict[str, int] = {reason: 0 for reason in REJECT_REASONS}
+        self.finished = False
+        self.scan_time = 0.0
+        self.wall_time = 0.0
+        self.mode = 'polling'
+        self._inotify: Optional[Inotify] = None
+        if use_inotify:
+            try:
+                self._inotify = Inotify()
+                self.mode = 'inotify'
+            except OSError:
+                self._inotify = None
+        self._start_time = time.perf_counter()
+        self._known: Dict[str, Identity] = {}
+        self._pending: Dict[str, Tuple[Identity, float]] = {}
+        # Identity of files as the engine left them, so its own writes aren't picked up again
+        self._processed: Dict[str, Identity] = {}
+        self._ready = queue.Queue()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="FolderWatcher", daemon=True)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._ready.qsize()
+
+    @property
+    def settling(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def stats(self) -> Dict[str, float]:
+        self.wall_time = time.perf_counter() - self._start_time
+        return {'files_found': self.files_found, 'images_found': self.images_found, 'errors': self.errors,
+                'scan_time': self.scan_time, 'wall_time': self.wall_time, 'finished': int(self.finished),
+                'queue_depth': self.queue_depth, 'settling': self.settling, 'ignored': self.ignored,
+                **{f'rejected_{reason}': count for reason, count in self.rejected.items()}}
+
+    def start(self):
+        self._thread.start()
+
+    def close(self):
+        self._stop.set()
+
+    def batches(self, batch_size: int, max_wait: float = DEFAULT_MAX_WAIT,
+                skip: Optional[Callable[[str], bool]] = None) -> Iterator[List[str]]:
+        # A batch goes out when it is full or max_wait seconds after its first file arrived
+        while not self._stop.is_set():
+            batch = []
+            deadline = None
+            while len(batch) < batch_size and not self._stop.is_set():
+                timeout = 0.2 if deadline is None else deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    path = self._ready.get(timeout=timeout)
+                except queue.Empty:
+                    continue
+                if skip is not None and skip(path):
+                    continue
+                batch.append(path)
+                if deadline is None:
+                    deadline = time.monotonic() + max_wait
+            if batch:
+                yield batch
+
+    def mark_processed(self, paths: List[str]):
+        for path in paths:
+            # Files moved out of the folder can't come back through it
+            if not os.path.abspath(path).startswith(self._root):
+                continue
+            identity = _identity(path)
+            if identity is not None:
+                with self._lock:
+                    self._processed[path] = identity
+                    self._known[path] = identity
+
+    def _run(self):
+        try:
+            self._scan(self.source_dir, initial=True)
+            last_poll = time.monotonic()
+            while not self._stop.is_set():
+                if self._inotify is not None:
+                    self._read_events(min(0.2, self.settle_seconds or 0.2))
+                else:
+                    self._stop.wait(min(0.2, self.poll_interval))
+                    if time.monotonic() - last_poll >= self.poll_interval:
+                        self._rescan()
+                        last_poll = time.monotonic()
+                self._release_settled()
+        finally:
+            self.finished = True
+            if self._inotify is not None:
+                self._inotify.close()
+
+    def _read_events(self, timeout: float):
+        try:
+            events = self._inotify.read(timeout)
+        except OSError:
+            with self._lock:
+                self.errors += 1
+            return
+        start = time.perf_counter()
+        for path, mask in events:
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped, so look at the whole tree again
+                self._rescan()
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self._forget(path, bool(mask & IN_ISDIR))
+            elif mask & IN_ISDIR:
+                if self.recursive and mask & (IN_CREATE | IN_MOVED_TO):
+                    # Files can land in a new directory before its watch exists
+                    self._scan(path)
+            else:
+                self._note(path)
+        with self._lock:
+            self.scan_time += time.perf_counter() - start
+
+    def _rescan(self):
+        # Full scan that also drops the entries of files that are gone
+        seen: Set[str] = set()
+        self._scan(self.source_dir, seen=seen)
+        with self._lock:
+            gone = [path for path in set(self._known) | set(self._processed) if path not in seen]
+        for path in gone:
+            # Not seen can also mean unreadable for a moment, so only forget files that are gone
+            if _identity(path) is None:
+                self._forget(path)
+
+    def _forget(self, path: str, directory: bool = False):
+        with self._lock:
+            if directory:
+                prefix = os.path.join(path, '')
+                for entries in (self._known, self._pending, self._processed):
+                    for key in [key for key in entries if key.startswith(prefix)]:
+                        del entries[key]
+            else:
+                self._known.pop(path, None)
+                self._pending.pop(path, None)
+                self._processed.pop(path, None)
+
+    def _scan(self, directory: str, initial: bool = False, seen: Optional[Set[str]] = None):
+        start = time.perf_counter()
+        if self._inotify is not None:
+            try:
+                self._inotify.add_watch(directory)
+            except OSError:
+                with self._lock:
+                    self.errors += 1
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir() and not entry.is_symlink()
+                    except OSError:
+                        is_dir = False
+                    if is_dir:
+                        if self.recursive:
+                            self._scan(entry.path, initial, seen)
+                        continue
+                    if seen is not None:
+                        seen.add(entry.path)
+                    if initial and not self.existing:
+                        identity = _identity(entry.path)
+                        if identity is not None:
+                            with self._lock:
+                                self._known[entry.path] = identity
+                        continue
+                    self._note(entry.path)
+        except OSError:
+            with self._lock:
+                self.errors += 1
+        with self._lock:
+            self.scan_time += time.perf_counter() - start
+
+    def _note(self, path: str):
+        identity = _identity(path)
+        if identity is None:
+            return
+        with self._lock:
+            if self._known.get(path) == identity:
+                return
+            self._known[path] = identity
+            self.files_found += 1
+            # Sniffed files are classified once they have settled
+            if not self.sniff and not path.lower().endswith(self.extensions):
+                return
+            if self._processed.get(path) == identity:
+                self.ignored += 1
+                return
+            if self.shard is not None and shard_of(relative_key(path, self.source_dir), self.shard[1]) != self.shard[0]:
+                self.other_shards += 1
+                return
+            # The timer starts when the file is seen, not at its mtime: copies that keep their
+            # mtime (cp -p, rsync, camera imports) would otherwise look settled mid-write
+            self._pending[path] = (identity, time.time())
+
+    def _release_settled(self):
+        now = time.time()
+        with self._lock:
+            candidates = [(path, identity) for path, (identity, changed_at) in self._pending.items()
+                          if now - changed_at >= self.settle_seconds]
+        for path, identity in candidates:
+            current = _identity(path)
+            with self._lock:
+                if current is None:
+                    self._pending.pop(path, None)
+                    self._known.pop(path, None)
+                    continue
+                if self._processed.get(path) == current:
+                    # Written by an action of this run, e.g. a rename inside the folder
+                    self._pending.pop(path, None)
+                    self.ignored += 1
+                    continue
+                if current != identity:
+                    # Still being written
+                    self._pending[path] = (current, now)
+                    self._known[path] = current
+                    continue
+                self._pending.pop(path, None)
+            reason = None
+            if self.sniff:
+                fmt, reason = sniff_format(path, self.check_trailer)
+                if fmt is not None and fmt not in self.formats:
+                    reason = 'disallowed_format'
+            with self._lock:
+                if reason is not None:
+                    # A later write to the file brings it back through _note
+                    self.rejected[reason] += 1
+                    continue
+                self.images_found += 1
+            self._ready.put(path)